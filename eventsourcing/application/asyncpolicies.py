@@ -0,0 +1,61 @@
+import asyncio
+
+from eventsourcing.domain.model.events import subscribe, unsubscribe
+from eventsourcing.infrastructure.asynceventstore import AsyncEventStore
+
+
+class AsyncPersistencePolicy(object):
+    """
+    Stores events of given type to given async event store, whenever they are published.
+
+    Events must be published in the event loop's thread. The appends run
+    without blocking the publisher; flush() returns a future that is done
+    when the pending appends have finished, and fails if any of them failed.
+    Successful appends are forgotten when they finish. Failed appends are
+    also reported to the loop's exception handler (which logs them by
+    default) when they finish, so they aren't missed if flush() isn't called.
+    """
+    def __init__(self, event_store, event_type=None):
+        assert isinstance(event_store, AsyncEventStore)
+        self.event_store = event_store
+        self.event_type = event_type
+        self.pending_appends = set()
+        subscribe(self.store_event, self.is_event)
+
+    def is_event(self, event):
+        if isinstance(event, (list, tuple)):
+            return all(map(self.is_event, event))
+        return self.event_type is None or isinstance(event, self.event_type)
+
+    def store_event(self, event):
+        future = self.event_store.append(event)
+        future.add_done_callback(self._discard_if_ok)
+        self.pending_appends.add(future)
+
+    def _discard_if_ok(self, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self.pending_appends.discard(future)
+        else:
+            # Failed appends are kept, so that flush() can raise the errors.
+            self.event_store.loop.call_exception_handler({
+                'message': 'Failed to store event',
+                'exception': error,
+                'future': future,
+            })
+
+    def flush(self):
+        """
+        Returns future for the results of the pending appends.
+        """
+        pending_appends, self.pending_appends = list(self.pending_appends), set()
+        if not pending_appends:
+            future = asyncio.Future(loop=self.event_store.loop)
+            future.set_result([])
+            return future
+        return asyncio.gather(*pending_appends)
+
+    def close(self):
+        unsubscribe(self.store_event, self.is_event)
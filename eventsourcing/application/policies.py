@@ -1,15 +1,29 @@
 from eventsourcing.domain.model.events import TimestampedEntityEvent, VersionedEntityEvent, subscribe, unsubscribe
 from eventsourcing.infrastructure.eventstore import AbstractEventStore
+from eventsourcing.infrastructure.groupcommit import GroupCommitter
 
 
 class PersistencePolicy(object):
     """
     Stores events of given type to given event store, whenever they are published.
+
+    If group_commit is True, events published concurrently by different threads
+    are written to the event store together, in groups of up to group_commit_size
+    events, optionally waiting group_commit_delay seconds for a group to fill.
     """
-    def __init__(self, event_store, event_type=None):
+    def __init__(self, event_store, event_type=None, group_commit=False, group_commit_size=100,
+                 group_commit_delay=0):
         assert isinstance(event_store, AbstractEventStore)
         self.event_store = event_store
         self.event_type = event_type
+        if group_commit:
+            self.group_committer = GroupCommitter(
+                event_store=event_store,
+                max_group_size=group_commit_size,
+                max_delay=group_commit_delay,
+            )
+        else:
+            self.group_committer = None
         subscribe(self.store_event, self.is_event)
 
     def is_event(self, event):
@@ -18,7 +32,10 @@ class PersistencePolicy(object):
         return self.event_type is None or isinstance(event, self.event_type)
 
     def store_event(self, event):
-        self.event_store.append(event)
+        if self.group_committer is not None:
+            self.group_committer.append(event)
+        else:
+            self.event_store.append(event)
 
     def close(self):
         unsubscribe(self.store_event, self.is_event)
@@ -29,14 +46,16 @@ class CombinedPersistencePolicy(object):
     Persists both timestamped and versioned entity events, whenever they are published.
     """
 
-    def __init__(self, timestamped_entity_event_store, versioned_entity_event_store):
+    def __init__(self, timestamped_entity_event_store, versioned_entity_event_store, **kwargs):
         self.timestamped_entity_event_policy = PersistencePolicy(
             event_store=timestamped_entity_event_store,
             event_type=TimestampedEntityEvent,
+            **kwargs
         )
         self.versioned_entity_event_policy = PersistencePolicy(
             event_store=versioned_entity_event_store,
             event_type = VersionedEntityEvent,
+            **kwargs
         )
 
     def close(self):
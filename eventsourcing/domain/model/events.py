@@ -268,6 +268,56 @@ def assert_event_handlers_empty():
         raise EventHandlersNotEmptyError(msg)
 
 
+class TopicRegistry(object):
+    """
+    Caches the topics of domain classes, and the domain classes of topics.
+
+    After the first time, getting a topic or resolving a topic is a dict
+    lookup. Aliases let the old topics of classes that have been moved or
+    renamed be resolved to the classes.
+    """
+
+    def __init__(self):
+        self._topics = {}
+        self._classes = {}
+
+    def get_topic(self, domain_class):
+        try:
+            return self._topics[domain_class]
+        except KeyError:
+            topic = domain_class.__module__ + '#' + getattr(domain_class, '__qualname__', domain_class.__name__)
+            self._topics[domain_class] = topic
+            return topic
+
+    def resolve_topic(self, topic):
+        try:
+            return self._classes[topic]
+        except KeyError:
+            try:
+                module_name, _, class_name = topic.partition('#')
+                module = importlib.import_module(module_name)
+            except ImportError as e:
+                raise TopicResolutionError("{}: {}".format(topic, e))
+            try:
+                cls = resolve_attr(module, class_name)
+            except AttributeError as e:
+                raise TopicResolutionError("{}: {}".format(topic, e))
+            self._classes[topic] = cls
+            return cls
+
+    def add_alias(self, topic, domain_class):
+        """
+        Resolves given topic (e.g. the topic of a class before it was moved) to given domain class.
+        """
+        self._classes[topic] = domain_class
+
+    def remove_alias(self, topic):
+        self._classes.pop(topic, None)
+
+
+topic_registry = TopicRegistry()
+
+
 def topic_from_domain_class(domain_class):
     """Returns a string describing a domain event class.
 
@@ -277,7 +327,7 @@ def topic_from_domain_class(domain_class):
     Returns:
         A string describing the class.
     """
-    return domain_class.__module__ + '#' + getattr(domain_class, '__qualname__', domain_class.__name__)
+    return topic_registry.get_topic(domain_class)
 
 
 def resolve_domain_topic(topic):
@@ -292,16 +342,7 @@ def resolve_domain_topic(topic):
     Raises:
         TopicResolutionError: If there is no such domain class.
     """
-    try:
-        module_name, _, class_name = topic.partition('#')
-        module = importlib.import_module(module_name)
-    except ImportError as e:
-        raise TopicResolutionError("{}: {}".format(topic, e))
-    try:
-        cls = resolve_attr(module, class_name)
-    except AttributeError as e:
-        raise TopicResolutionError("{}: {}".format(topic, e))
-    return cls
+    return topic_registry.resolve_topic(topic)
 
 
 def resolve_attr(obj, path):
@@ -17,6 +17,14 @@ class AbstractCipher(six.with_metaclass(ABCMeta)):
     def decrypt(self, ciphertext):
         """Return plaintext for given ciphertext."""
 
+    def encrypt_bytes(self, plaintext):
+        """Return ciphertext bytes for given plaintext bytes (by default, encrypted as base64 text)."""
+        return self.encrypt(base64.b64encode(plaintext).decode('ascii')).encode('ascii')
+
+    def decrypt_bytes(self, ciphertext):
+        """Return plaintext bytes for given ciphertext bytes."""
+        return base64.b64decode(self.decrypt(bytes(ciphertext).decode('ascii')).encode('ascii'))
+
 
 class AESCipher(AbstractCipher):
 
@@ -75,6 +83,18 @@ class AESCipher(AbstractCipher):
 
         return plaintext
 
+    def encrypt_bytes(self, plaintext):
+        # The bytes are encrypted as they are, without being compressed or encoded as base64.
+        iv = Random.new().read(self.bs)
+        cipher = AES.new(self.aes_key, self.aes_mode, iv)
+        return iv + cipher.encrypt(self._pad(bytes(plaintext)))
+
+    def decrypt_bytes(self, ciphertext):
+        ciphertext = bytes(ciphertext)
+        iv = ciphertext[:self.bs]
+        cipher = AES.new(self.aes_key, self.aes_mode, iv)
+        return self._unpad(cipher.decrypt(ciphertext[self.bs:]))
+
     def _pad(self, s):
         padding_size = self.bs - len(s) % self.bs
         return s + padding_size * chr(padding_size).encode('utf8')
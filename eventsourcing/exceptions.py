@@ -40,3 +40,11 @@ class SequencedItemError(EventSourcingError):
 
 class TimeSequenceError(EventSourcingError):
     "Raised when a time sequence error occurs e.g. trying to save a timestamp that already exists."
+
+
+class DataIntegrityError(EventSourcingError):
+    "Raised when stored data is found to be corrupt, or can't be decoded."
+
+
+class GroupCommitError(EventSourcingError):
+    "Raised when a group of appends, written together by another thread, failed."
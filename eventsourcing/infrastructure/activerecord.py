@@ -1,13 +1,21 @@
 from abc import ABCMeta, abstractmethod
+from collections import OrderedDict, namedtuple
+from itertools import islice
+from uuid import UUID
 
 import six
 
 from eventsourcing.exceptions import SequencedItemError
 from eventsourcing.infrastructure.transcoding import SequencedItem
 
+SequenceHead = namedtuple('SequenceHead', ['sequence_id', 'position', 'topic'])
+
 
 class AbstractActiveRecordStrategy(six.with_metaclass(ABCMeta)):
 
+    # Whether a list of items of many sequences is written atomically by append_item().
+    can_append_many_sequences = True
+
     def __init__(self, active_record_class, sequenced_item_class=SequencedItem):
         self.active_record_class = active_record_class
         self.sequenced_item_class = sequenced_item_class
@@ -26,16 +34,141 @@ class AbstractActiveRecordStrategy(six.with_metaclass(ABCMeta)):
 
     @abstractmethod
     def get_items(self, sequence_id, gt=None, gte=None, lt=None, lte=None, limit=None,
-                  query_ascending=True, results_ascending=True):
+                  query_ascending=True, results_ascending=True, topics=None):
         """
         Reads sequenced items from the datastore.
+
+        If topics are given, only items with one of the topics are read,
+        and the limit applies to those items.
+        """
+
+    def get_items_many(self, sequence_ids, gt=None, gte=None, lt=None, lte=None, limit=None,
+                       query_ascending=True, results_ascending=True):
+        """
+        Returns ordered dict of lists of sequenced items, for each of the given sequence IDs.
+
+        Each of the range arguments (gt, gte, lt, lte) can be either a value
+        for all the sequences, or a dict of values for particular sequences.
+        The limit applies to each sequence.
+        """
+        items = OrderedDict()
+        for sequence_id in sequence_ids:
+            _gt, _gte, _lt, _lte = self.get_bounds(sequence_id, gt, gte, lt, lte)
+            items[sequence_id] = self.get_items(
+                sequence_id, gt=_gt, gte=_gte, lt=_lt, lte=_lte, limit=limit,
+                query_ascending=query_ascending, results_ascending=results_ascending,
+            )
+        return items
+
+    def get_head(self, sequence_id):
+        """
+        Returns the head of the sequence (the position and topic of its last item), or None if it has no items.
+
+        By default, the last item is selected with a descending range query.
+        Strategies may look up the head without reading the item's data.
+        """
+        items = self.get_items(sequence_id, limit=1, query_ascending=False)
+        if items:
+            return self.make_head(items[0])
+
+    def get_heads(self, sequence_ids):
+        """
+        Returns ordered dict of the heads of the given sequences (None for sequences that have no items).
+        """
+        heads = OrderedDict()
+        for sequence_id, items in self.get_items_many(sequence_ids, limit=1, query_ascending=False).items():
+            heads[sequence_id] = self.make_head(items[0]) if items else None
+        return heads
+
+    @staticmethod
+    def make_head(item):
+        return SequenceHead(item.sequence_id, item.position, item.topic)
+
+    @staticmethod
+    def last_items(items):
+        """
+        Returns list of the last of the given items in each sequence.
+        """
+        last_items = OrderedDict()
+        for item in items:
+            last_item = last_items.get(item.sequence_id)
+            if last_item is None or last_item.position < item.position:
+                last_items[item.sequence_id] = item
+        return list(last_items.values())
+
+    @staticmethod
+    def get_bounds(sequence_id, *bounds):
+        """
+        Returns tuple of range arguments for given sequence, from values that may be dicts of values for each sequence.
         """
+        return tuple(b.get(sequence_id) if isinstance(b, dict) else b for b in bounds)
 
     @abstractmethod
-    def all_items(self):
+    def all_items(self, topics=None):
         """
         Returns all items from all sequences (possibly in chronological order, depending on database).
+
+        If topics are given, only items with one of the topics are returned.
+        """
+
+    def read_all(self, after=None, limit=None, topics=None):
+        """
+        Returns list of (position, item) pairs, for items from all sequences in the order they
+        were recorded. Positions increase monotonically, so the last position read can be used
+        as a checkpoint, to continue reading from after that position.
+
+        If topics are given, only items with one of the topics are read.
+        """
+        raise NotImplementedError("{} doesn't record items in a global order".format(type(self).__name__))
+
+    def read_partition(self, partition, num_partitions, after=None, limit=None, topics=None):
+        """
+        Returns list of (checkpoint, item) pairs, for items in one of a number of disjoint partitions of the
+        sequences. The items of a sequence are all in the same partition, and are read in order. Reading can
+        continue from after the last checkpoint read.
+
+        If topics are given, only items with one of the topics are read.
+        """
+        raise NotImplementedError("{} doesn't read partitions".format(type(self).__name__))
+
+    def iter_partition(self, partition, num_partitions, after=None, page_size=1000, topics=None):
+        """
+        Yields (checkpoint, item) pairs for the items in the partition, reading one page at a time.
+        """
+        while True:
+            page = self.read_partition(partition, num_partitions, after=after, limit=page_size, topics=topics)
+            for pair in page:
+                yield pair
+            if len(page) < page_size:
+                break
+            after = page[-1][0]
+
+    @staticmethod
+    def get_partition_range(partition, num_partitions):
+        """
+        Returns the lowest sequence ID in the partition, and the lowest in the next partition (None for the last).
+
+        Partitions are equal ranges of sequence IDs (UUIDs), ordered as bytes.
+        """
+        assert 0 <= partition < num_partitions, (partition, num_partitions)
+        lo = UUID(int=(partition << 128) // num_partitions)
+        if partition == num_partitions - 1:
+            hi = None
+        else:
+            hi = UUID(int=((partition + 1) << 128) // num_partitions)
+        return lo, hi
+
+    @staticmethod
+    def is_in_partition_range(sequence_id, lo, hi):
+        return lo.bytes <= sequence_id.bytes and (hi is None or sequence_id.bytes < hi.bytes)
+
+    @staticmethod
+    def filter_topics(items, topics, limit=None):
+        """
+        Returns list of the given items that have one of the given topics, up to the limit.
         """
+        topics = frozenset(topics)
+        return list(islice((i for i in items if i.topic in topics), limit))
 
     def raise_sequence_item_error(self, sequence_id, position, e):
         raise SequencedItemError("Item at position '{}' already exists in sequence '{}': {}"
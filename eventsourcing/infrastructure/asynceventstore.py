@@ -0,0 +1,429 @@
+# coding=utf-8
+"""
+Event store for applications that use an asyncio event loop.
+
+The methods return asyncio futures, which can be awaited in coroutines, rather
+than blocking until the datastore has responded. Coroutine syntax isn't used
+here, so that this module can be imported by the versions of Python 3 that
+have asyncio but don't have "async def".
+"""
+import asyncio
+from abc import ABCMeta, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import six
+
+from eventsourcing.exceptions import ConcurrencyError, SequencedItemError
+from eventsourcing.infrastructure.activerecord import AbstractActiveRecordStrategy
+from eventsourcing.infrastructure.iterators import AbstractSequencedItemIterator
+from eventsourcing.infrastructure.pythonobjects.activerecords import PythonObjectsActiveRecordStrategy
+from eventsourcing.infrastructure.transcoding import AbstractSequencedItemMapper
+
+try:
+    StopAsyncIteration = StopAsyncIteration
+except NameError:
+    class StopAsyncIteration(Exception):
+        pass
+
+
+def get_running_loop():
+    """
+    Returns the event loop that is running in the current thread.
+
+    Raises RuntimeError if there isn't one. Versions of Python before 3.5.3
+    can't tell whether the loop is running, so the thread's loop is returned.
+    """
+    if hasattr(asyncio, 'get_running_loop'):
+        return asyncio.get_running_loop()
+    elif hasattr(asyncio, '_get_running_loop'):
+        loop = asyncio._get_running_loop()
+        if loop is None:
+            raise RuntimeError("No running event loop")
+        return loop
+    else:
+        return asyncio.get_event_loop()
+
+
+def chain_future(loop, future, func=None, error_func=None):
+    """
+    Returns a future for the result of calling func with the result of the given future.
+
+    If func returns a future, the returned future is resolved with that future's result.
+    If the given future fails and error_func is given, the returned future fails with
+    the exception returned by error_func.
+    """
+    outcome = asyncio.Future(loop=loop)
+
+    def copy_result(f):
+        if outcome.cancelled():
+            return
+        if f.cancelled():
+            outcome.cancel()
+        elif f.exception() is not None:
+            outcome.set_exception(f.exception())
+        else:
+            outcome.set_result(f.result())
+
+    def set_result(f):
+        if outcome.cancelled():
+            return
+        if f.cancelled():
+            outcome.cancel()
+            return
+        error = f.exception()
+        if error is not None:
+            if error_func is not None:
+                error = error_func(error)
+            outcome.set_exception(error)
+            return
+        try:
+            result = f.result() if func is None else func(f.result())
+        except Exception as e:
+            outcome.set_exception(e)
+        else:
+            if isinstance(result, asyncio.Future):
+                result.add_done_callback(copy_result)
+            else:
+                outcome.set_result(result)
+
+    future.add_done_callback(set_result)
+    return outcome
+
+
+class AbstractAsyncActiveRecordStrategy(six.with_metaclass(ABCMeta)):
+    """
+    Reads and writes sequenced items without blocking the event loop.
+
+    Works like a blocking active record strategy, except the methods return futures.
+
+    If a loop isn't given, the loop that is running when the strategy is
+    first used is used, so the strategy can be constructed before the loop.
+    """
+
+    def __init__(self, loop=None):
+        self._loop = loop
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            self._loop = get_running_loop()
+        return self._loop
+
+    @abstractmethod
+    def append_item(self, sequenced_item):
+        """
+        Returns future for writing sequenced item (or list of items) into the datastore.
+        """
+
+    @abstractmethod
+    def get_item(self, sequence_id, eq):
+        """
+        Returns future for reading sequenced item from the datastore.
+        """
+
+    @abstractmethod
+    def get_items(self, sequence_id, gt=None, gte=None, lt=None, lte=None, limit=None,
+                  query_ascending=True, results_ascending=True):
+        """
+        Returns future for reading list of sequenced items from the datastore.
+        """
+
+    @abstractmethod
+    def read_all(self, after=None, limit=None):
+        """
+        Returns future for reading list of (position, sequenced item) pairs, in the order they were recorded.
+        """
+
+    def close(self):
+        """
+        Releases resources held by the strategy.
+        """
+
+
+class WrappedActiveRecordStrategy(AbstractAsyncActiveRecordStrategy):
+    """
+    Adapts a blocking active record strategy, so that its methods return futures.
+    """
+
+    def __init__(self, active_record_strategy, loop=None):
+        super(WrappedActiveRecordStrategy, self).__init__(loop=loop)
+        assert isinstance(active_record_strategy, AbstractActiveRecordStrategy), active_record_strategy
+        self.active_record_strategy = active_record_strategy
+
+    @property
+    def sequenced_item_class(self):
+        return self.active_record_strategy.sequenced_item_class
+
+    @abstractmethod
+    def call(self, func, *args, **kwargs):
+        """
+        Returns future for the result of calling the blocking function.
+        """
+
+    def append_item(self, sequenced_item):
+        return self.call(self.active_record_strategy.append_item, sequenced_item)
+
+    def get_item(self, sequence_id, eq):
+        return self.call(self.active_record_strategy.get_item, sequence_id, eq)
+
+    def get_items(self, sequence_id, gt=None, gte=None, lt=None, lte=None, limit=None,
+                  query_ascending=True, results_ascending=True):
+        return self.call(
+            self.active_record_strategy.get_items,
+            sequence_id=sequence_id,
+            gt=gt,
+            gte=gte,
+            lt=lt,
+            lte=lte,
+            limit=limit,
+            query_ascending=query_ascending,
+            results_ascending=results_ascending,
+        )
+
+    def read_all(self, after=None, limit=None):
+        return self.call(self.active_record_strategy.read_all, after=after, limit=limit)
+
+
+class ExecutorActiveRecordStrategy(WrappedActiveRecordStrategy):
+    """
+    Runs the methods of a blocking active record strategy in a bounded pool of threads.
+
+    Can be used with any of the blocking strategies (e.g. SQLite, SQLAlchemy,
+    Cassandra, files). The number of threads bounds the number of concurrent
+    calls to the datastore. If an executor isn't given, one is constructed,
+    and is shut down when the strategy is closed.
+    """
+
+    def __init__(self, active_record_strategy, executor=None, max_workers=10, loop=None):
+        super(ExecutorActiveRecordStrategy, self).__init__(active_record_strategy, loop=loop)
+        self._is_own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers)
+
+    def call(self, func, *args, **kwargs):
+        return self.loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    def close(self):
+        if self._is_own_executor:
+            self.executor.shutdown(wait=True)
+
+
+class AsyncPythonObjectsActiveRecordStrategy(WrappedActiveRecordStrategy):
+    """
+    Keeps sequenced items in memory, as Python objects.
+
+    Since the items are in memory, the calls don't block, and so they are
+    made in the event loop's thread, and the returned futures are already done.
+    """
+
+    def __init__(self, active_record_strategy=None, sequenced_item_class=None, loop=None):
+        if active_record_strategy is None:
+            kwargs = {}
+            if sequenced_item_class is not None:
+                kwargs['sequenced_item_class'] = sequenced_item_class
+            active_record_strategy = PythonObjectsActiveRecordStrategy(**kwargs)
+        assert isinstance(active_record_strategy, PythonObjectsActiveRecordStrategy), active_record_strategy
+        super(AsyncPythonObjectsActiveRecordStrategy, self).__init__(active_record_strategy, loop=loop)
+
+    def call(self, func, *args, **kwargs):
+        future = asyncio.Future(loop=self.loop)
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class AsyncEventStore(object):
+    """
+    Event store that returns futures, for use with an asyncio event loop.
+    """
+
+    def __init__(self, active_record_strategy, sequenced_item_mapper=None):
+        assert isinstance(active_record_strategy, AbstractAsyncActiveRecordStrategy), active_record_strategy
+        assert isinstance(sequenced_item_mapper, AbstractSequencedItemMapper), sequenced_item_mapper
+        self.active_record_strategy = active_record_strategy
+        self.sequenced_item_mapper = sequenced_item_mapper
+
+    @property
+    def loop(self):
+        return self.active_record_strategy.loop
+
+    def append(self, domain_event):
+        """
+        Returns future for putting domain event (or list of events) in the event store.
+        """
+        # Serialize the domain event as a sequenced item.
+        if isinstance(domain_event, (list, tuple)):
+            sequenced_item = [self.sequenced_item_mapper.to_sequenced_item(e) for e in domain_event]
+        else:
+            sequenced_item = self.sequenced_item_mapper.to_sequenced_item(domain_event)
+
+        # Append to the item to the sequence.
+        future = self.active_record_strategy.append_item(sequenced_item)
+        return chain_future(self.loop, future, error_func=self._convert_error)
+
+    @staticmethod
+    def _convert_error(error):
+        if isinstance(error, SequencedItemError):
+            return ConcurrencyError(error)
+        return error
+
+    def get_domain_events(self, entity_id, gt=None, gte=None, lt=None, lte=None, limit=None, is_ascending=True):
+        """
+        Returns future for list of domain events for given entity ID.
+        """
+        future = self.active_record_strategy.get_items(
+            sequence_id=entity_id,
+            gt=gt,
+            gte=gte,
+            lt=lt,
+            lte=lte,
+            limit=limit,
+            query_ascending=is_ascending,
+            results_ascending=is_ascending,
+        )
+        return chain_future(self.loop, future, self.from_sequenced_items)
+
+    def iter_domain_events(self, entity_id, gt=None, gte=None, lt=None, lte=None, limit=None, is_ascending=True,
+                           page_size=None):
+        """
+        Returns asynchronous iterator of domain events for given entity ID, that gets events in pages.
+        """
+        return AsyncDomainEventIterator(
+            event_store=self,
+            entity_id=entity_id,
+            page_size=page_size,
+            gt=gt,
+            gte=gte,
+            lt=lt,
+            lte=lte,
+            limit=limit,
+            is_ascending=is_ascending,
+        )
+
+    def get_domain_event(self, entity_id, eq):
+        """
+        Returns future for a single domain event.
+        """
+        future = self.active_record_strategy.get_item(sequence_id=entity_id, eq=eq)
+        return chain_future(self.loop, future, self.sequenced_item_mapper.from_sequenced_item)
+
+    def get_most_recent_event(self, entity_id, lt=None, lte=None):
+        """
+        Returns future for most recent domain event for given entity ID (None if there are no events).
+        """
+        future = self.get_domain_events(entity_id=entity_id, lt=lt, lte=lte, limit=1, is_ascending=False)
+        return chain_future(self.loop, future, lambda events: events[0] if events else None)
+
+    def read_all(self, after=None, limit=None):
+        """
+        Returns future for list of (position, domain event) pairs, in the order the events were recorded.
+        """
+        future = self.active_record_strategy.read_all(after=after, limit=limit)
+        return chain_future(self.loop, future, self.from_position_item_pairs)
+
+    def from_sequenced_items(self, sequenced_items):
+        return self.sequenced_item_mapper.from_sequenced_items(sequenced_items)
+
+    def from_position_item_pairs(self, pairs):
+        domain_events = self.from_sequenced_items([item for _, item in pairs])
+        return [(position, domain_event) for (position, _), domain_event in zip(pairs, domain_events)]
+
+    def close(self):
+        self.active_record_strategy.close()
+
+
+class AsyncDomainEventIterator(object):
+    """
+    Asynchronous iterator of domain events, that gets events from the event store in pages.
+
+    Can be used with "async for" in a coroutine. Alternatively, get_page()
+    returns a future for the next page of domain events, which is an empty
+    list after the last page.
+    """
+    DEFAULT_PAGE_SIZE = AbstractSequencedItemIterator.DEFAULT_PAGE_SIZE
+
+    def __init__(self, event_store, entity_id, page_size=None, gt=None, gte=None, lt=None, lte=None, limit=None,
+                 is_ascending=True):
+        assert isinstance(event_store, AsyncEventStore), event_store
+        assert isinstance(page_size, (six.integer_types, type(None)))
+        assert isinstance(limit, (six.integer_types, type(None)))
+        self.event_store = event_store
+        self.entity_id = entity_id
+        self.page_size = page_size or self.DEFAULT_PAGE_SIZE
+        self.gt = gt
+        self.gte = gte
+        self.lt = lt
+        self.lte = lte
+        self.limit = limit
+        self.is_ascending = is_ascending
+        self.query_counter = 0
+        self.all_item_counter = 0
+        self._is_exhausted = False
+        self._page = deque()
+
+    def get_page(self):
+        """
+        Returns future for the next page of domain events.
+        """
+        loop = self.event_store.loop
+
+        # Get next page of events.
+        if self.limit is not None:
+            limit = min(self.page_size, self.limit - self.all_item_counter)
+        else:
+            limit = self.page_size
+
+        if self._is_exhausted or limit == 0:
+            future = asyncio.Future(loop=loop)
+            future.set_result([])
+            return future
+
+        self.query_counter += 1
+        future = self.event_store.active_record_strategy.get_items(
+            sequence_id=self.entity_id,
+            gt=self.gt,
+            gte=self.gte,
+            lt=self.lt,
+            lte=self.lte,
+            limit=limit,
+            query_ascending=self.is_ascending,
+            results_ascending=self.is_ascending,
+        )
+        return chain_future(loop, future, self._receive_page)
+
+    def _receive_page(self, sequenced_items):
+        self.all_item_counter += len(sequenced_items)
+
+        # If that wasn't a full page, there can be no more items.
+        if len(sequenced_items) != self.page_size:
+            self._is_exhausted = True
+
+        # Continue from the position of the last item.
+        if sequenced_items:
+            if self.is_ascending:
+                self.gt = sequenced_items[-1].position
+                self.gte = None
+            else:
+                self.lt = sequenced_items[-1].position
+                self.lte = None
+
+        return self.event_store.from_sequenced_items(sequenced_items)
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        if self._page:
+            future = asyncio.Future(loop=self.event_store.loop)
+            future.set_result(self._page.popleft())
+            return future
+        return chain_future(self.event_store.loop, self.get_page(), self._next_from_page)
+
+    def _next_from_page(self, page):
+        if not page:
+            raise StopAsyncIteration
+        self._page.extend(page)
+        return self._page.popleft()
@@ -0,0 +1,91 @@
+import asyncio
+from functools import reduce
+
+from eventsourcing.exceptions import RepositoryKeyError
+from eventsourcing.infrastructure.asynceventstore import AsyncEventStore, chain_future
+
+
+class AsyncEventSourcedRepository(object):
+    """
+    Reconstitutes entities from the domain events in an async event store.
+
+    The methods return futures. If a page size is set, the events are
+    retrieved in pages, and each page is applied to the entity when it
+    arrives, so the events of an entity aren't all held at once.
+    """
+
+    # The page size by which events are retrieved.
+    __page_size__ = None
+
+    # The type of domain entity this repository will serve.
+    domain_class = None
+
+    def __init__(self, event_store, mutator=None, domain_class=None):
+        assert isinstance(event_store, AsyncEventStore), event_store
+        self.event_store = event_store
+
+        # Check we have a domain class.
+        if domain_class is not None:
+            self.domain_class = domain_class
+        assert self.domain_class is not None, "Domain entity class is required"
+        self.mutate_func = mutator or self.domain_class.mutate
+
+    def get_entity(self, entity_id, lte=None):
+        """
+        Returns future for entity with given ID (None if never created or already discarded).
+        """
+        if self.__page_size__:
+            domain_events = self.event_store.iter_domain_events(entity_id, lte=lte, page_size=self.__page_size__)
+            return self._replay_pages(domain_events, initial_state=None)
+        else:
+            future = self.event_store.get_domain_events(entity_id, lte=lte)
+            return chain_future(self.event_store.loop, future, lambda events: self.replay_events(None, events))
+
+    def _replay_pages(self, domain_events, initial_state):
+        """
+        Returns future for state after replaying the remaining pages of the events onto the initial state.
+        """
+        def replay_page(page):
+            if not page:
+                return initial_state
+            return self._replay_pages(domain_events, self.replay_events(initial_state, page))
+
+        return chain_future(self.event_store.loop, domain_events.get_page(), replay_page)
+
+    def replay_events(self, initial_state, domain_events):
+        """
+        Mutates initial state using the sequence of domain events.
+        """
+        return reduce(self.mutate_func, domain_events, initial_state)
+
+    def get_item(self, entity_id):
+        """
+        Returns future for entity with given ID, that raises RepositoryKeyError if there's no such entity.
+        """
+        return chain_future(self.event_store.loop, self.get_entity(entity_id), self._check_entity(entity_id))
+
+    @staticmethod
+    def _check_entity(entity_id):
+        def check(entity):
+            # Never created or already discarded?
+            if entity is None:
+                raise RepositoryKeyError(entity_id)
+            return entity
+        return check
+
+    def contains(self, entity_id):
+        """
+        Returns future for a boolean value according to whether entity with given ID exists.
+        """
+        return chain_future(self.event_store.loop, self.get_entity(entity_id), lambda entity: entity is not None)
+
+    def get_entities(self, entity_ids, lte=None):
+        """
+        Returns future for list of entities with given IDs, getting the entities concurrently.
+        """
+        futures = [self.get_entity(entity_id, lte=lte) for entity_id in entity_ids]
+        if not futures:
+            future = asyncio.Future(loop=self.event_store.loop)
+            future.set_result([])
+            return future
+        return asyncio.gather(*futures)
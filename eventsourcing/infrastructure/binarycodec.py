@@ -0,0 +1,322 @@
+import datetime
+import struct
+from uuid import UUID
+
+import six
+
+from eventsourcing.domain.model.events import resolve_domain_topic, topic_from_domain_class
+from eventsourcing.infrastructure.transcoding import EPOCH, AbstractCodec, timedelta_micros, tzinfo_from_offset
+
+# Tags, which precede each encoded value.
+NONE_TAG = 0
+TRUE_TAG = 1
+FALSE_TAG = 2
+INT_TAG = 3
+FLOAT_TAG = 4
+TEXT_TAG = 5
+BYTES_TAG = 6
+LIST_TAG = 7
+TUPLE_TAG = 8
+DICT_TAG = 9
+UUID_TAG = 10
+DATETIME_TAG = 11
+AWARE_DATETIME_TAG = 12
+DATE_TAG = 13
+OBJECT_TAG = 14
+
+DOUBLE = struct.Struct('>d')
+
+
+class BinaryCodec(AbstractCodec):
+    """
+    Encodes attribute values as compact bytes.
+
+    Each value is a tag byte followed by the value. Integers and lengths
+    are varints, so small values take one byte. UUIDs are their 16 bytes,
+    datetimes are microseconds since the epoch (and the UTC offset, if
+    they are aware), dates are ordinals, and domain objects (values with
+    a __dict__) are the topic of their class and their state. Since each
+    value has a tag, decoding doesn't need to inspect dicts for markers.
+    """
+    is_binary = True
+
+    def __init__(self):
+        self._encoders = {
+            type(None): self._encode_none,
+            bool: self._encode_bool,
+            float: self._encode_float,
+            six.text_type: self._encode_text,
+            six.binary_type: self._encode_bytes,
+            list: self._encode_list,
+            tuple: self._encode_tuple,
+            dict: self._encode_dict,
+            UUID: self._encode_uuid,
+            datetime.datetime: self._encode_datetime,
+            datetime.date: self._encode_date,
+        }
+        for int_type in six.integer_types:
+            self._encoders[int_type] = self._encode_int
+        self._decoders = [
+            self._decode_none,
+            self._decode_true,
+            self._decode_false,
+            self._decode_int,
+            self._decode_float,
+            self._decode_text,
+            self._decode_bytes,
+            self._decode_list,
+            self._decode_tuple,
+            self._decode_dict,
+            self._decode_uuid,
+            self._decode_datetime,
+            self._decode_aware_datetime,
+            self._decode_date,
+            self._decode_object,
+        ]
+
+    def encode(self, obj):
+        buf = bytearray()
+        self._encode(obj, buf)
+        return bytes(buf)
+
+    def decode(self, data):
+        value, _ = self._decode(bytearray(data), 0)
+        return value
+
+    def _encode(self, obj, buf):
+        try:
+            encoder = self._encoders[type(obj)]
+        except KeyError:
+            encoder = self._find_encoder(obj)
+        encoder(obj, buf)
+
+    def _find_encoder(self, obj):
+        """
+        Returns the encoder for an object whose type isn't one of the encoded types, and remembers it.
+        """
+        obj_type = type(obj)
+        for base_type, encoder in (
+            (bool, self._encode_bool),
+            (six.integer_types, self._encode_int),
+            (float, self._encode_float),
+            (six.text_type, self._encode_text),
+            (six.binary_type, self._encode_bytes),
+            (list, self._encode_list),
+            (tuple, self._encode_tuple),
+            (dict, self._encode_dict),
+            (UUID, self._encode_uuid),
+            (datetime.datetime, self._encode_datetime),
+            (datetime.date, self._encode_date),
+        ):
+            if issubclass(obj_type, base_type):
+                break
+        else:
+            if not hasattr(obj, '__dict__') or isinstance(obj, type):
+                raise TypeError("Object of type '{}' can't be encoded".format(obj_type.__name__))
+            encoder = self._encode_object
+        self._encoders[obj_type] = encoder
+        return encoder
+
+    def _decode(self, data, pos):
+        return self._decoders[data[pos]](data, pos + 1)
+
+    @staticmethod
+    def _encode_none(obj, buf):
+        buf.append(NONE_TAG)
+
+    @staticmethod
+    def _encode_bool(obj, buf):
+        buf.append(TRUE_TAG if obj else FALSE_TAG)
+
+    @staticmethod
+    def _encode_int(obj, buf):
+        buf.append(INT_TAG)
+        write_varint(buf, zigzag(obj))
+
+    @staticmethod
+    def _encode_float(obj, buf):
+        buf.append(FLOAT_TAG)
+        buf += DOUBLE.pack(obj)
+
+    @staticmethod
+    def _encode_text(obj, buf):
+        buf.append(TEXT_TAG)
+        write_text(buf, obj)
+
+    @staticmethod
+    def _encode_bytes(obj, buf):
+        buf.append(BYTES_TAG)
+        write_varint(buf, len(obj))
+        buf += obj
+
+    def _encode_list(self, obj, buf):
+        buf.append(LIST_TAG)
+        self._encode_items(obj, buf)
+
+    def _encode_tuple(self, obj, buf):
+        buf.append(TUPLE_TAG)
+        self._encode_items(obj, buf)
+
+    def _encode_items(self, obj, buf):
+        write_varint(buf, len(obj))
+        for item in obj:
+            self._encode(item, buf)
+
+    def _encode_dict(self, obj, buf):
+        buf.append(DICT_TAG)
+        write_varint(buf, len(obj))
+        for key, value in six.iteritems(obj):
+            self._encode(key, buf)
+            self._encode(value, buf)
+
+    @staticmethod
+    def _encode_uuid(obj, buf):
+        buf.append(UUID_TAG)
+        buf += obj.bytes
+
+    @staticmethod
+    def _encode_datetime(obj, buf):
+        offset = obj.utcoffset()
+        if offset is None:
+            buf.append(DATETIME_TAG)
+            write_varint(buf, zigzag(timedelta_micros(obj - EPOCH)))
+        else:
+            # The wall time, and the UTC offset in seconds.
+            buf.append(AWARE_DATETIME_TAG)
+            write_varint(buf, zigzag(timedelta_micros(obj.replace(tzinfo=None) - EPOCH)))
+            write_varint(buf, zigzag(offset.days * 86400 + offset.seconds))
+
+    @staticmethod
+    def _encode_date(obj, buf):
+        buf.append(DATE_TAG)
+        write_varint(buf, obj.toordinal())
+
+    def _encode_object(self, obj, buf):
+        buf.append(OBJECT_TAG)
+        write_text(buf, topic_from_domain_class(type(obj)))
+        self._encode_dict(obj.__dict__, buf)
+
+    @staticmethod
+    def _decode_none(data, pos):
+        return None, pos
+
+    @staticmethod
+    def _decode_true(data, pos):
+        return True, pos
+
+    @staticmethod
+    def _decode_false(data, pos):
+        return False, pos
+
+    @staticmethod
+    def _decode_int(data, pos):
+        value, pos = read_varint(data, pos)
+        return unzigzag(value), pos
+
+    @staticmethod
+    def _decode_float(data, pos):
+        return DOUBLE.unpack_from(data, pos)[0], pos + 8
+
+    @staticmethod
+    def _decode_text(data, pos):
+        return read_text(data, pos)
+
+    @staticmethod
+    def _decode_bytes(data, pos):
+        length, pos = read_varint(data, pos)
+        end = pos + length
+        return bytes(data[pos:end]), end
+
+    def _decode_list(self, data, pos):
+        length, pos = read_varint(data, pos)
+        items = []
+        for _ in six.moves.range(length):
+            item, pos = self._decode(data, pos)
+            items.append(item)
+        return items, pos
+
+    def _decode_tuple(self, data, pos):
+        items, pos = self._decode_list(data, pos)
+        return tuple(items), pos
+
+    def _decode_dict(self, data, pos):
+        length, pos = read_varint(data, pos)
+        obj = {}
+        for _ in six.moves.range(length):
+            key, pos = self._decode(data, pos)
+            obj[key], pos = self._decode(data, pos)
+        return obj, pos
+
+    @staticmethod
+    def _decode_uuid(data, pos):
+        end = pos + 16
+        return UUID(bytes=bytes(data[pos:end])), end
+
+    @staticmethod
+    def _decode_datetime(data, pos):
+        micros, pos = read_varint(data, pos)
+        return EPOCH + datetime.timedelta(microseconds=unzigzag(micros)), pos
+
+    @staticmethod
+    def _decode_aware_datetime(data, pos):
+        micros, pos = read_varint(data, pos)
+        offset, pos = read_varint(data, pos)
+        tzinfo = tzinfo_from_offset(unzigzag(offset))
+        return (EPOCH + datetime.timedelta(microseconds=unzigzag(micros))).replace(tzinfo=tzinfo), pos
+
+    @staticmethod
+    def _decode_date(data, pos):
+        ordinal, pos = read_varint(data, pos)
+        return datetime.date.fromordinal(ordinal), pos
+
+    def _decode_object(self, data, pos):
+        topic, pos = read_text(data, pos)
+        state, pos = self._decode(data, pos)
+        obj = object.__new__(resolve_domain_topic(topic))
+        obj.__dict__.update(state)
+        return obj, pos
+
+
+def zigzag(n):
+    """
+    Returns non-negative integer for given integer, so that integers near zero are small.
+    """
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def unzigzag(n):
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+def write_varint(buf, n):
+    """
+    Appends non-negative integer to the buffer, seven bits per byte, with the high bit set on all but the last byte.
+    """
+    while n > 0x7f:
+        buf.append((n & 0x7f) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def write_text(buf, text):
+    encoded = text.encode('utf8')
+    write_varint(buf, len(encoded))
+    buf += encoded
+
+
+def read_text(data, pos):
+    length, pos = read_varint(data, pos)
+    end = pos + length
+    return data[pos:end].decode('utf8'), end
@@ -1,24 +1,81 @@
+from collections import OrderedDict
+
 import six
+from cassandra.concurrent import execute_concurrent
+from cassandra.cqlengine import connection
 from cassandra.cqlengine.functions import Token
 from cassandra.cqlengine.models import Model, columns
 from cassandra.cqlengine.query import LWTException, BatchQuery
+from cassandra.query import BatchStatement
 
-from eventsourcing.infrastructure.activerecord import AbstractActiveRecordStrategy
+from eventsourcing.infrastructure.activerecord import AbstractActiveRecordStrategy, SequenceHead
 
 
 class CassandraActiveRecordStrategy(AbstractActiveRecordStrategy):
+    """
+    Reads and writes sequenced items with cqlengine models.
+
+    If "use_prepared_statements" is True, items are instead written and
+    read with statements that are prepared once for the table, and
+    sequenced items are made directly from the selected rows, which
+    avoids the cost of cqlengine's query builder and model instances.
+
+    Cassandra can't select rows by the values of a column that isn't part
+    of the primary key (without a secondary index, or "ALLOW FILTERING").
+    So items with particular topics are selected in two steps: the positions
+    and topics of the range of the sequence are selected (in pages, from
+    the sequence's partition), until the limit of positions with the topics
+    is reached; and then the items at those positions are selected. Hence
+    the data of the items without the topics isn't transferred.
+
+    The head of a sequence is the first row of its partition (positions
+    are clustered in descending order), so it is selected without a
+    separate table, and without the data of the item.
+
+    The store can be read in disjoint partitions, which are ranges of the
+    tokens of the sequence IDs (so each partition is a range of the ring).
+    The sequence IDs of a range are selected in token order, and then the
+    items of each sequence are selected in order of position.
+    """
+
+    # The number of positions selected by each query for items with topics.
+    topic_positions_chunk_size = 100
+
+    # The number of sequence IDs selected by each query when reading a partition.
+    partition_sequence_ids_chunk_size = 100
+
+    # The range of tokens of the (Murmur3) partitioner.
+    min_token = -2 ** 63
+    max_token = 2 ** 63 - 1
+
+    # Lists of items are written as conditional batches, which can't span partitions.
+    can_append_many_sequences = False
+
+    def __init__(self, use_prepared_statements=False, concurrency=50, all_items_page_size=1000, *args, **kwargs):
+        super(CassandraActiveRecordStrategy, self).__init__(*args, **kwargs)
+        self.use_prepared_statements = use_prepared_statements
+        self.concurrency = concurrency
+        self.all_items_page_size = all_items_page_size
+        self._prepared_statements = {}
 
     def append_item(self, sequenced_item):
-        if isinstance(sequenced_item, list):
-            with BatchQuery() as b:
-                for i in sequenced_item:
-                    assert isinstance(i, self.sequenced_item_class), (type(i), self.sequenced_item_class)
-                    self.active_record_class.batch(b).create(
-                        s=i.sequence_id,
-                        p=i.position,
-                        t=i.topic,
-                        d=i.data,
-                    )
+        if self.use_prepared_statements:
+            self.insert_items(sequenced_item)
+        elif isinstance(sequenced_item, list):
+            if not sequenced_item:
+                return
+            try:
+                with BatchQuery() as b:
+                    for i in sequenced_item:
+                        assert isinstance(i, self.sequenced_item_class), (type(i), self.sequenced_item_class)
+                        self.active_record_class.batch(b).create(
+                            s=i.sequence_id,
+                            p=i.position,
+                            t=i.topic,
+                            d=i.data,
+                        )
+            except LWTException as e:
+                self.raise_sequence_item_error(sequenced_item[0].sequence_id, sequenced_item[0].position, e)
         else:
             active_record = self.to_active_record(sequenced_item)
             try:
@@ -27,21 +84,66 @@ class CassandraActiveRecordStrategy(AbstractActiveRecordStrategy):
                 self.raise_sequence_item_error(sequenced_item.sequence_id, sequenced_item.position, e)
 
     def get_item(self, sequence_id, eq):
-        query = self.filter(s=sequence_id, p__eq=eq)
-        items = six.moves.map(self.from_active_record, query)
-        items = list(items)
+        if self.use_prepared_statements:
+            statement = self.get_prepared_statement(
+                'get_item',
+                "SELECT p, t, d FROM {} WHERE s = ? AND p = ?"
+            )
+            items = self.select_items(sequence_id, statement, (sequence_id, eq))
+        else:
+            query = self.filter(s=sequence_id, p__eq=eq)
+            items = six.moves.map(self.from_active_record, query)
+            items = list(items)
         try:
             return items[0]
         except IndexError:
             self.raise_index_error(eq)
 
+    def get_head(self, sequence_id):
+        rows = list(self.get_session().execute(self.get_head_statement(), (sequence_id,)))
+        if rows:
+            return SequenceHead(sequence_id, rows[0]['p'], rows[0]['t'])
+
+    def get_heads(self, sequence_ids, concurrency=None):
+        sequence_ids = list(sequence_ids)
+        statement = self.get_head_statement()
+        results = execute_concurrent(
+            self.get_session(),
+            [(statement, (sequence_id,)) for sequence_id in sequence_ids],
+            concurrency=concurrency or self.concurrency,
+            raise_on_first_error=True,
+        )
+        heads = OrderedDict()
+        for sequence_id, (_, rows) in zip(sequence_ids, results):
+            rows = list(rows)
+            heads[sequence_id] = SequenceHead(sequence_id, rows[0]['p'], rows[0]['t']) if rows else None
+        return heads
+
+    def get_head_statement(self):
+        return self.get_prepared_statement(
+            'get_head',
+            "SELECT p, t FROM {} WHERE s = ? ORDER BY p DESC LIMIT 1"
+        )
+
     def get_items(self, sequence_id, gt=None, gte=None, lt=None, lte=None, limit=None,
-                  query_ascending=True, results_ascending=True):
+                  query_ascending=True, results_ascending=True, topics=None):
 
         assert limit is None or limit >= 1, limit
         assert not (gte and gt)
         assert not (lte and lt)
 
+        if topics is not None:
+            items = self.select_range_with_topics(sequence_id, gt, gte, lt, lte, limit, query_ascending, topics)
+            if results_ascending != query_ascending:
+                items.reverse()
+            return items
+
+        if self.use_prepared_statements:
+            items = self.select_range(sequence_id, gt, gte, lt, lte, limit, query_ascending)
+            if results_ascending != query_ascending:
+                items.reverse()
+            return items
+
         query = self.filter(s=sequence_id)
 
         if query_ascending:
@@ -68,15 +170,228 @@ class CassandraActiveRecordStrategy(AbstractActiveRecordStrategy):
 
         return items
 
-    def all_items(self):
-        query = self.active_record_class.objects.all().limit(10)
+    def all_items(self, topics=None, page_size=None):
+        # Items are returned in token order, not the order they were recorded, so read_all() isn't supported.
+        # Since all the partitions are scanned anyway, items without the topics are skipped here.
+        topics = None if topics is None else frozenset(topics)
+        query = self.active_record_class.objects.all().limit(page_size or self.all_items_page_size)
         page = list(query)
         while page:
             for record in page:
-                yield self.from_active_record(record)
+                if topics is None or record.t in topics:
+                    yield self.from_active_record(record)
             last = page[-1]
             page = list(query.filter(pk__token__gt=Token(last.pk)))
 
+    def read_partition(self, partition, num_partitions, after=None, limit=None, topics=None):
+        """
+        Returns list of (checkpoint, item) pairs for the partition, where the checkpoint is a
+        tuple of the token and ID of the item's sequence, and the position of the item.
+        """
+        assert limit is None or limit >= 1, limit
+        lo, hi = self.get_token_range(partition, num_partitions)
+        pairs = []
+
+        def add_items(token, sequence_id, gt=None):
+            remaining = None if limit is None else limit - len(pairs)
+            items = self.get_items(sequence_id, gt=gt, limit=remaining, topics=topics)
+            pairs.extend(((token, sequence_id, item.position), item) for item in items)
+
+        # Continue reading the sequence of the checkpoint, and then the sequences after it.
+        if after is not None:
+            token, sequence_id, position = after
+            add_items(token, sequence_id, gt=position)
+            is_after_token = True
+        else:
+            token = lo
+            is_after_token = False
+
+        # Read the sequences of the range of tokens, in token order.
+        chunk_size = self.partition_sequence_ids_chunk_size
+        while limit is None or len(pairs) < limit:
+            rows = self.select_sequence_ids(token, hi, chunk_size, is_after_token)
+            for row in rows:
+                if limit is not None and len(pairs) >= limit:
+                    break
+                add_items(row['tk'], row['s'])
+            if len(rows) < chunk_size:
+                break
+            token = rows[-1]['tk']
+            is_after_token = True
+        return pairs
+
+    def select_sequence_ids(self, token, hi, limit, is_after_token):
+        """
+        Returns list of rows with the IDs and tokens of sequences, from (or after) the token up to the highest token.
+        """
+        statement = self.get_prepared_statement(
+            'sequence_ids_after_token' if is_after_token else 'sequence_ids_from_token',
+            "SELECT DISTINCT s, token(s) AS tk FROM {{}} WHERE token(s) {} ? AND token(s) <= ? LIMIT ?".format(
+                '>' if is_after_token else '>='
+            )
+        )
+        return list(self.get_session().execute(statement, (token, hi, limit)))
+
+    def get_token_range(self, partition, num_partitions):
+        """
+        Returns the lowest and highest tokens (inclusive) of the partition.
+        """
+        assert 0 <= partition < num_partitions, (partition, num_partitions)
+        num_tokens = self.max_token - self.min_token + 1
+        lo = self.min_token + partition * num_tokens // num_partitions
+        hi = self.min_token + (partition + 1) * num_tokens // num_partitions - 1
+        return lo, hi
+
+    def insert_items(self, sequenced_item):
+        """
+        Inserts item, or list of items in one batch, with a prepared "INSERT ... IF NOT EXISTS" statement.
+        """
+        statement = self.get_prepared_statement(
+            'insert',
+            "INSERT INTO {} (s, p, t, d) VALUES (?, ?, ?, ?) IF NOT EXISTS"
+        )
+        if isinstance(sequenced_item, list):
+            if not sequenced_item:
+                return
+            first_item = sequenced_item[0]
+            batch = BatchStatement()
+            for i in sequenced_item:
+                assert isinstance(i, self.sequenced_item_class), (type(i), self.sequenced_item_class)
+                batch.add(statement, (i.sequence_id, i.position, i.topic, i.data))
+            statement, params = batch, None
+        else:
+            first_item = sequenced_item
+            assert isinstance(first_item, self.sequenced_item_class), (type(first_item), self.sequenced_item_class)
+            params = (first_item.sequence_id, first_item.position, first_item.topic, first_item.data)
+
+        result = self.get_session().execute(statement, params)
+        if not self.was_applied(result):
+            e = LWTException(result[0])
+            self.raise_sequence_item_error(first_item.sequence_id, first_item.position, e)
+
+    def get_items_many(self, sequence_ids, gt=None, gte=None, lt=None, lte=None, limit=None,
+                       query_ascending=True, results_ascending=True, concurrency=None):
+        """
+        Returns ordered dict of lists of sequenced items, for each of the given sequence IDs.
+
+        The queries for the different sequences (partitions) are executed
+        concurrently, with prepared statements, with no more than the given
+        number of queries in flight at once.
+        """
+        sequence_ids = list(sequence_ids)
+        statements_and_params = [
+            self.get_range_statement_and_params(
+                sequence_id, *self.get_bounds(sequence_id, gt, gte, lt, lte), limit=limit,
+                query_ascending=query_ascending
+            )
+            for sequence_id in sequence_ids
+        ]
+        results = execute_concurrent(
+            self.get_session(),
+            statements_and_params,
+            concurrency=concurrency or self.concurrency,
+            raise_on_first_error=True,
+        )
+        items = OrderedDict()
+        for sequence_id, (_, rows) in zip(sequence_ids, results):
+            sequence_items = self.make_items(sequence_id, rows)
+            if results_ascending != query_ascending:
+                sequence_items.reverse()
+            items[sequence_id] = sequence_items
+        return items
+
+    def select_range(self, sequence_id, gt, gte, lt, lte, limit, query_ascending):
+        """
+        Returns list of sequenced items, selected with a prepared statement for the given combination of arguments.
+        """
+        statement, params = self.get_range_statement_and_params(sequence_id, gt, gte, lt, lte, limit, query_ascending)
+        return self.select_items(sequence_id, statement, params)
+
+    def get_range_statement_and_params(self, sequence_id, gt, gte, lt, lte, limit, query_ascending):
+        params = [sequence_id]
+        cql = "SELECT p, t, d FROM {} WHERE s = ?"
+        for operator, value in (('>', gt), ('>=', gte), ('<', lt), ('<=', lte)):
+            if value is not None:
+                cql += " AND p {} ?".format(operator)
+                params.append(value)
+        cql += " ORDER BY p {}".format('ASC' if query_ascending else 'DESC')
+        if limit is not None:
+            cql += " LIMIT ?"
+            params.append(limit)
+        return self.get_prepared_statement(cql, cql), params
+
+    def select_range_with_topics(self, sequence_id, gt, gte, lt, lte, limit, query_ascending, topics):
+        """
+        Returns list of sequenced items in the range that have one of the given topics, in query order.
+        """
+        topics = frozenset(topics)
+
+        # Select the positions and topics of the range. The driver fetches the rows
+        # in pages as they are iterated over, so no more pages are fetched than needed.
+        params = [sequence_id]
+        cql = "SELECT p, t FROM {} WHERE s = ?"
+        for operator, value in (('>', gt), ('>=', gte), ('<', lt), ('<=', lte)):
+            if value is not None:
+                cql += " AND p {} ?".format(operator)
+                params.append(value)
+        cql += " ORDER BY p {}".format('ASC' if query_ascending else 'DESC')
+        statement = self.get_prepared_statement(cql, cql)
+        positions = []
+        for row in self.get_session().execute(statement, params):
+            if row['t'] in topics:
+                positions.append(row['p'])
+                if limit is not None and len(positions) >= limit:
+                    break
+
+        # Select the items at the positions.
+        statement = self.get_prepared_statement(
+            'get_items_at_positions',
+            "SELECT p, t, d FROM {} WHERE s = ? AND p IN ?"
+        )
+        items = []
+        chunk_size = self.topic_positions_chunk_size
+        for i in six.moves.range(0, len(positions), chunk_size):
+            items += self.select_items(sequence_id, statement, (sequence_id, positions[i:i + chunk_size]))
+        items.sort(key=lambda item: item.position, reverse=not query_ascending)
+        return items
+
+    def select_items(self, sequence_id, statement, params):
+        """
+        Returns list of sequenced items, made directly from the rows selected by the given statement.
+        """
+        return self.make_items(sequence_id, self.get_session().execute(statement, params))
+
+    def make_items(self, sequence_id, rows):
+        sequenced_item_class = self.sequenced_item_class
+        # The session made by cqlengine returns rows as dicts.
+        return [sequenced_item_class(sequence_id, row['p'], row['t'], row['d']) for row in rows]
+
+    def get_prepared_statement(self, key, cql):
+        """
+        Returns statement prepared from given CQL, in which "{}" is replaced by the table name.
+        """
+        try:
+            return self._prepared_statements[key]
+        except KeyError:
+            table_name = self.active_record_class.column_family_name()
+            statement = self.get_session().prepare(cql.format(table_name))
+            self._prepared_statements[key] = statement
+            return statement
+
+    def get_session(self):
+        return connection.get_session()
+
+    @staticmethod
+    def was_applied(result):
+        """
+        Returns whether a conditional ("IF NOT EXISTS") statement was applied.
+        """
+        row = result[0]
+        if isinstance(row, dict):
+            return row['[applied]']
+        else:
+            return row[0]
+
     def to_active_record(self, sequenced_item):
         """
         Returns an active record instance, from given sequenced item.
@@ -126,6 +441,26 @@ class CqlIntegerSequencedItem(Model):
     d = columns.Text(required=True)
 
 
+class CqlBinaryIntegerSequencedItem(Model):
+    """Stores integer-sequenced items with binary data in Cassandra."""
+
+    _if_not_exists = True
+
+    __table_name__ = 'binary_integer_sequenced_items'
+
+    # Sequence ID (e.g. an entity or aggregate ID).
+    s = columns.UUID(partition_key=True)
+
+    # Position (index) of item in sequence.
+    p = columns.BigInt(clustering_order='DESC', primary_key=True)
+
+    # Topic of the item (e.g. path to domain event class).
+    t = columns.Text(required=True)
+
+    # State of the item (bytes from a binary codec, possibly encrypted).
+    d = columns.Blob(required=True)
+
+
 class CqlTimestampSequencedItem(Model):
     """Stores timestamp-sequenced items in Cassandra."""
 
@@ -0,0 +1,145 @@
+import zlib
+from abc import ABCMeta, abstractmethod
+from collections import Counter
+
+import six
+
+from eventsourcing.exceptions import DataIntegrityError
+
+# First byte of compressed data. It isn't the first byte of JSON text, of
+# binary codec data, or of base64 ciphertext, so stored data that isn't
+# compressed (e.g. data stored before compression was used) is recognised.
+COMPRESSED = 0xff
+
+
+class AbstractCompressor(six.with_metaclass(ABCMeta)):
+    """
+    Compresses the data of sequenced items.
+    """
+
+    @abstractmethod
+    def compress(self, data, topic):
+        """
+        Returns bytes for the given data (text is encoded as UTF-8) of an item with the given topic.
+        """
+
+    @abstractmethod
+    def decompress(self, data):
+        """
+        Returns the bytes that were compressed, or the given data if it isn't compressed.
+        """
+
+
+class ZlibCompressor(AbstractCompressor):
+    """
+    Compresses data with zlib (raw deflate, without the zlib header).
+
+    Compressed data starts with a header byte and the ID of the preset
+    dictionary (zero if there isn't one). Small items compress much better
+    with a dictionary of the field names and values that repeat in items
+    with the same topic. The last dictionary added for a topic is used to
+    compress its items. Earlier dictionaries are kept, so that items
+    compressed with them can be decompressed.
+
+    Data that doesn't get smaller is stored without compression.
+    """
+
+    def __init__(self, level=6, dictionaries=None):
+        self.level = level
+        self._dictionaries = {}
+        self._topic_dictionaries = {}
+        for dictionary_id, topic, dictionary in dictionaries or ():
+            self.add_dictionary(dictionary_id, topic, dictionary)
+
+    def add_dictionary(self, dictionary_id, topic, dictionary):
+        """
+        Adds preset dictionary with given ID (an integer from 1 to 255), to be used for items with given topic.
+        """
+        if six.PY2:
+            raise ValueError("Preset dictionaries are not supported by zlib on Python 2")
+        assert isinstance(dictionary, six.binary_type), type(dictionary)
+        if not 0 < dictionary_id < 256:
+            raise ValueError("Dictionary ID must be from 1 to 255: {}".format(dictionary_id))
+        if self._dictionaries.get(dictionary_id, dictionary) != dictionary:
+            raise ValueError("Dictionary ID already has a different dictionary: {}".format(dictionary_id))
+        self._dictionaries[dictionary_id] = dictionary
+        self._topic_dictionaries[topic] = dictionary_id
+
+    def compress(self, data, topic):
+        if isinstance(data, six.text_type):
+            data = data.encode('utf8')
+        dictionary_id = self._topic_dictionaries.get(topic, 0)
+        if dictionary_id:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS,
+                                          zdict=self._get_dictionary(dictionary_id))
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = compressor.compress(data) + compressor.flush()
+        if len(compressed) + 2 >= len(data):
+            return data
+        return bytes(bytearray([COMPRESSED, dictionary_id])) + compressed
+
+    def decompress(self, data):
+        if isinstance(data, six.text_type) or bytearray(data[:1]) != bytearray([COMPRESSED]):
+            return data
+        dictionary_id = bytearray(data[1:2])[0]
+        if dictionary_id:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=self._get_dictionary(dictionary_id))
+        else:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        return decompressor.decompress(bytes(data[2:])) + decompressor.flush()
+
+    def _get_dictionary(self, dictionary_id):
+        try:
+            return self._dictionaries[dictionary_id]
+        except KeyError:
+            raise DataIntegrityError("Preset dictionary not found: {}".format(dictionary_id))
+
+
+def train_dictionary(samples, size=4096, ngram_size=8, min_fraction=0.5):
+    """
+    Returns preset dictionary made from the substrings that occur in most of the given samples.
+
+    The samples are the data (e.g. JSON text) of items with the same topic.
+    Substrings are runs of overlapping n-grams that occur in at least the
+    given fraction of the samples. The most common substrings are put at
+    the end, where zlib finds them with the shortest distances.
+    """
+    samples = [s.encode('utf8') if isinstance(s, six.text_type) else bytes(s) for s in samples]
+    if not samples:
+        return b''
+
+    # Count the samples that each n-gram occurs in.
+    ngram_counts = Counter()
+    for sample in samples:
+        ngram_counts.update(set(sample[i:i + ngram_size] for i in range(len(sample) - ngram_size + 1)))
+    threshold = max(1, int(len(samples) * min_fraction))
+
+    # Count the samples that each run of common n-grams occurs in.
+    substring_counts = Counter()
+    for sample in samples:
+        substrings = set()
+        start = end = None
+        for i in range(len(sample) - ngram_size + 1):
+            if ngram_counts[sample[i:i + ngram_size]] < threshold:
+                continue
+            if end is not None and i <= end:
+                end = i + ngram_size
+            else:
+                if start is not None:
+                    substrings.add(sample[start:end])
+                start, end = i, i + ngram_size
+        if start is not None:
+            substrings.add(sample[start:end])
+        substring_counts.update(substrings)
+
+    # Pick the substrings that save the most, until the dictionary is full.
+    chosen = []
+    length = 0
+    for substring, count in sorted(substring_counts.items(), key=lambda x: (-x[1] * len(x[0]), x[0])):
+        if length + len(substring) > size:
+            continue
+        chosen.append((count, substring))
+        length += len(substring)
+    chosen.sort(key=lambda x: x[0])
+    return b''.join(substring for _, substring in chosen)
@@ -41,3 +41,7 @@ class DatastoreConnectionError(DatastoreError):
 
 class DatastoreTableError(DatastoreError):
     pass
+
+
+class DatastoreLockError(DatastoreError):
+    pass
@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from functools import reduce
 
 from copy import deepcopy
@@ -64,8 +65,24 @@ class EventPlayer(object):
             domain_events = reversed(list(domain_events))
 
         # Replay the domain events, starting with the initial state.
+        #  - If the events are retrieved in pages, they are folded into the state
+        #    as they are retrieved, so only a page of events is held at a time.
         return self.replay_events(initial_state, domain_events)
 
+    def replay_entities(self, entity_ids, gt=None, gte=None, lt=None, lte=None, initial_states=None):
+        """
+        Reconstitutes many domain entities, from domain events retrieved from the event store together.
+
+        The range arguments, and the initial states, can be dicts of values for particular entities.
+        Returns an ordered dict of entities (None for entities that don't exist).
+        """
+        initial_states = initial_states or {}
+        domain_events = self.event_store.get_domain_events_many(entity_ids, gt=gt, gte=gte, lt=lt, lte=lte)
+        entities = OrderedDict()
+        for entity_id, entity_events in domain_events.items():
+            entities[entity_id] = self.replay_events(initial_states.get(entity_id), entity_events)
+        return entities
+
     def replay_events(self, initial_state, domain_events):
         """
         Mutates initial state using the sequence of domain events.
@@ -76,8 +93,13 @@ class EventPlayer(object):
         """
         Returns domain events for given entity ID.
         """
-        # Get entity's domain events from the event store.
-        domain_events = self.event_store.get_domain_events(
+        # Get entity's domain events from the event store. If the events are
+        # paged, they are iterated, so only a page of events is held at a time.
+        if self.page_size:
+            get_domain_events = self.event_store.iter_domain_events
+        else:
+            get_domain_events = self.event_store.get_domain_events
+        domain_events = get_domain_events(
             entity_id=entity_id,
             gt=gt,
             gte=gte,
@@ -104,6 +104,34 @@ class EventSourcedRepository(AbstractEntityRepository):
         # Replay domain events.
         return self.event_player.replay_entity(entity_id, gte=gte, lte=lte, initial_state=initial_state)
 
+    def get_entities(self, entity_ids, lte=None):
+        """
+        Returns ordered dict of entities with given IDs, with None for entities
+        that were never created or have been discarded.
+
+        The snapshots of all the entities are retrieved together, and then
+        the domain events of all the entities (since their snapshots).
+        """
+        entity_ids = list(entity_ids)
+
+        # Get the snapshots.
+        if self._snapshot_strategy is not None:
+            snapshots = self._snapshot_strategy.get_snapshots(entity_ids, lte=lte)
+        else:
+            snapshots = {}
+
+        # Decide the initial states, and after when we need to get the events.
+        initial_states = {}
+        gtes = {}
+        for entity_id, snapshot in snapshots.items():
+            if snapshot is not None:
+                initial_state = entity_from_snapshot(snapshot)
+                initial_states[entity_id] = initial_state
+                gtes[entity_id] = initial_state._version
+
+        # Replay domain events.
+        return self.event_player.replay_entities(entity_ids, gte=gtes, lte=lte, initial_states=initial_states)
+
     # def fastforward(self, stale_entity, lt=None, lte=None):
     #     """
     #     Mutates an instance of an entity, according to the events that have occurred since its version.
@@ -1,5 +1,6 @@
 # coding=utf-8
 from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
 
 import six
 
@@ -18,9 +19,39 @@ class AbstractEventStore(six.with_metaclass(ABCMeta)):
 
     @abstractmethod
     def get_domain_events(self, entity_id, gt=None, gte=None, lt=None, lte=None, limit=None, is_ascending=True,
-                          page_size=None):
+                          page_size=None, event_filter=None, is_lazy=False, topics=None):
         """
         Returns domain events for given entity ID.
+
+        If topics are given, only events with one of the topics are returned. The
+        topics are selected by the datastore, and the limit applies to those events.
+
+        If page_size is given, the events are retrieved in pages of that size.
+        A list is returned either way (see iter_domain_events()).
+
+        If event_filter is given, it is called with a lazy domain event for each
+        event, and only the events for which it returns True are returned, so that
+        the events it skips are never decoded. The limit applies before filtering.
+        If is_lazy is True, lazy domain events are returned.
+        """
+
+    @abstractmethod
+    def iter_domain_events(self, entity_id, gt=None, gte=None, lt=None, lte=None, limit=None, is_ascending=True,
+                           page_size=None, event_filter=None, is_lazy=False, topics=None):
+        """
+        Returns iterator of domain events for given entity ID, that retrieves and
+        deserializes the events one page at a time, as they are needed.
+
+        The arguments are the same as for get_domain_events().
+        """
+
+    @abstractmethod
+    def get_domain_events_many(self, entity_ids, gt=None, gte=None, lt=None, lte=None, limit=None,
+                               is_ascending=True):
+        """
+        Returns ordered dict of lists of domain events, for each of the given entity IDs.
+
+        The range arguments can be dicts of values for particular entities.
         """
 
     @abstractmethod
@@ -36,20 +67,49 @@ class AbstractEventStore(six.with_metaclass(ABCMeta)):
         """
 
     @abstractmethod
-    def all_domain_events(self):
+    def get_head(self, entity_id):
         """
-        Returns all domain events in the event store.
+        Returns the position and topic of the most recent domain event for given entity ID, without decoding it.
+        """
+
+    @abstractmethod
+    def get_heads(self, entity_ids):
+        """
+        Returns ordered dict of the heads of the given entities (None for entities that have no events).
+        """
+
+    @abstractmethod
+    def all_domain_events(self, topics=None):
+        """
+        Returns all domain events in the event store (only those with one of the topics, if given).
+        """
+
+    @abstractmethod
+    def iter_partition(self, partition, num_partitions, after=None, page_size=1000, topics=None):
+        """
+        Yields (checkpoint, domain event) pairs, for the events in one of a number of disjoint partitions
+        of the entities. Reading can continue from after the last checkpoint.
+        """
+
+    @abstractmethod
+    def read_all(self, after=None, limit=None, topics=None):
+        """
+        Returns list of (position, domain event) pairs, in the order the events were recorded.
+
+        If topics are given, only events with one of the topics are read.
         """
 
 
 class EventStore(AbstractEventStore):
     iterator_class = SequencedItemIterator
 
-    def __init__(self, active_record_strategy, sequenced_item_mapper=None):
+    def __init__(self, active_record_strategy, sequenced_item_mapper=None, iterator_class=None):
         assert isinstance(active_record_strategy, AbstractActiveRecordStrategy), active_record_strategy
         assert isinstance(sequenced_item_mapper, AbstractSequencedItemMapper), sequenced_item_mapper
         self.active_record_strategy = active_record_strategy
         self.sequenced_item_mapper = sequenced_item_mapper
+        if iterator_class is not None:
+            self.iterator_class = iterator_class
 
     def append(self, domain_event):
         # Serialize the domain event as a sequenced item.
@@ -67,35 +127,110 @@ class EventStore(AbstractEventStore):
         return self.sequenced_item_mapper.to_sequenced_item(domain_event)
 
     def get_domain_events(self, entity_id, gt=None, gte=None, lt=None, lte=None, limit=None, is_ascending=True,
-                          page_size=None):
-        # Get all the sequenced items for the entity.
+                          page_size=None, event_filter=None, is_lazy=False, topics=None):
         if page_size:
-            sequenced_items = self.iterator_class(
-                active_record_strategy=self.active_record_strategy,
-                sequence_id=entity_id,
-                page_size=page_size,
+            # Get pages of sequenced items for the entity, deserialized by the iterator.
+            return list(self.iter_domain_events(
+                entity_id=entity_id,
                 gt=gt,
                 gte=gte,
                 lt=lt,
                 lte=lte,
                 limit=limit,
                 is_ascending=is_ascending,
-            )
+                page_size=page_size,
+                event_filter=event_filter,
+                is_lazy=is_lazy,
+                topics=topics,
+            ))
+
+        # Get all the sequenced items for the entity.
+        sequenced_items = self.active_record_strategy.get_items(
+            sequence_id=entity_id,
+            gt=gt,
+            gte=gte,
+            lt=lt,
+            lte=lte,
+            limit=limit,
+            query_ascending=is_ascending,
+            results_ascending=is_ascending,
+            topics=self.encode_topics(topics),
+        )
+
+        # Deserialize to domain events, in one pass unless events are filtered or lazy.
+        if event_filter is None and not is_lazy:
+            return self.sequenced_item_mapper.from_sequenced_items(sequenced_items)
+        from_sequenced_item = self.get_item_func(event_filter=event_filter, is_lazy=is_lazy)
+        domain_events = [from_sequenced_item(i) for i in sequenced_items]
+        if event_filter is not None:
+            domain_events = [e for e in domain_events if e is not None]
+        return domain_events
+
+    def iter_domain_events(self, entity_id, gt=None, gte=None, lt=None, lte=None, limit=None, is_ascending=True,
+                           page_size=None, event_filter=None, is_lazy=False, topics=None):
+        # Unless events are filtered or lazy, decode each page of items in one pass.
+        if event_filter is None and not is_lazy:
+            from_sequenced_item = None
+            from_sequenced_items = self.sequenced_item_mapper.from_sequenced_items
         else:
-            sequenced_items = self.active_record_strategy.get_items(
-                sequence_id=entity_id,
-                gt=gt,
-                gte=gte,
-                lt=lt,
-                lte=lte,
-                limit=limit,
-                query_ascending=is_ascending,
-                results_ascending=is_ascending,
-            )
+            from_sequenced_item = self.get_item_func(event_filter=event_filter, is_lazy=is_lazy)
+            from_sequenced_items = None
+
+        # Get pages of sequenced items for the entity, deserialized by the iterator. The
+        # iterator isn't listed, so that the events are held in memory a page at a time.
+        domain_events = self.iterator_class(
+            active_record_strategy=self.active_record_strategy,
+            sequence_id=entity_id,
+            page_size=page_size,
+            gt=gt,
+            gte=gte,
+            lt=lt,
+            lte=lte,
+            limit=limit,
+            is_ascending=is_ascending,
+            item_func=from_sequenced_item,
+            page_func=from_sequenced_items,
+            topics=self.encode_topics(topics),
+        )
+        if event_filter is not None:
+            domain_events = (e for e in domain_events if e is not None)
+        return domain_events
+
+    def get_item_func(self, event_filter=None, is_lazy=False):
+        """
+        Returns function that deserializes a sequenced item, or returns None if the event is filtered out.
+        """
+        if event_filter is None and not is_lazy:
+            return self.sequenced_item_mapper.from_sequenced_item
+
+        from_sequenced_item_lazy = self.sequenced_item_mapper.from_sequenced_item_lazy
+
+        def from_sequenced_item(sequenced_item):
+            domain_event = from_sequenced_item_lazy(sequenced_item)
+            if event_filter is not None and not event_filter(domain_event):
+                return None
+            return domain_event if is_lazy else domain_event.domain_event
+
+        return from_sequenced_item
+
+    def get_domain_events_many(self, entity_ids, gt=None, gte=None, lt=None, lte=None, limit=None,
+                               is_ascending=True):
+        sequenced_items = self.active_record_strategy.get_items_many(
+            sequence_ids=entity_ids,
+            gt=gt,
+            gte=gte,
+            lt=lt,
+            lte=lte,
+            limit=limit,
+            query_ascending=is_ascending,
+            results_ascending=is_ascending,
+        )
 
         # Deserialize to domain events.
-        domain_events = six.moves.map(self.sequenced_item_mapper.from_sequenced_item, sequenced_items)
-        domain_events = list(domain_events)
+        from_sequenced_items = self.sequenced_item_mapper.from_sequenced_items
+        domain_events = OrderedDict()
+        for entity_id, items in sequenced_items.items():
+            domain_events[entity_id] = from_sequenced_items(items)
         return domain_events
 
     def get_domain_event(self, entity_id, eq):
@@ -114,7 +249,42 @@ class EventStore(AbstractEventStore):
         except IndexError:
             pass
 
-    def all_domain_events(self):
-        all_items = self.active_record_strategy.all_items()
+    def get_head(self, entity_id):
+        return self.decode_head(self.active_record_strategy.get_head(entity_id))
+
+    def get_heads(self, entity_ids):
+        heads = self.active_record_strategy.get_heads(entity_ids)
+        for entity_id, head in heads.items():
+            heads[entity_id] = self.decode_head(head)
+        return heads
+
+    def encode_topics(self, topics):
+        """
+        Returns the topics that items may be stored with (e.g. a topic and its code), for selecting items by topic.
+        """
+        if topics is None:
+            return None
+        return [s for t in topics for s in self.sequenced_item_mapper.get_stored_topics(t)]
+
+    def decode_head(self, head):
+        if head is None:
+            return None
+        return head._replace(topic=self.sequenced_item_mapper.decode_topic(head.topic))
+
+    def all_domain_events(self, topics=None):
+        all_items = self.active_record_strategy.all_items(topics=self.encode_topics(topics))
         return map(self.sequenced_item_mapper.from_sequenced_item, all_items)
 
+    def iter_partition(self, partition, num_partitions, after=None, page_size=1000, topics=None):
+        pairs = self.active_record_strategy.iter_partition(
+            partition, num_partitions, after=after, page_size=page_size, topics=self.encode_topics(topics)
+        )
+        from_sequenced_item = self.sequenced_item_mapper.from_sequenced_item
+        for checkpoint, item in pairs:
+            yield checkpoint, from_sequenced_item(item)
+
+    def read_all(self, after=None, limit=None, topics=None):
+        pairs = self.active_record_strategy.read_all(after=after, limit=limit, topics=self.encode_topics(topics))
+        pairs = list(pairs)
+        domain_events = self.sequenced_item_mapper.from_sequenced_items([item for _, item in pairs])
+        return [(position, domain_event) for (position, _), domain_event in zip(pairs, domain_events)]
@@ -0,0 +1,523 @@
+import json
+import mmap
+import os
+import struct
+import zlib
+from itertools import islice
+from uuid import UUID
+
+import six
+
+from eventsourcing.exceptions import DataIntegrityError
+from eventsourcing.infrastructure.datastore import DatastoreLockError
+from eventsourcing.infrastructure.filesystem.datastore import FileDatastore
+from eventsourcing.infrastructure.pythonobjects.activerecords import PythonObjectsActiveRecordStrategy
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows.
+    fcntl = None
+
+# Each record starts with the length of the rest of the record, and its checksum.
+RECORD_PREFIX = struct.Struct('<II')
+
+# Flags in the record header.
+DATA_IS_TEXT = 0
+DATA_IS_BYTES = 1
+IS_LAST_IN_BATCH = 0
+IS_CONTINUED = 1
+
+# Locations of records are indexed as integers, combining segment number and offset.
+OFFSET_BITS = 40
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+
+class FileActiveRecordStrategy(PythonObjectsActiveRecordStrategy):
+    """
+    Writes sequenced items to append-only segment files.
+
+    The positions of each sequence are indexed in memory, along with
+    the locations of the records in the segment files. Records are read
+    by unpacking them directly from memory-mapped segment files. On
+    Python 3, data that is bytes is returned as a memoryview of the
+    segment file, so it isn't copied.
+
+    Segment files are synced to disk after every "fsync_interval" calls
+    to append_item(). The index is checkpointed to a file when a segment
+    is full, when the strategy is closed (and optionally after every
+    "checkpoint_interval" items), so that when the files are opened again
+    only the records written after the checkpoint need to be scanned. After
+    a crash, that is at most the last segment, whose incomplete batch of
+    records is discarded. Corruption found in any other segment is raised
+    as a DataIntegrityError.
+
+    Only one strategy can have the files of a table open at a time. On
+    platforms that have fcntl, a lock file enforces this, and otherwise
+    it is up to the application to have a single writer.
+    """
+
+    segment_filename_format = '{:08d}.segment'
+    checkpoint_filename = 'index.checkpoint'
+    lock_filename = 'lock'
+
+    def __init__(self, datastore, max_segment_size=64 * 1024 * 1024, fsync_interval=1, checkpoint_interval=None,
+                 *args, **kwargs):
+        super(FileActiveRecordStrategy, self).__init__(*args, **kwargs)
+        assert isinstance(datastore, FileDatastore), datastore
+        self.datastore = datastore
+        self.max_segment_size = max_segment_size
+        self.fsync_interval = fsync_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.header = struct.Struct('<16s' + self.active_record_class.position_format + 'BBHI')
+        self._is_open = False
+        self._table_path = None
+        self._lock_file = None
+        self._segment_file = None
+        self._segment_number = 0
+        self._segment_size = 0
+        self._mmaps = {}
+        self._appends_since_fsync = 0
+        self._items_since_checkpoint = 0
+
+    def append_item(self, sequenced_item):
+        if isinstance(sequenced_item, list):
+            items = sequenced_item
+        else:
+            items = [sequenced_item]
+
+        if not items:
+            return
+
+        with self._lock:
+            self._open()
+
+            # Check all the items can be appended, before writing any of them.
+            new_positions = set()
+            for item in items:
+                assert isinstance(item, self.sequenced_item_class), (type(item), self.sequenced_item_class)
+                key = (item.sequence_id, item.position)
+                if key in new_positions or self._find_position(item.sequence_id, item.position) is not None:
+                    self.raise_sequence_item_error(item.sequence_id, item.position, "position is taken")
+                new_positions.add(key)
+
+            # Pack the items as a batch of records.
+            last = len(items) - 1
+            records = [self.pack_record(item, IS_CONTINUED if i < last else IS_LAST_IN_BATCH)
+                       for i, item in enumerate(items)]
+
+            # Start a new segment, if the current segment is full.
+            if self._segment_size >= self.max_segment_size:
+                self._start_segment(self._segment_number + 1)
+
+            # Write the records.
+            try:
+                self._segment_file.write(b''.join(records))
+                self._segment_file.flush()
+            except Exception:
+                self._discard_partial_write()
+                raise
+
+            # Index the locations of the records.
+            offset = self._segment_size
+            location = self._segment_number << OFFSET_BITS
+            for item, record in zip(items, records):
+                self._insert_position(item.sequence_id, item.position, location | offset)
+                offset += len(record)
+            self._segment_size = offset
+
+            # Sync the segment file to disk.
+            self._appends_since_fsync += 1
+            if self._appends_since_fsync >= self.fsync_interval:
+                self.sync()
+
+            # Checkpoint the index.
+            self._items_since_checkpoint += len(items)
+            if self.checkpoint_interval and self._items_since_checkpoint >= self.checkpoint_interval:
+                self.checkpoint()
+
+    def get_item(self, sequence_id, eq):
+        with self._lock:
+            self._open()
+            index = self._find_position(sequence_id, eq)
+            if index is None:
+                self.raise_index_error(eq)
+            return self._read_item(self._sequences[sequence_id][1][index], sequence_id)
+
+    def get_items(self, sequence_id, gt=None, gte=None, lt=None, lte=None, limit=None,
+                  query_ascending=True, results_ascending=True, topics=None):
+
+        assert limit is None or limit >= 1, limit
+
+        with self._lock:
+            self._open()
+            if topics is None:
+                locations = self._get_range(sequence_id, gt, gte, lt, lte, limit, query_ascending)
+                items = [self._read_item(location, sequence_id) for location in locations]
+            else:
+                # Read records until the limit of items that have the topics is reached.
+                locations = self._get_range(sequence_id, gt, gte, lt, lte, None, query_ascending)
+                if not query_ascending:
+                    locations = reversed(locations)
+                items = (self._read_item(location, sequence_id) for location in locations)
+                items = self.filter_topics(items, topics, limit)
+                if not query_ascending:
+                    items.reverse()
+
+        if not results_ascending:
+            items.reverse()
+
+        return items
+
+    def get_head(self, sequence_id):
+        # The topic is read from the last record of the sequence.
+        with self._lock:
+            self._open()
+            try:
+                locations = self._sequences[sequence_id][1]
+            except KeyError:
+                return None
+            return self.make_head(self._read_item(locations[-1], sequence_id))
+
+    def all_items(self, topics=None):
+        """
+        Yields all items, in the order they were written.
+        """
+        topics = None if topics is None else frozenset(topics)
+        for _, item in self._iter_records():
+            if topics is None or item.topic in topics:
+                yield item
+
+    def read_all(self, after=None, limit=None, topics=None):
+        """
+        Returns list of (position, item) pairs, where the position is the location of the record.
+
+        Since records are only ever appended to the segment files, their
+        locations increase in the order the records were written.
+        """
+        records = self._iter_records(after)
+        if topics is not None:
+            topics = frozenset(topics)
+            records = ((location, item) for location, item in records if item.topic in topics)
+        if limit is not None:
+            records = islice(records, limit)
+        return list(records)
+
+    def read_partition(self, partition, num_partitions, after=None, limit=None, topics=None):
+        """
+        Returns list of (position, item) pairs for the partition, where the position is the location of the record.
+        """
+        lo, hi = self.get_partition_range(partition, num_partitions)
+        topics = None if topics is None else frozenset(topics)
+        records = ((location, item) for location, item in self._iter_records(after)
+                   if self.is_in_partition_range(item.sequence_id, lo, hi) and (topics is None or item.topic in topics))
+        return list(islice(records, limit))
+
+    def _iter_records(self, after=None):
+        """
+        Yields (location, item) pairs, for the records after the given location.
+        """
+        with self._lock:
+            self._open()
+            segment_numbers = self._list_segment_numbers()
+            if after is None:
+                start_segment_number = 0
+                offset = 0
+            else:
+                # Start after the given record.
+                start_segment_number = after >> OFFSET_BITS
+                offset = after & OFFSET_MASK
+                mm = self._get_mmap(start_segment_number, offset + RECORD_PREFIX.size)
+                offset += RECORD_PREFIX.size + RECORD_PREFIX.unpack_from(mm, offset)[0]
+
+        for segment_number in segment_numbers:
+            if segment_number < start_segment_number:
+                continue
+            elif segment_number > start_segment_number:
+                offset = 0
+            while True:
+                with self._lock:
+                    if segment_number == self._segment_number:
+                        segment_size = self._segment_size
+                    else:
+                        segment_size = os.path.getsize(self._get_segment_path(segment_number))
+                    if offset >= segment_size:
+                        break
+                    location = (segment_number << OFFSET_BITS) | offset
+                    mm = self._get_mmap(segment_number, offset + RECORD_PREFIX.size)
+                    length = RECORD_PREFIX.unpack_from(mm, offset)[0]
+                    item = self._read_item(location)
+                offset += RECORD_PREFIX.size + length
+                yield location, item
+
+    def pack_record(self, item, is_continued=IS_LAST_IN_BATCH):
+        """
+        Returns bytes representing given sequenced item, prefixed with its length and checksum.
+        """
+        assert isinstance(item.sequence_id, UUID), type(item.sequence_id)
+        topic = item.topic.encode('utf8')
+        data = item.data
+        if isinstance(data, six.text_type):
+            data = data.encode('utf8')
+            data_type = DATA_IS_TEXT
+        else:
+            data_type = DATA_IS_BYTES
+        header = self.header.pack(item.sequence_id.bytes, item.position, is_continued, data_type,
+                                  len(topic), len(data))
+        body = header + topic + data
+        return RECORD_PREFIX.pack(len(body), zlib.crc32(body) & 0xffffffff) + body
+
+    def sync(self):
+        """
+        Flushes and syncs the current segment file to disk.
+        """
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.flush()
+                os.fsync(self._segment_file.fileno())
+            self._appends_since_fsync = 0
+
+    def checkpoint(self):
+        """
+        Writes the index to the checkpoint file.
+        """
+        with self._lock:
+            self._open()
+            self.sync()
+            checkpoint = {
+                'segment_number': self._segment_number,
+                'segment_size': self._segment_size,
+                'sequences': {sequence_id.hex: [positions, locations]
+                              for sequence_id, (positions, locations) in self._sequences.items()},
+            }
+            checkpoint_path = os.path.join(self._table_path, self.checkpoint_filename)
+            temp_path = checkpoint_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(checkpoint, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(temp_path, checkpoint_path)
+            self._items_since_checkpoint = 0
+
+    def close(self):
+        with self._lock:
+            if self._is_open:
+                self.checkpoint()
+                self._segment_file.close()
+                self._segment_file = None
+                self._mmaps.clear()
+                self._sequences = {}
+                self._is_open = False
+                self._release_lock()
+
+    def _open(self):
+        if self._is_open:
+            return
+        self._table_path = self.datastore.get_table_path(self.active_record_class)
+        self._acquire_lock()
+        segment_numbers = self._list_segment_numbers()
+
+        # Start from the checkpoint, if the segment files still agree with it.
+        checkpoint = self._read_checkpoint()
+        if checkpoint is not None and segment_numbers and checkpoint['segment_number'] in segment_numbers and (
+                os.path.getsize(self._get_segment_path(checkpoint['segment_number'])) >=
+                checkpoint['segment_size']):
+            self._sequences = {UUID(hex=sequence_id): (positions, locations)
+                               for sequence_id, (positions, locations) in checkpoint['sequences'].items()}
+            start_segment_number = checkpoint['segment_number']
+            start_offset = checkpoint['segment_size']
+        else:
+            self._sequences = {}
+            start_segment_number = segment_numbers[0] if segment_numbers else 0
+            start_offset = 0
+
+        # Index the records written after the checkpoint.
+        for segment_number in segment_numbers:
+            if segment_number < start_segment_number:
+                continue
+            offset = start_offset if segment_number == start_segment_number else 0
+            is_last = segment_number == segment_numbers[-1]
+            self._segment_size = self._scan_segment(segment_number, offset, is_last)
+            self._segment_number = segment_number
+
+        if not segment_numbers:
+            self._segment_number = 0
+            self._segment_size = 0
+
+        self._segment_file = open(self._get_segment_path(self._segment_number), 'ab')
+        self._is_open = True
+
+    def _scan_segment(self, segment_number, offset, is_last):
+        """
+        Indexes the records in a segment file from the given offset.
+
+        The last segment is truncated after its last complete batch of
+        records, since a crash can leave an incomplete batch at the end
+        of it. Earlier segments were full before the next segment was
+        started, so an incomplete or corrupt record in them is an error.
+
+        Returns the size of the segment.
+        """
+        segment_path = self._get_segment_path(segment_number)
+        segment_size = os.path.getsize(segment_path)
+        if segment_size == 0:
+            return 0
+        with open(segment_path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            batch = []
+            batch_offset = offset
+            while offset + RECORD_PREFIX.size <= segment_size:
+                length, checksum = RECORD_PREFIX.unpack_from(mm, offset)
+                start = offset + RECORD_PREFIX.size
+                end = start + length
+                if length < self.header.size or end > segment_size:
+                    break
+                if zlib.crc32(mm[start:end]) & 0xffffffff != checksum:
+                    break
+                sequence_id, position, is_continued = self.header.unpack_from(mm, start)[:3]
+                batch.append((UUID(bytes=sequence_id), position, (segment_number << OFFSET_BITS) | offset))
+                offset = end
+                if is_continued == IS_LAST_IN_BATCH:
+                    for sequence_id, position, location in batch:
+                        self._insert_position(sequence_id, position, location)
+                    batch = []
+                    batch_offset = offset
+        finally:
+            mm.close()
+
+        # Discard any incomplete batch of records.
+        if batch_offset < segment_size:
+            if not is_last:
+                raise DataIntegrityError("Segment file is corrupt after offset {}: {}".format(
+                    batch_offset, segment_path
+                ))
+            with open(segment_path, 'r+b') as f:
+                f.truncate(batch_offset)
+        return batch_offset
+
+    def _discard_partial_write(self):
+        """
+        Truncates the current segment file to the end of the last complete write, and reopens it.
+
+        If the segment file can't be truncated, the strategy is closed
+        (without a checkpoint), so that the segment files are scanned
+        when it is opened again, which discards any incomplete batch.
+        """
+        segment_path = self._get_segment_path(self._segment_number)
+        try:
+            self._segment_file.close()
+        except (IOError, OSError):
+            # Closing flushes any bytes left in the buffer, which may fail again.
+            pass
+        self._mmaps.pop(self._segment_number, None)
+        try:
+            with open(segment_path, 'r+b') as f:
+                f.truncate(self._segment_size)
+            self._segment_file = open(segment_path, 'ab')
+        except (IOError, OSError):
+            self._segment_file = None
+            self._mmaps.clear()
+            self._sequences = {}
+            self._is_open = False
+
+    def _start_segment(self, segment_number):
+        self.sync()
+        self._segment_file.close()
+        self._segment_number = segment_number
+        self._segment_size = 0
+        self._segment_file = open(self._get_segment_path(segment_number), 'ab')
+
+        # Checkpoint the index, so that full segments aren't scanned again.
+        self.checkpoint()
+
+    def _acquire_lock(self):
+        """
+        Locks the table directory, so that only this strategy writes to its segment files.
+        """
+        if fcntl is None or self._lock_file is not None:
+            return
+        lock_file = open(os.path.join(self._table_path, self.lock_filename), 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            lock_file.close()
+            raise DatastoreLockError("Table is locked by another writer: {}".format(self._table_path))
+        self._lock_file = lock_file
+
+    def _release_lock(self):
+        if self._lock_file is not None:
+            # Closing the file releases the lock.
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _read_item(self, location, sequence_id=None):
+        """
+        Returns sequenced item unpacked from the record at given location.
+        """
+        segment_number = location >> OFFSET_BITS
+        offset = location & OFFSET_MASK
+        start = offset + RECORD_PREFIX.size + self.header.size
+        mm = self._get_mmap(segment_number, start)
+        record_sequence_id, position, _, data_type, topic_length, data_length = self.header.unpack_from(
+            mm, offset + RECORD_PREFIX.size
+        )
+        mm = self._get_mmap(segment_number, start + topic_length + data_length)
+        topic = six.text_type(mm[start:start + topic_length], 'utf8')
+        data = mm[start + topic_length:start + topic_length + data_length]
+        if data_type == DATA_IS_TEXT:
+            data = six.text_type(data, 'utf8')
+        if sequence_id is None:
+            sequence_id = UUID(bytes=record_sequence_id)
+        return self.sequenced_item_class(sequence_id, position, topic, data)
+
+    def _get_mmap(self, segment_number, end):
+        """
+        Returns memory map of segment file, which extends at least to the given end.
+
+        On Python 3, a memoryview of the map is returned, so that slices of it aren't copied.
+        """
+        mm = self._mmaps.get(segment_number)
+        if mm is None or len(mm) < end:
+            # Remap the file, since it has grown. The previous map is closed when it is no longer used.
+            with open(self._get_segment_path(segment_number), 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if not six.PY2:
+                mm = memoryview(mm)
+            self._mmaps[segment_number] = mm
+        return mm
+
+    def _read_checkpoint(self):
+        checkpoint_path = os.path.join(self._table_path, self.checkpoint_filename)
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                try:
+                    return json.load(f)
+                except ValueError:
+                    # The segment files are scanned instead.
+                    return None
+
+    def _list_segment_numbers(self):
+        suffix = self.segment_filename_format.format(0)[8:]
+        return sorted(int(name[:-len(suffix)]) for name in os.listdir(self._table_path) if name.endswith(suffix))
+
+    def _get_segment_path(self, segment_number):
+        return os.path.join(self._table_path, self.segment_filename_format.format(segment_number))
+
+
+class FileIntegerSequencedItem(object):
+    """Stores integer-sequenced items in segment files."""
+
+    __tablename__ = 'integer_sequenced_items'
+
+    # Position (index) of item in sequence, packed as a 64-bit integer.
+    position_format = 'q'
+
+
+class FileTimestampSequencedItem(object):
+    """Stores timestamp-sequenced items in segment files."""
+
+    __tablename__ = 'timestamp_sequenced_items'
+
+    # Position (timestamp) of item in sequence, packed as a double.
+    position_format = 'd'
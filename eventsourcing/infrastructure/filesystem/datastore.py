@@ -0,0 +1,53 @@
+import os
+import shutil
+
+from eventsourcing.infrastructure.datastore import Datastore, DatastoreConnectionError, DatastoreSettings, \
+    DatastoreTableError
+
+DEFAULT_FILES_PATH = 'eventsourcing_data'
+
+
+class FileSettings(DatastoreSettings):
+    PATH = os.getenv('FILES_PATH', DEFAULT_FILES_PATH)
+
+    def __init__(self, path=None):
+        self.path = path or self.PATH
+
+
+class FileDatastore(Datastore):
+    """
+    Keeps each table in its own directory, under the path given in the settings.
+    """
+
+    def __init__(self, **kwargs):
+        super(FileDatastore, self).__init__(**kwargs)
+        self._is_connected = False
+
+    def setup_connection(self):
+        assert isinstance(self.settings, FileSettings), self.settings
+        if not os.path.exists(self.settings.path):
+            os.makedirs(self.settings.path)
+        self._is_connected = True
+
+    def drop_connection(self):
+        self._is_connected = False
+
+    def setup_tables(self):
+        for table in self.tables:
+            table_path = self.get_table_path(table, check_exists=False)
+            if not os.path.exists(table_path):
+                os.makedirs(table_path)
+
+    def drop_tables(self):
+        for table in self.tables:
+            table_path = self.get_table_path(table, check_exists=False)
+            if os.path.exists(table_path):
+                shutil.rmtree(table_path)
+
+    def get_table_path(self, table, check_exists=True):
+        if not self._is_connected:
+            raise DatastoreConnectionError("Need to call setup_connection() first")
+        table_path = os.path.join(self.settings.path, table.__tablename__)
+        if check_exists and not os.path.exists(table_path):
+            raise DatastoreTableError("Table directory not found: {}".format(table_path))
+        return table_path
@@ -0,0 +1,161 @@
+from collections import OrderedDict, deque
+from threading import Condition
+from time import time
+
+import six
+
+from eventsourcing.exceptions import ConcurrencyError, GroupCommitError
+from eventsourcing.infrastructure.eventstore import AbstractEventStore
+
+
+class GroupCommitter(object):
+    """
+    Coalesces appends from many threads into group commits.
+
+    Each call to append() blocks until the given domain event (or list
+    of domain events) has been written to the event store. Appends that
+    arrive whilst another group is being written, or within the given
+    delay, are written together with a single call to the event store's
+    append() method, and so in one datastore transaction (if the active
+    record strategy writes lists of items in one transaction).
+
+    If the active record strategy can't write the items of many sequences
+    atomically (e.g. Cassandra, whose conditional batches can't span
+    partitions), the appends in a group are written together only with
+    the other appends for the same entities.
+
+    If writing a group fails with a concurrency error, the appends in
+    the group are written separately, so that the error is raised only
+    to the caller whose events caused it. Other errors are raised to all
+    the callers in the group, each as a new GroupCommitError, chained
+    from the error.
+    """
+
+    def __init__(self, event_store, max_group_size=100, max_delay=0):
+        assert isinstance(event_store, AbstractEventStore), event_store
+        assert max_group_size >= 1, max_group_size
+        self.event_store = event_store
+        self.max_group_size = max_group_size
+        self.max_delay = max_delay
+        self.group_counter = 0
+        active_record_strategy = getattr(event_store, 'active_record_strategy', None)
+        self.is_per_sequence = not getattr(active_record_strategy, 'can_append_many_sequences', True)
+        self._condition = Condition()
+        self._pending_appends = deque()
+        self._pending_events_count = 0
+        self._is_writing = False
+
+    def append(self, domain_event):
+        pending_append = PendingAppend(domain_event)
+        with self._condition:
+            self._pending_appends.append(pending_append)
+            self._pending_events_count += len(pending_append.events)
+            # Wake up the leader, in case the group is now full.
+            self._condition.notify_all()
+
+            while not pending_append.is_done:
+                if self._is_writing:
+                    # Wait for the leader to write the group.
+                    self._condition.wait()
+                else:
+                    # Become the leader, and write the next group.
+                    self._is_writing = True
+                    try:
+                        self._wait_for_group()
+                        group = self._take_group()
+                        self._condition.release()
+                        try:
+                            self._write_group(group)
+                        finally:
+                            self._condition.acquire()
+                    finally:
+                        self._is_writing = False
+                        self._condition.notify_all()
+
+        if pending_append.error is not None:
+            # Raise a new exception in each caller's thread, so tracebacks aren't mixed across threads.
+            error = pending_append.error
+            if isinstance(error, ConcurrencyError):
+                six.raise_from(ConcurrencyError(error), error)
+            six.raise_from(GroupCommitError("Failed to write events: {!r}".format(error)), error)
+
+    def _wait_for_group(self):
+        """
+        Waits until the group is full, or the delay has passed.
+        """
+        if self.max_delay:
+            deadline = time() + self.max_delay
+            while self._pending_events_count < self.max_group_size:
+                remaining = deadline - time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+    def _take_group(self):
+        """
+        Removes pending appends from the queue, up to the maximum group size.
+        """
+        group = []
+        group_size = 0
+        while self._pending_appends and (not group or group_size < self.max_group_size):
+            pending_append = self._pending_appends.popleft()
+            group.append(pending_append)
+            group_size += len(pending_append.events)
+        self._pending_events_count -= group_size
+        return group
+
+    def _write_group(self, group):
+        self.group_counter += 1
+        try:
+            if self.is_per_sequence:
+                for subgroup in self._split_group(group):
+                    self._write_appends(subgroup)
+            else:
+                self._write_appends(group)
+        finally:
+            for pending_append in group:
+                pending_append.is_done = True
+
+    @staticmethod
+    def _split_group(group):
+        """
+        Returns lists of the pending appends in the group that are for the same entities.
+        """
+        subgroups = OrderedDict()
+        for pending_append in group:
+            entity_ids = tuple(OrderedDict((e.entity_id, None) for e in pending_append.events))
+            subgroups.setdefault(entity_ids, []).append(pending_append)
+        return subgroups.values()
+
+    def _write_appends(self, group):
+        """
+        Writes the events of the pending appends with one call to the event store.
+        """
+        events = []
+        for pending_append in group:
+            events += pending_append.events
+        try:
+            self.event_store.append(events)
+        except ConcurrencyError as e:
+            if len(group) == 1:
+                group[0].error = e
+            else:
+                # Write the appends separately, to find which failed.
+                for pending_append in group:
+                    try:
+                        self.event_store.append(pending_append.events)
+                    except Exception as e:
+                        pending_append.error = e
+        except Exception as e:
+            for pending_append in group:
+                pending_append.error = e
+
+
+class PendingAppend(object):
+    def __init__(self, domain_event):
+        if isinstance(domain_event, (list, tuple)):
+            self.events = list(domain_event)
+        else:
+            self.events = [domain_event]
+        self.is_done = False
+        self.error = None
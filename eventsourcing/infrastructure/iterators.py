@@ -1,7 +1,10 @@
 from abc import ABCMeta, abstractmethod
-from threading import Thread
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from timeit import default_timer
 
 import six
+from six.moves.queue import Full, Queue
 
 from eventsourcing.infrastructure.activerecord import AbstractActiveRecordStrategy
 
@@ -10,10 +13,11 @@ class AbstractSequencedItemIterator(six.with_metaclass(ABCMeta)):
     DEFAULT_PAGE_SIZE = 1000
 
     def __init__(self, active_record_strategy, sequence_id, page_size=None, gt=None, gte=None, lt=None, lte=None,
-                 limit=None, is_ascending=True):
+                 limit=None, is_ascending=True, item_func=None, topics=None, page_func=None):
         assert isinstance(active_record_strategy, AbstractActiveRecordStrategy), type(active_record_strategy)
         assert isinstance(page_size, (six.integer_types, type(None)))
         assert isinstance(limit, (six.integer_types, type(None)))
+        assert item_func is None or page_func is None, "Can't map with both an item function and a page function"
         self.active_record_strategy = active_record_strategy
         self.sequence_id = sequence_id
         self.page_size = page_size or self.DEFAULT_PAGE_SIZE
@@ -24,8 +28,12 @@ class AbstractSequencedItemIterator(six.with_metaclass(ABCMeta)):
         self.limit = limit
         self.query_counter = 0
         self.page_counter = 0
+        self.page_sizes = []
         self.all_item_counter = 0
         self.is_ascending = is_ascending
+        self.item_func = item_func
+        self.page_func = page_func
+        self.topics = None if topics is None else list(topics)
         self._position = None
 
     def _inc_page_counter(self):
@@ -39,15 +47,46 @@ class AbstractSequencedItemIterator(six.with_metaclass(ABCMeta)):
         """
         self.page_counter += 1
 
-    def _inc_query_counter(self):
+    def _inc_query_counter(self, page_size=None):
         """
-        Increments the query counter.
+        Increments the query counter, and records the page size of the query.
         """
         self.query_counter += 1
+        if page_size is not None:
+            self.page_sizes.append(page_size)
 
     def _inc_all_event_counter(self):
         self.all_item_counter += 1
 
+    def _get_items(self, gt, gte, lt, lte, limit):
+        """
+        Returns a page of sequenced items, selected with the active record strategy.
+        """
+        sequenced_items = self.active_record_strategy.get_items(
+            sequence_id=self.sequence_id,
+            gt=gt,
+            gte=gte,
+            lt=lt,
+            lte=lte,
+            limit=limit,
+            query_ascending=self.is_ascending,
+            results_ascending=self.is_ascending,
+            topics=self.topics,
+        )
+        self._inc_query_counter(limit)
+        return sequenced_items
+
+    def _map_page(self, sequenced_items):
+        """
+        Returns list of items mapped with the page function, or the item function, if there is one.
+        """
+        if self.page_func is not None:
+            return self.page_func(sequenced_items)
+        elif self.item_func is not None:
+            return map_items(self.item_func, sequenced_items)
+        else:
+            return sequenced_items
+
     def _update_position(self, sequenced_item):
         assert isinstance(sequenced_item, self.active_record_strategy.sequenced_item_class), type(sequenced_item)
         self._position = sequenced_item.position
@@ -55,7 +94,8 @@ class AbstractSequencedItemIterator(six.with_metaclass(ABCMeta)):
     @abstractmethod
     def __iter__(self):
         """
-        Yields a continuous sequence of items.
+        Yields a continuous sequence of items (mapped with the item function or
+        the page function, if there is one).
         """
 
 
@@ -78,7 +118,7 @@ class SequencedItemIterator(AbstractSequencedItemIterator):
                 limit = self.page_size
 
             if limit == 0:
-                raise StopIteration
+                return
 
             # Get the events.
             if self._position is not None:
@@ -89,31 +129,31 @@ class SequencedItemIterator(AbstractSequencedItemIterator):
                     lt = self._position
                     lte = None
 
-            sequenced_items = self.active_record_strategy.get_items(
-                sequence_id=self.sequence_id,
-                gt=gt,
-                gte=gte,
-                lt=lt,
-                lte=lte,
-                limit=limit,
-                query_ascending=self.is_ascending,
-                results_ascending=self.is_ascending,
-            )
-
-            self._inc_query_counter()
+            sequenced_items = self._get_items(gt, gte, lt, lte, limit)
 
             # Start counting events in this page.
             page_item_counter = 0
 
+            # Map the whole page at once, if there is a page function.
+            if self.page_func is not None:
+                items = self.page_func(sequenced_items)
+            else:
+                items = None
+
             # Yield each stored event.
-            for sequenced_item in sequenced_items:
+            for i, sequenced_item in enumerate(sequenced_items):
 
                 # Count each event.
                 self._inc_all_event_counter()
                 page_item_counter += 1
 
                 # Yield the event.
-                yield sequenced_item
+                if items is not None:
+                    yield items[i]
+                elif self.item_func is not None:
+                    yield self.item_func(sequenced_item)
+                else:
+                    yield sequenced_item
 
                 # Remember the position as the last event.
                 self._update_position(sequenced_item)
@@ -123,115 +163,204 @@ class SequencedItemIterator(AbstractSequencedItemIterator):
                 self._inc_page_counter()
 
             # If that wasn't a full page, stop iterating (there can be no more items).
-            if page_item_counter != self.page_size:
-                raise StopIteration
-
-
-class ThreadedSequencedItemIterator(AbstractSequencedItemIterator):
-    def __iter__(self):
-        # Start a thread to get a page of events.
-        thread = self.start_thread()
-
-        # Get pages of stored events, until the page isn't full.
-        while True:
-            # Wait for the next page of events.
-            thread.join(timeout=30)
-
-            # Count the query.
-            self._inc_query_counter()
-
-            # Get the stored events from the thread.
-            stored_events = thread.stored_events
-
-            # Count the number of stored events that were retrieved.
-            num_stored_events = len(stored_events)
-
-            if num_stored_events:
-                self._inc_page_counter()
-
-            # Decide if this is the last page.
-            is_last_page = (
-                num_stored_events != self.page_size
-            ) or (
-                self.all_item_counter + num_stored_events == self.limit
-            )
-
-            if not is_last_page:
-                # Update loop variables.
-                position = stored_events[-1]
-                self._update_position(position)
-
-                # Start the next thread.
-                thread = self.start_thread()
-
-            # Yield each stored event.
-            for stored_event in stored_events:
-
-                # Stop if we're over the limit.
-                if self.limit and self.all_item_counter >= self.limit:
-                    raise StopIteration
-
-                # Count each event.
-                self._inc_all_event_counter()
+            if page_item_counter < limit:
+                return
+
+
+class AdaptiveSequencedItemIterator(SequencedItemIterator):
+    """
+    Yields items from pages whose size is adapted to the time taken to
+    select the items, and to the size of their data.
+
+    The page size given is used for the first page (otherwise the first
+    page has the minimum page size). After each page, the next page size is the number of
+    items expected to take the target time to select, or to have the
+    target number of bytes of data, whichever is fewer, estimated from
+    the items of the page. The page size is no more than doubled after
+    each page, and is kept within the minimum and maximum page sizes.
+    """
+    DEFAULT_PAGE_SIZE = None
+    DEFAULT_MIN_PAGE_SIZE = 10
+    DEFAULT_MAX_PAGE_SIZE = 10000
+
+    # Targets for each page, in seconds and bytes.
+    DEFAULT_TARGET_PAGE_DURATION = 0.05
+    DEFAULT_TARGET_PAGE_BYTES = 1024 * 1024
+
+    # The most the page size is multiplied by after each page.
+    max_growth_factor = 2
+
+    def __init__(self, *args, **kwargs):
+        min_page_size = kwargs.pop('min_page_size', None)
+        max_page_size = kwargs.pop('max_page_size', None)
+        target_page_duration = kwargs.pop('target_page_duration', None)
+        target_page_bytes = kwargs.pop('target_page_bytes', None)
+        super(AdaptiveSequencedItemIterator, self).__init__(*args, **kwargs)
+        self.min_page_size = min_page_size or self.DEFAULT_MIN_PAGE_SIZE
+        self.max_page_size = max_page_size or self.DEFAULT_MAX_PAGE_SIZE
+        assert 1 <= self.min_page_size <= self.max_page_size, (self.min_page_size, self.max_page_size)
+        self.target_page_duration = target_page_duration or self.DEFAULT_TARGET_PAGE_DURATION
+        self.target_page_bytes = target_page_bytes or self.DEFAULT_TARGET_PAGE_BYTES
+        self.page_size = self._bound_page_size(self.page_size or self.min_page_size)
+
+    def _get_items(self, gt, gte, lt, lte, limit):
+        started = default_timer()
+        sequenced_items = super(AdaptiveSequencedItemIterator, self)._get_items(gt, gte, lt, lte, limit)
+        duration = default_timer() - started
+        if sequenced_items:
+            self.page_size = self._next_page_size(sequenced_items, duration)
+        return sequenced_items
+
+    def _next_page_size(self, sequenced_items, duration):
+        """
+        Returns the size of the next page, estimated from the items of the last page, and the time taken to get them.
+        """
+        num_items = len(sequenced_items)
+        page_size = self.page_size * self.max_growth_factor
+        if duration > 0:
+            page_size = min(page_size, int(self.target_page_duration * num_items / duration))
+        num_bytes = sum(len(item.data) for item in sequenced_items)
+        if num_bytes > 0:
+            page_size = min(page_size, self.target_page_bytes * num_items // num_bytes)
+        return self._bound_page_size(page_size)
 
-                # Yield the event.
-                yield stored_event
+    def _bound_page_size(self, page_size):
+        return max(self.min_page_size, min(self.max_page_size, page_size))
 
-            # If that was the last page, then stop iterating.
-            if is_last_page:
-                raise StopIteration
 
-    def start_thread(self):
-        gt = self.gt
-        gte = self.gte
-        lt = self.lt
-        lte = self.lte
+class ThreadedSequencedItemIterator(AbstractSequencedItemIterator):
+    """
+    Yields items from pages that are fetched ahead of the consumer.
+
+    The pages are fetched by a daemon thread started for each iteration,
+    and put in a bounded queue, so that no more than "prefetch_depth" pages
+    are fetched ahead. The fetching thread waits whilst the queue is full,
+    so it has its own thread rather than a worker in a shared pool, which
+    consumers that stop reading would otherwise use up. If there is an item
+    function or a page function (e.g. to decode the sequenced items), each
+    page is mapped by a task in a pool shared by all threaded iterators, so
+    the next page is fetched whilst the previous page is being mapped and
+    consumed.
+
+    Errors in fetching or mapping pages are raised to the consumer. If the
+    consumer stops early, the fetching thread stops too.
+    """
+    DEFAULT_PREFETCH_DEPTH = 2
+
+    # Pool of worker threads shared by all threaded iterators, for mapping pages.
+    map_executor = None
+    max_map_workers = 4
+    _executors_lock = Lock()
+
+    def __init__(self, *args, **kwargs):
+        prefetch_depth = kwargs.pop('prefetch_depth', None)
+        super(ThreadedSequencedItemIterator, self).__init__(*args, **kwargs)
+        assert isinstance(prefetch_depth, (six.integer_types, type(None)))
+        self.prefetch_depth = prefetch_depth or self.DEFAULT_PREFETCH_DEPTH
 
-        if self._position is not None:
-            if self.is_ascending:
-                gt = self._position
-                gte = None
+    def __iter__(self):
+        pages = Queue(maxsize=self.prefetch_depth)
+        stop = Event()
+        fetch_thread = Thread(target=self._fetch_pages, args=(pages, stop))
+        fetch_thread.daemon = True
+        fetch_thread.start()
+        try:
+            while True:
+                page = pages.get()
+
+                # Stop if there are no more pages.
+                if page is None:
+                    return
+
+                # Raise errors from the fetching task.
+                if isinstance(page, Exception):
+                    raise page
+
+                # Wait for the page to be mapped.
+                if isinstance(page, Future):
+                    page = page.result()
+
+                # Yield each item.
+                for item in page:
+                    self._inc_all_event_counter()
+                    yield item
+        finally:
+            # Stop the fetching thread, if the consumer stopped early.
+            stop.set()
+
+    def _fetch_pages(self, pages, stop):
+        """
+        Fetches pages of items, and puts them in the queue until there are no more, or the consumer stops.
+        """
+        try:
+            gt = self.gt
+            gte = self.gte
+            lt = self.lt
+            lte = self.lte
+            num_fetched_items = 0
+
+            while not stop.is_set():
+                if self.limit is not None:
+                    limit = min(self.page_size, self.limit - num_fetched_items)
+                else:
+                    limit = self.page_size
+
+                if limit == 0:
+                    break
+
+                if self._position is not None:
+                    if self.is_ascending:
+                        gt = self._position
+                        gte = None
+                    else:
+                        lt = self._position
+                        lte = None
+
+                sequenced_items = self._get_items(gt, gte, lt, lte, limit)
+
+                if sequenced_items:
+                    self._inc_page_counter()
+                    self._update_position(sequenced_items[-1])
+                    num_fetched_items += len(sequenced_items)
+
+                    # Map the page in the other pool, so the next page can be fetched meanwhile.
+                    if self.item_func is not None or self.page_func is not None:
+                        page = self.get_map_executor().submit(self._map_page, sequenced_items)
+                    else:
+                        page = sequenced_items
+
+                    if not self._put_page(pages, stop, page):
+                        return
+
+                # If that wasn't a full page, stop fetching (there can be no more items).
+                if len(sequenced_items) < limit:
+                    break
+        except Exception as e:
+            self._put_page(pages, stop, e)
+        else:
+            self._put_page(pages, stop, None)
+
+    @staticmethod
+    def _put_page(pages, stop, page):
+        """
+        Puts page in the queue, unless the consumer stops. Returns True if the page was put in the queue.
+        """
+        while not stop.is_set():
+            try:
+                pages.put(page, timeout=0.1)
+            except Full:
+                pass
             else:
-                lt = self._position
-                lte = None
+                return True
+        return False
 
-        thread = GetEntityEventsThread(
-            active_record_strategy=self.active_record_strategy,
-            sequence_id=self.sequence_id,
-            gt=gt,
-            gte=gte,
-            lt=lt,
-            lte=lte,
-            page_size=self.page_size,
-            is_ascending=self.is_ascending
-        )
-        thread.start()
-        return thread
+    @classmethod
+    def get_map_executor(cls):
+        with cls._executors_lock:
+            if cls.map_executor is None:
+                cls.map_executor = ThreadPoolExecutor(max_workers=cls.max_map_workers)
+            return cls.map_executor
 
 
-class GetEntityEventsThread(Thread):
-    def __init__(self, active_record_strategy, sequence_id, gt=None, gte=None, lt=None, lte=None, page_size=None,
-                 is_ascending=True, *args, **kwargs):
-        super(GetEntityEventsThread, self).__init__(*args, **kwargs)
-        assert isinstance(active_record_strategy, AbstractActiveRecordStrategy), type(active_record_strategy)
-        self.active_record_strategy = active_record_strategy
-        self.stored_entity_id = sequence_id
-        self.gt = gt
-        self.gte = gte
-        self.lt = lt
-        self.lte = lte
-        self.page_size = page_size
-        self.is_ascending = is_ascending
-        self.stored_events = None
-
-    def run(self):
-        self.stored_events = list(self.active_record_strategy.get_items(
-            sequence_id=self.stored_entity_id,
-            gt=self.gt,
-            gte=self.gte,
-            lt=self.lt,
-            lte=self.lte,
-            limit=self.page_size,
-            query_ascending=self.is_ascending,
-            results_ascending=self.is_ascending,
-        ))
+def map_items(item_func, items):
+    return [item_func(item) for item in items]
@@ -0,0 +1,64 @@
+from collections import namedtuple
+from multiprocessing import Pool
+
+from eventsourcing.infrastructure.eventstore import AbstractEventStore
+
+PartitionResult = namedtuple('PartitionResult', ['partition', 'state', 'checkpoint', 'num_events'])
+
+
+def scan_partition(event_store_factory, reducer, partition, num_partitions, initial_state=None, after=None,
+                   page_size=1000, topics=None):
+    """
+    Returns result of reducing the domain events of a partition of the event store, and the last checkpoint.
+
+    The event store is constructed by calling the event store factory, so
+    that a scan can run in another process, with its own connection.
+    """
+    event_store = event_store_factory()
+    assert isinstance(event_store, AbstractEventStore), event_store
+    state = initial_state
+    checkpoint = after
+    num_events = 0
+    for checkpoint, domain_event in event_store.iter_partition(
+            partition, num_partitions, after=after, page_size=page_size, topics=topics):
+        state = reducer(state, domain_event)
+        num_events += 1
+    return PartitionResult(partition, state, checkpoint, num_events)
+
+
+def scan_partitions(event_store_factory, reducer, num_partitions, initial_state=None, checkpoints=None,
+                    page_size=1000, topics=None, processes=None, pool=None, callback=None):
+    """
+    Returns list of results of reducing the domain events of each partition of the event store,
+    with the partitions scanned in parallel by a pool of processes.
+
+    The event store factory and the reducer are sent to the worker processes,
+    so they must be picklable (e.g. module level functions). Each partition
+    starts from the initial state, and from its checkpoint in the given dict
+    of checkpoints, if there is one. The callback is called with the result
+    of each partition, as each partition is finished.
+    """
+    checkpoints = checkpoints or {}
+    own_pool = pool is None
+    if own_pool:
+        pool = Pool(processes or num_partitions)
+    try:
+        async_results = [
+            pool.apply_async(
+                scan_partition,
+                (event_store_factory, reducer, partition, num_partitions),
+                {
+                    'initial_state': initial_state,
+                    'after': checkpoints.get(partition),
+                    'page_size': page_size,
+                    'topics': topics,
+                },
+                callback,
+            )
+            for partition in range(num_partitions)
+        ]
+        return [async_result.get() for async_result in async_results]
+    finally:
+        if own_pool:
+            pool.close()
+            pool.join()
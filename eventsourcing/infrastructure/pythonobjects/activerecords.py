@@ -0,0 +1,182 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import islice
+from threading import RLock
+
+import six
+
+from eventsourcing.infrastructure.activerecord import AbstractActiveRecordStrategy
+
+
+class PythonObjectsActiveRecordStrategy(AbstractActiveRecordStrategy):
+    """
+    Keeps sequenced items in memory, as Python objects.
+
+    Each sequence is kept as a pair of parallel lists, of positions and
+    of items, both ordered by position, so that ranges of items can be
+    found by bisecting the list of positions rather than by scanning it.
+    """
+
+    def __init__(self, active_record_class=None, *args, **kwargs):
+        super(PythonObjectsActiveRecordStrategy, self).__init__(active_record_class, *args, **kwargs)
+        self._sequences = {}
+        self._all_items = []
+        self._lock = RLock()
+
+    def append_item(self, sequenced_item):
+        if isinstance(sequenced_item, list):
+            items = sequenced_item
+        else:
+            items = [sequenced_item]
+
+        with self._lock:
+            # Check all the items can be appended, before appending any of them.
+            new_positions = set()
+            for item in items:
+                assert isinstance(item, self.sequenced_item_class), (type(item), self.sequenced_item_class)
+                key = (item.sequence_id, item.position)
+                if key in new_positions or self._find_position(item.sequence_id, item.position) is not None:
+                    self.raise_sequence_item_error(item.sequence_id, item.position, "position is taken")
+                new_positions.add(key)
+
+            # Append the items.
+            for item in items:
+                self._insert_item(item)
+                self._all_items.append(item)
+
+    def get_item(self, sequence_id, eq):
+        with self._lock:
+            index = self._find_position(sequence_id, eq)
+            if index is None:
+                self.raise_index_error(eq)
+            return self._sequences[sequence_id][1][index]
+
+    def get_items(self, sequence_id, gt=None, gte=None, lt=None, lte=None, limit=None,
+                  query_ascending=True, results_ascending=True, topics=None):
+
+        assert limit is None or limit >= 1, limit
+
+        with self._lock:
+            if topics is None:
+                items = self._get_range(sequence_id, gt, gte, lt, lte, limit, query_ascending)
+            else:
+                # Apply the limit to the items that have the topics.
+                items = self._get_range(sequence_id, gt, gte, lt, lte, None, query_ascending)
+                if query_ascending:
+                    items = self.filter_topics(items, topics, limit)
+                else:
+                    items = self.filter_topics(reversed(items), topics, limit)
+                    items.reverse()
+
+        if not results_ascending:
+            items.reverse()
+
+        return items
+
+    def get_head(self, sequence_id):
+        # The last item of the sequence is the last in its list of values.
+        with self._lock:
+            try:
+                values = self._sequences[sequence_id][1]
+            except KeyError:
+                return None
+            return self.make_head(values[-1])
+
+    def get_heads(self, sequence_ids):
+        return OrderedDict((sequence_id, self.get_head(sequence_id)) for sequence_id in sequence_ids)
+
+    def all_items(self, topics=None):
+        # Items appended whilst iterating are also yielded.
+        topics = None if topics is None else frozenset(topics)
+        i = 0
+        while i < len(self._all_items):
+            item = self._all_items[i]
+            if topics is None or item.topic in topics:
+                yield item
+            i += 1
+
+    def read_all(self, after=None, limit=None, topics=None):
+        # Positions are one more than the indexes of the items in the list of all items.
+        start = after or 0
+        with self._lock:
+            if topics is None:
+                items = self._all_items[start:None if limit is None else start + limit]
+                return [(start + i + 1, item) for i, item in enumerate(items)]
+            else:
+                topics = frozenset(topics)
+                pairs = ((i + 1, self._all_items[i]) for i in six.moves.range(start, len(self._all_items)))
+                return list(islice(((p, item) for p, item in pairs if item.topic in topics), limit))
+
+    def read_partition(self, partition, num_partitions, after=None, limit=None, topics=None):
+        # Positions are one more than the indexes of the items in the list of all items.
+        lo, hi = self.get_partition_range(partition, num_partitions)
+        topics = None if topics is None else frozenset(topics)
+        start = after or 0
+        with self._lock:
+            pairs = ((i + 1, self._all_items[i]) for i in six.moves.range(start, len(self._all_items)))
+            pairs = ((p, item) for p, item in pairs if self.is_in_partition_range(item.sequence_id, lo, hi) and (
+                topics is None or item.topic in topics))
+            return list(islice(pairs, limit))
+
+    def _get_range(self, sequence_id, gt, gte, lt, lte, limit, query_ascending):
+        """
+        Returns list of the values in the sequence that are in the given range of positions.
+        """
+        try:
+            positions, values = self._sequences[sequence_id]
+        except KeyError:
+            return []
+
+        # Find the range of values by bisecting the positions.
+        start = 0
+        end = len(positions)
+        if gt is not None:
+            start = max(start, bisect_right(positions, gt))
+        if gte is not None:
+            start = max(start, bisect_left(positions, gte))
+        if lt is not None:
+            end = min(end, bisect_left(positions, lt))
+        if lte is not None:
+            end = min(end, bisect_right(positions, lte))
+
+        # Apply the limit to the end of the range that is queried first.
+        if limit is not None:
+            if query_ascending:
+                end = min(end, start + limit)
+            else:
+                start = max(start, end - limit)
+
+        return values[start:end]
+
+    def _find_position(self, sequence_id, position):
+        """
+        Returns the index of the given position in the sequence, or None if there is no such position.
+        """
+        try:
+            positions = self._sequences[sequence_id][0]
+        except KeyError:
+            return None
+        index = bisect_left(positions, position)
+        if index < len(positions) and positions[index] == position:
+            return index
+
+    def _insert_item(self, item):
+        self._insert_position(item.sequence_id, item.position, item)
+
+    def _insert_position(self, sequence_id, position, value):
+        """
+        Inserts the value at the position in the sequence, keeping the lists of positions and values in order.
+        """
+        try:
+            positions, values = self._sequences[sequence_id]
+        except KeyError:
+            positions, values = self._sequences[sequence_id] = ([], [])
+
+        if not positions or positions[-1] < position:
+            # Usually items are appended in order.
+            positions.append(position)
+            values.append(value)
+        else:
+            index = bisect_left(positions, position)
+            positions.insert(index, position)
+            values.insert(index, value)
@@ -8,8 +8,9 @@ from eventsourcing.infrastructure.eventplayer import EventPlayer
 
 def append_item_to_sequence(name, item, event_player, max_size=None):
     assert isinstance(event_player, EventPlayer)
-    last_event = event_player.event_store.get_most_recent_event(name)
-    next_version = last_event.entity_version + 1
+    # The position of the last event is its version, so the event isn't decoded.
+    head = event_player.event_store.get_head(name)
+    next_version = head.position + 1
     if max_size and max_size < next_version:
         raise SequenceFullError
     event = Sequence.Appended(
@@ -76,5 +77,5 @@ class SequenceReader(object):
             return items
 
     def __len__(self):
-        events = self.event_player.get_domain_events(self.sequence.id, is_ascending=False, limit=1)
-        return events[0].entity_version
+        head = self.event_player.event_store.get_head(self.sequence.id)
+        return head.position
@@ -21,6 +21,11 @@ class AbstractSnapshotStrategy(six.with_metaclass(ABCMeta)):
         """Creates snapshot from given entity, with given domain event ID.
         """
 
+    def get_snapshots(self, entity_ids, lt=None, lte=None):
+        """Returns dict of the last snapshot (or None) for each of the given entity IDs.
+        """
+        return {entity_id: self.get_snapshot(entity_id, lt=lt, lte=lte) for entity_id in entity_ids}
+
 
 class EventSourcedSnapshotStrategy(AbstractSnapshotStrategy):
     """Snapshot strategy that uses an event sourced snapshot.
@@ -32,6 +37,9 @@ class EventSourcedSnapshotStrategy(AbstractSnapshotStrategy):
     def get_snapshot(self, entity_id, lt=None, lte=None):
         return get_snapshot(entity_id, self.event_store, lt=lt, lte=lte)
 
+    def get_snapshots(self, entity_ids, lt=None, lte=None):
+        return get_snapshots(entity_ids, self.event_store, lt=lt, lte=lte)
+
     def take_snapshot(self, entity, timestamp=None):
         return take_snapshot(entity, timestamp=timestamp)
 
@@ -48,6 +56,17 @@ def get_snapshot(entity_id, event_store, lt=None, lte=None):
         return snapshots[0]
 
 
+def get_snapshots(entity_ids, event_store, lt=None, lte=None):
+    """
+    Get the last snapshot (or None) for each entity, with one query.
+
+    :rtype: dict
+    """
+    assert isinstance(event_store, AbstractEventStore)
+    snapshots = event_store.get_domain_events_many(entity_ids, lt=lt, lte=lte, is_ascending=False, limit=1)
+    return {entity_id: events[0] if events else None for entity_id, events in snapshots.items()}
+
+
 def entity_from_snapshot(snapshot):
     """Deserialises a domain entity from a snapshot object.
     """
@@ -1,44 +1,156 @@
+from collections import OrderedDict
+
 import six
+from sqlalchemy import func, inspect
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.sql.expression import asc, desc
-from sqlalchemy.sql.schema import Column, Sequence, UniqueConstraint
-from sqlalchemy.sql.sqltypes import BigInteger, Float, Integer, String, Text
+from sqlalchemy.sql.expression import and_, asc, bindparam, desc, false, or_, select
+from sqlalchemy.sql.schema import Column, Index, Sequence, UniqueConstraint
+from sqlalchemy.sql.sqltypes import BigInteger, Float, Integer, LargeBinary, String, Text
 from sqlalchemy_utils.types.uuid import UUIDType
 
-from eventsourcing.infrastructure.activerecord import AbstractActiveRecordStrategy
+from eventsourcing.exceptions import ConcurrencyError, DataIntegrityError
+from eventsourcing.infrastructure.activerecord import AbstractActiveRecordStrategy, SequenceHead
 from eventsourcing.infrastructure.sqlalchemy.datastore import Base, SQLAlchemyDatastore
+from eventsourcing.infrastructure.topiccodes import AbstractTopicCodeTable
 
 
 class SQLAlchemyActiveRecordStrategy(AbstractActiveRecordStrategy):
-
-    def __init__(self, datastore, *args, **kwargs):
+    """
+    Reads and writes sequenced items with SQLAlchemy.
+
+    Unless "use_core_select" is False, items are read with Core select
+    statements, and sequenced items are made directly from the selected
+    rows, which avoids constructing ORM instances. The select statements
+    are constructed once for each combination of arguments, with bound
+    parameters, and their compiled forms are cached.
+
+    If a head record class is given, the position and topic of the last
+    item of each sequence is kept in the head table, and updated in the
+    same transaction as the items are inserted, so that the head of a
+    sequence can be looked up by its key.
+
+    If the active record class has a "commit_position" column, each record
+    is given the next commit position in the transaction that inserts it,
+    so that read_all() can resume from a position without missing records
+    that are committed later. Since the column is unique, a transaction
+    that allocates a commit position that another transaction is about to
+    commit fails when the other commits, and is retried. Hence records are
+    committed in the order of their commit positions.
+
+    Allocating commit positions serializes the transactions that append
+    items: each selects the last commit position, and all but one of the
+    transactions that select the same position fail and are retried (up
+    to "max_commit_position_retries" times). Commit positions are therefore
+    opt-in, by using an active record class that has the column, such as
+    SqlCommitOrderedIntegerSequencedItem. Existing tables would need the
+    column to be added and filled in for all records, since read_all()
+    can't order records that don't have commit positions.
+    """
+
+    # The number of sequences selected by each query in get_items_many().
+    get_items_many_chunk_size = 200
+
+    # The number of times an append is retried, when another transaction takes its commit positions.
+    max_commit_position_retries = 100
+
+    def __init__(self, datastore, use_core_select=True, all_items_page_size=1000, head_record_class=None,
+                 *args, **kwargs):
         assert isinstance(datastore, SQLAlchemyDatastore)
         super(SQLAlchemyActiveRecordStrategy, self).__init__(*args, **kwargs)
         self.datastore = datastore
+        self.use_core_select = use_core_select
+        self.all_items_page_size = all_items_page_size
+        self.head_record_class = head_record_class
+        self._column_attrs = {}
+        self._select_statements = {}
+        self._compiled_cache = {}
+        self._head_statements = None
 
     def append_item(self, item):
-        active_record = self.to_active_record(item)
+        items = item if isinstance(item, list) else [item]
+
+        # Check the batch doesn't have the same position twice (the first fields are the sequence and position).
+        keys = set()
+        for i in items:
+            key = (i[0], i[1])
+            if key in keys:
+                self.raise_sequence_item_error(key[0], key[1], "position is repeated in batch")
+            keys.add(key)
+
+        for _ in six.moves.range(self.max_commit_position_retries):
+            try:
+                return self._append_item(item)
+            except IntegrityError as e:
+                # Retry only if the commit positions, rather than the positions of the items, were taken.
+                if not self.is_commit_position_error(e):
+                    self.raise_sequence_item_error(items[0][0], items[0][1], e)
+        raise ConcurrencyError("Couldn't allocate commit positions after {} attempts".format(
+            self.max_commit_position_retries
+        ))
+
+    def _append_item(self, item):
         try:
-            # Write stored event into the transaction.
-            self.add_record_to_session(active_record)
+            active_records = self.to_active_record(item)
+
+            # Allocate commit positions in the same transaction.
+            if self.has_commit_position:
+                self.allocate_commit_positions(active_records if isinstance(item, list) else [active_records])
+
+            if isinstance(item, list):
+                # Write all the items with a single multi-row insert statement.
+                self.insert_records(active_records)
+            else:
+                # Write stored event into the transaction.
+                self.add_record_to_session(active_records)
+
+            # Update the heads of the sequences in the same transaction.
+            if self.head_record_class is not None:
+                self.update_heads(item if isinstance(item, list) else [item])
 
             # Commit the transaction.
             self.datastore.db_session.commit()
 
-        except IntegrityError as e:
+        except IntegrityError:
             # Roll back the transaction.
             self.datastore.db_session.rollback()
-            self.raise_sequence_item_error(item.sequence_id, item.position, e)
+            raise
         finally:
             # Begin new transaction.
             self.datastore.db_session.close()
 
+    @property
+    def has_commit_position(self):
+        return hasattr(self.active_record_class, 'commit_position')
+
+    def allocate_commit_positions(self, active_records):
+        """
+        Sets the commit positions of the records, following the last commit position, in the session's transaction.
+        """
+        statement = select([func.max(self.active_record_class.commit_position)])
+        last_commit_position = self.datastore.db_session.execute(statement).scalar() or 0
+        for i, active_record in enumerate(active_records):
+            active_record.commit_position = last_commit_position + 1 + i
+
+    def is_commit_position_error(self, error):
+        """
+        Returns True if the integrity error was caused by the commit position's unique constraint.
+
+        The constraint is identified by the name of the column, which is
+        included in the database's error message (the name of the unique
+        index or constraint contains it too).
+        """
+        return self.has_commit_position and 'commit_position' in str(error.orig)
+
     def get_item(self, sequence_id, eq):
         try:
-            query = self.filter(sequence_id=sequence_id)
-            query = query.filter(self.active_record_class.position == eq)
-            events = six.moves.map(self.from_active_record, query)
-            events = list(events)
+            if self.use_core_select:
+                statement = self.get_select_statement(has_eq=True)
+                events = self.execute_select(statement, sequence_id=sequence_id, eq=eq)
+            else:
+                query = self.filter(sequence_id=sequence_id)
+                query = query.filter(self.active_record_class.position == eq)
+                events = six.moves.map(self.from_active_record, query)
+                events = list(events)
         finally:
             self.datastore.db_session.close()
 
@@ -47,11 +159,113 @@ class SQLAlchemyActiveRecordStrategy(AbstractActiveRecordStrategy):
         except IndexError:
             self.raise_index_error(eq)
 
+    def get_head(self, sequence_id):
+        try:
+            row = self.get_connection().execute(self.get_head_statement(), sequence_id=sequence_id).first()
+        finally:
+            self.datastore.db_session.close()
+        if row is not None:
+            return SequenceHead(sequence_id, row[0], row[1])
+
+    def get_heads(self, sequence_ids):
+        if self.head_record_class is None:
+            return super(SQLAlchemyActiveRecordStrategy, self).get_heads(sequence_ids)
+
+        sequence_ids = list(sequence_ids)
+        heads = OrderedDict((sequence_id, None) for sequence_id in sequence_ids)
+        head_record_class = self.head_record_class
+        columns = [head_record_class.sequence_id, head_record_class.position, head_record_class.topic]
+        chunk_size = self.get_items_many_chunk_size
+        try:
+            for i in six.moves.range(0, len(sequence_ids), chunk_size):
+                chunk = sequence_ids[i:i + chunk_size]
+                statement = select(columns).where(head_record_class.sequence_id.in_(chunk))
+                for row in self.get_connection().execute(statement):
+                    heads[row[0]] = SequenceHead(*row)
+        finally:
+            self.datastore.db_session.close()
+        return heads
+
+    def get_head_statement(self):
+        """
+        Returns Core select statement for the position and topic of the last item of a sequence.
+        """
+        key = 'head'
+        try:
+            return self._select_statements[key]
+        except KeyError:
+            if self.head_record_class is None:
+                record_class = self.active_record_class
+                statement = select([record_class.position, record_class.topic])
+                statement = statement.where(record_class.sequence_id == bindparam('sequence_id'))
+                statement = statement.order_by(desc(record_class.position)).limit(1)
+            else:
+                record_class = self.head_record_class
+                statement = select([record_class.position, record_class.topic])
+                statement = statement.where(record_class.sequence_id == bindparam('sequence_id'))
+            self._select_statements[key] = statement
+            return statement
+
+    def update_heads(self, items):
+        """
+        Updates the heads of the sequences of the given items, in the session's transaction.
+
+        The head of a sequence is updated, unless it is already at or after
+        the position of the last item. It is inserted if there isn't one.
+        """
+        table = self.head_record_class.__table__
+        session = self.datastore.db_session
+        if self._head_statements is None:
+            update_statement = table.update().where(and_(
+                table.c.sequence_id == bindparam('head_sequence_id'),
+                table.c.position < bindparam('head_position'),
+            )).values(position=bindparam('head_position'), topic=bindparam('head_topic'))
+            exists_statement = select([table.c.position]).where(table.c.sequence_id == bindparam('head_sequence_id'))
+            self._head_statements = update_statement, exists_statement
+        update_statement, exists_statement = self._head_statements
+        for item in self.last_items(items):
+            params = {
+                'head_sequence_id': item.sequence_id,
+                'head_position': item.position,
+                'head_topic': item.topic,
+            }
+            if session.execute(update_statement, params).rowcount:
+                continue
+            if session.execute(exists_statement, params).first() is None:
+                session.execute(table.insert(), {
+                    'sequence_id': item.sequence_id,
+                    'position': item.position,
+                    'topic': item.topic,
+                })
+
     def get_items(self, sequence_id, gt=None, gte=None, lt=None, lte=None, limit=None,
-                  query_ascending=True, results_ascending=True):
+                  query_ascending=True, results_ascending=True, topics=None):
 
         assert limit is None or limit >= 1, limit
 
+        topics = None if topics is None else list(topics)
+
+        if self.use_core_select:
+            try:
+                statement = self.get_select_statement(
+                    has_gt=gt is not None,
+                    has_gte=gte is not None,
+                    has_lt=lt is not None,
+                    has_lte=lte is not None,
+                    has_limit=limit is not None,
+                    is_ascending=query_ascending,
+                    num_topics=None if topics is None else len(topics),
+                )
+                events = self.execute_select(statement, sequence_id=sequence_id, gt=gt, gte=gte, lt=lt, lte=lte,
+                                             limit=limit, **self.topics_params(topics))
+            finally:
+                self.datastore.db_session.close()
+
+            if results_ascending != query_ascending:
+                events.reverse()
+
+            return events
+
         try:
             query = self.filter(sequence_id=sequence_id)
 
@@ -68,6 +282,8 @@ class SQLAlchemyActiveRecordStrategy(AbstractActiveRecordStrategy):
                 query = query.filter(self.active_record_class.position < lt)
             if lte is not None:
                 query = query.filter(self.active_record_class.position <= lte)
+            if topics is not None:
+                query = query.filter(self.topics_clause(topics))
 
             if limit is not None:
                 query = query.limit(limit)
@@ -83,8 +299,291 @@ class SQLAlchemyActiveRecordStrategy(AbstractActiveRecordStrategy):
 
         return events
 
-    def all_items(self):
-        return map(self.from_active_record, self.filter())
+    def get_items_many(self, sequence_ids, gt=None, gte=None, lt=None, lte=None, limit=None,
+                       query_ascending=True, results_ascending=True):
+        """
+        Returns ordered dict of lists of sequenced items, for each of the given sequence IDs.
+
+        The items of many sequences are selected with one query (for each
+        chunk of sequence IDs). If there is a limit, the rows of each
+        sequence are numbered with a window function, so that only the
+        first rows of each sequence are selected.
+        """
+        if not self.use_core_select or (limit is not None and not self.supports_window_functions()):
+            return super(SQLAlchemyActiveRecordStrategy, self).get_items_many(
+                sequence_ids, gt=gt, gte=gte, lt=lt, lte=lte, limit=limit,
+                query_ascending=query_ascending, results_ascending=results_ascending,
+            )
+
+        assert limit is None or limit >= 1, limit
+
+        sequence_ids = list(sequence_ids)
+        items = OrderedDict((sequence_id, []) for sequence_id in sequence_ids)
+        sequenced_item_class = self.sequenced_item_class
+        chunk_size = self.get_items_many_chunk_size
+        try:
+            for i in six.moves.range(0, len(sequence_ids), chunk_size):
+                chunk = sequence_ids[i:i + chunk_size]
+                statement = self.get_items_many_statement(chunk, gt, gte, lt, lte, limit, query_ascending)
+                for row in self.get_connection().execute(statement):
+                    items[row[0]].append(sequenced_item_class(*row))
+        finally:
+            self.datastore.db_session.close()
+
+        if results_ascending != query_ascending:
+            for sequence_items in items.values():
+                sequence_items.reverse()
+
+        return items
+
+    def get_items_many_statement(self, sequence_ids, gt, gte, lt, lte, limit, query_ascending):
+        """
+        Returns Core select statement for the items of many sequences.
+        """
+        record_class = self.active_record_class
+        position = record_class.position
+
+        # Group the sequences that have the same range, so each group is one "IN" condition.
+        groups = OrderedDict()
+        for sequence_id in sequence_ids:
+            groups.setdefault(self.get_bounds(sequence_id, gt, gte, lt, lte), []).append(sequence_id)
+
+        conditions = []
+        for (_gt, _gte, _lt, _lte), group in groups.items():
+            clauses = [record_class.sequence_id.in_(group)]
+            if _gt is not None:
+                clauses.append(position > _gt)
+            if _gte is not None:
+                clauses.append(position >= _gte)
+            if _lt is not None:
+                clauses.append(position < _lt)
+            if _lte is not None:
+                clauses.append(position <= _lte)
+            conditions.append(and_(*clauses))
+
+        columns = [getattr(record_class, name) for name in self.sequenced_item_class._fields]
+        order = asc(position) if query_ascending else desc(position)
+        if limit is None:
+            return select(columns).where(or_(*conditions)).order_by(order)
+
+        # Number the rows of each sequence, and select the first rows of each.
+        row_number = func.row_number().over(partition_by=record_class.sequence_id, order_by=order)
+        subquery = select(columns + [row_number.label('row_number')]).where(or_(*conditions)).alias()
+        subquery_columns = list(subquery.c)[:len(columns)]
+        subquery_position = subquery_columns[1]
+        return select(subquery_columns).where(subquery.c.row_number <= limit).order_by(
+            asc(subquery_position) if query_ascending else desc(subquery_position)
+        )
+
+    def supports_window_functions(self):
+        dialect = self.datastore.db_session.bind.dialect
+        if dialect.name == 'sqlite':
+            # SQLite has window functions since version 3.25.
+            return dialect.dbapi.sqlite_version_info >= (3, 25)
+        return True
+
+    def all_items(self, page_size=None, topics=None):
+        """
+        Yields all items, in the order they were inserted.
+
+        Items are read in pages, so that no more than one page of items
+        is held in memory. The session is closed after each page is read,
+        so nothing is left open if the generator isn't iterated to the end.
+        """
+        page_size = page_size or self.all_items_page_size
+        after = None
+        while True:
+            page = self.read_all(after=after, limit=page_size, topics=topics)
+            for _, item in page:
+                yield item
+            if len(page) < page_size:
+                break
+            after = page[-1][0]
+
+    def read_all(self, after=None, limit=None, topics=None):
+        """
+        Returns list of (position, item) pairs, where the position is the commit position of the record.
+
+        Records are selected after the given position, by paginating over
+        the "commit_position" column (keyset pagination). Records are
+        committed in the order of their commit positions, so records that
+        are committed later have greater positions.
+
+        If the active record class doesn't have a "commit_position" column,
+        the surrogate "id" is used instead. The ids are allocated when
+        records are inserted, so with databases that allow concurrent write
+        transactions a record may be committed after a record with a
+        greater id.
+        """
+        return self.select_all(after, limit, topics)
+
+    def read_partition(self, partition, num_partitions, after=None, limit=None, topics=None):
+        """
+        Returns list of (position, item) pairs for the partition, where the position is the commit position.
+
+        The partitions are ranges of sequence IDs, which are compared by
+        the database in the order of their bytes.
+        """
+        partition_range = self.get_partition_range(partition, num_partitions)
+        return self.select_all(after, limit, topics, partition_range=partition_range)
+
+    def select_all(self, after, limit, topics, partition_range=None):
+        """
+        Returns list of (commit position, item) pairs, in the order of the commit positions.
+        """
+        topics = None if topics is None else list(topics)
+        lo, hi = partition_range or (None, None)
+        try:
+            if self.use_core_select:
+                statement = self.get_read_all_statement(
+                    has_after=after is not None,
+                    has_limit=limit is not None,
+                    num_topics=None if topics is None else len(topics),
+                    has_lo=lo is not None,
+                    has_hi=hi is not None,
+                )
+                params = {k: v for k, v in (('after', after), ('limit', limit), ('lo', lo), ('hi', hi))
+                          if v is not None}
+                params.update(self.topics_params(topics))
+                rows = self.get_connection().execute(statement, params).fetchall()
+                self._check_checkpoints(rows)
+                sequenced_item_class = self.sequenced_item_class
+                return [(row[0], sequenced_item_class(*row[1:])) for row in rows]
+            else:
+                query = self.filter()
+                checkpoint = self.checkpoint_column
+                if after is not None:
+                    query = query.filter(checkpoint > after)
+                if lo is not None:
+                    query = query.filter(self.active_record_class.sequence_id >= lo)
+                if hi is not None:
+                    query = query.filter(self.active_record_class.sequence_id < hi)
+                if topics is not None:
+                    query = query.filter(self.topics_clause(topics))
+                query = query.order_by(asc(checkpoint))
+                if limit is not None:
+                    query = query.limit(limit)
+                pairs = [(getattr(r, checkpoint.key), self.from_active_record(r)) for r in query]
+                self._check_checkpoints(pairs)
+                return pairs
+        finally:
+            self.datastore.db_session.close()
+
+    def _check_checkpoints(self, rows):
+        """
+        Raises DataIntegrityError if any of the rows (which start with the checkpoint) has no checkpoint.
+
+        Rows without a commit position can't be read after a position, and
+        would stop all_items() advancing. Databases sort nulls either first
+        or last, so only the first and last rows need to be checked.
+        """
+        if rows and (rows[0][0] is None or rows[-1][0] is None):
+            raise DataIntegrityError("Records in table '{}' don't have {} values".format(
+                self.active_record_class.__tablename__, self.checkpoint_column.key
+            ))
+
+    def get_select_statement(self, has_eq=False, has_gt=False, has_gte=False, has_lt=False, has_lte=False,
+                             has_limit=False, is_ascending=True, num_topics=None):
+        """
+        Returns Core select statement, with bound parameters for the given combination of arguments.
+        """
+        key = (has_eq, has_gt, has_gte, has_lt, has_lte, has_limit, is_ascending, num_topics)
+        try:
+            return self._select_statements[key]
+        except KeyError:
+            record_class = self.active_record_class
+            statement = select([getattr(record_class, name) for name in self.sequenced_item_class._fields])
+            position = record_class.position
+            statement = statement.where(record_class.sequence_id == bindparam('sequence_id'))
+            statement = statement.order_by(asc(position) if is_ascending else desc(position))
+            if has_eq:
+                statement = statement.where(position == bindparam('eq'))
+            if has_gt:
+                statement = statement.where(position > bindparam('gt'))
+            if has_gte:
+                statement = statement.where(position >= bindparam('gte'))
+            if has_lt:
+                statement = statement.where(position < bindparam('lt'))
+            if has_lte:
+                statement = statement.where(position <= bindparam('lte'))
+            if num_topics is not None:
+                statement = statement.where(self.topics_clause(self.topics_bindparams(num_topics)))
+            if has_limit:
+                statement = statement.limit(bindparam('limit'))
+            self._select_statements[key] = statement
+            return statement
+
+    def get_read_all_statement(self, has_after, has_limit, num_topics=None, has_lo=False, has_hi=False):
+        """
+        Returns Core select statement for items from all sequences (or a range of sequences), with the
+        commit position first.
+        """
+        key = ('read_all', has_after, has_limit, num_topics, has_lo, has_hi)
+        try:
+            return self._select_statements[key]
+        except KeyError:
+            record_class = self.active_record_class
+            columns = [getattr(record_class, name) for name in self.sequenced_item_class._fields]
+            checkpoint = self.checkpoint_column
+            statement = select([checkpoint] + columns)
+            if has_after:
+                statement = statement.where(checkpoint > bindparam('after'))
+            if has_lo:
+                statement = statement.where(record_class.sequence_id >= bindparam('lo'))
+            if has_hi:
+                statement = statement.where(record_class.sequence_id < bindparam('hi'))
+            if num_topics is not None:
+                statement = statement.where(self.topics_clause(self.topics_bindparams(num_topics)))
+            statement = statement.order_by(asc(checkpoint))
+            if has_limit:
+                statement = statement.limit(bindparam('limit'))
+            self._select_statements[key] = statement
+            return statement
+
+    @property
+    def checkpoint_column(self):
+        """
+        Returns the column of the positions returned by read_all().
+        """
+        if self.has_commit_position:
+            return self.active_record_class.commit_position
+        return self.active_record_class.id
+
+    def topics_clause(self, topics):
+        """
+        Returns condition that the topic is one of the given topics (or bound parameters).
+        """
+        if not topics:
+            # No topics match.
+            return false()
+        return self.active_record_class.topic.in_(topics)
+
+    @staticmethod
+    def topics_bindparams(num_topics):
+        return [bindparam('topic_{}'.format(i)) for i in six.moves.range(num_topics)]
+
+    @staticmethod
+    def topics_params(topics):
+        """
+        Returns dict of values for the bound parameters of the topics.
+        """
+        if topics is None:
+            return {}
+        return {'topic_{}'.format(i): topic for i, topic in enumerate(topics)}
+
+    def execute_select(self, statement, **params):
+        """
+        Returns list of sequenced items, made directly from the rows selected by the given statement.
+        """
+        params = {k: v for k, v in params.items() if v is not None}
+        sequenced_item_class = self.sequenced_item_class
+        return [sequenced_item_class(*row) for row in self.get_connection().execute(statement, params)]
+
+    def get_connection(self):
+        """
+        Returns the session's connection, with the cache of compiled statements.
+        """
+        return self.datastore.db_session.connection().execution_options(compiled_cache=self._compiled_cache)
 
     def add_record_to_session(self, active_record):
         if isinstance(active_record, list):
@@ -93,6 +592,38 @@ class SQLAlchemyActiveRecordStrategy(AbstractActiveRecordStrategy):
         else:
             self.datastore.db_session.add(active_record)
 
+    def insert_records(self, active_records):
+        """
+        Inserts active records with one "executemany" insert statement, which
+        avoids the overhead of adding each record to the session's unit of work.
+        """
+        if not active_records:
+            return
+        values = [self.active_record_values(r) for r in active_records]
+        self.datastore.db_session.execute(self.active_record_class.__table__.insert(), values)
+
+    def active_record_values(self, active_record):
+        """
+        Returns dict of column values, from given active record.
+        """
+        values = {}
+        for attr_name, column in self._get_column_attrs(type(active_record)):
+            value = getattr(active_record, attr_name)
+            # Leave unset primary key values (e.g. auto-incrementing IDs) to the database.
+            if value is None and column.primary_key:
+                continue
+            values[column.key] = value
+        return values
+
+    def _get_column_attrs(self, active_record_class):
+        try:
+            return self._column_attrs[active_record_class]
+        except KeyError:
+            mapper = inspect(active_record_class)
+            column_attrs = [(a.key, a.columns[0]) for a in mapper.column_attrs]
+            self._column_attrs[active_record_class] = column_attrs
+            return column_attrs
+
     def to_active_record(self, sequenced_item):
         """
         Returns an active record, from given sequenced item.
@@ -123,6 +654,31 @@ class SQLAlchemyActiveRecordStrategy(AbstractActiveRecordStrategy):
         return query.filter_by(*args, **kwargs)
 
 
+class SQLAlchemyTopicCodeTable(AbstractTopicCodeTable):
+    def __init__(self, datastore, record_class=None):
+        assert isinstance(datastore, SQLAlchemyDatastore)
+        self.datastore = datastore
+        self.record_class = record_class or SqlTopicCode
+
+    def get_codes(self):
+        table = self.record_class.__table__
+        try:
+            rows = self.datastore.db_session.execute(select([table.c.topic, table.c.code])).fetchall()
+        finally:
+            self.datastore.db_session.close()
+        return [(row[0], row[1]) for row in rows]
+
+    def insert_code(self, topic, code):
+        try:
+            self.datastore.db_session.execute(self.record_class.__table__.insert(), {'topic': topic, 'code': code})
+            self.datastore.db_session.commit()
+        except IntegrityError as e:
+            self.datastore.db_session.rollback()
+            raise ConcurrencyError(e)
+        finally:
+            self.datastore.db_session.close()
+
+
 class SqlIntegerSequencedItem(Base):
     __tablename__ = 'integer_sequenced_items'
 
@@ -142,9 +698,14 @@ class SqlIntegerSequencedItem(Base):
 
     # Unique constraint includes 'entity_id' which is a good value
     # to partition on, because all events for an entity will be in the same
-    # partition, which may help performance.
-    __table_args__ = UniqueConstraint('sequence_id', 'position',
-                                      name='integer_sequenced_item_uc'),
+    # partition, which may help performance. The indexes support selecting
+    # the items of a sequence that have particular topics, and reading a
+    # partition (a range of sequence IDs) after an id.
+    __table_args__ = (
+        UniqueConstraint('sequence_id', 'position', name='integer_sequenced_item_uc'),
+        Index('integer_sequenced_items_topic_idx', 'sequence_id', 'topic', 'position'),
+        Index('integer_sequenced_items_partition_idx', 'sequence_id', 'id'),
+    )
 
 
 class SqlTimestampSequencedItem(Base):
@@ -152,8 +713,12 @@ class SqlTimestampSequencedItem(Base):
     # Explicit table name.
     __tablename__ = 'timestamp_sequenced_items'
 
-    # Unique constraint.
-    __table_args__ = UniqueConstraint('sequence_id', 'position', name='time_sequenced_items_uc'),
+    # Unique constraint, and indexes of topics and of ids in ranges of sequence IDs.
+    __table_args__ = (
+        UniqueConstraint('sequence_id', 'position', name='time_sequenced_items_uc'),
+        Index('timestamp_sequenced_items_topic_idx', 'sequence_id', 'topic', 'position'),
+        Index('timestamp_sequenced_items_partition_idx', 'sequence_id', 'id'),
+    )
 
     # Primary key.
     id = Column(Integer, Sequence('integer_sequened_item_id_seq'), primary_key=True)
@@ -169,3 +734,147 @@ class SqlTimestampSequencedItem(Base):
 
     # State of the item (serialized dict, possibly encrypted).
     data = Column(Text())
+
+
+class SqlBinaryIntegerSequencedItem(Base):
+    __tablename__ = 'binary_integer_sequenced_items'
+
+    id = Column(Integer, Sequence('integer_sequened_item_id_seq'), primary_key=True)
+
+    # Sequence ID (e.g. an entity or aggregate ID).
+    sequence_id = Column(UUIDType(), index=True)
+
+    # Position (index) of item in sequence.
+    position = Column(BigInteger(), index=True)
+
+    # Topic of the item (e.g. path to domain event class).
+    topic = Column(String(255))
+
+    # State of the item (bytes from a binary codec, possibly encrypted).
+    data = Column(LargeBinary())
+
+    __table_args__ = (
+        UniqueConstraint('sequence_id', 'position', name='binary_integer_sequenced_item_uc'),
+        Index('binary_integer_sequenced_items_topic_idx', 'sequence_id', 'topic', 'position'),
+        Index('binary_integer_sequenced_items_partition_idx', 'sequence_id', 'id'),
+    )
+
+
+class SqlBinaryTimestampSequencedItem(Base):
+    __tablename__ = 'binary_timestamp_sequenced_items'
+
+    id = Column(Integer, Sequence('integer_sequened_item_id_seq'), primary_key=True)
+
+    # Sequence ID (e.g. an entity or aggregate ID).
+    sequence_id = Column(UUIDType(), index=True)
+
+    # Position (timestamp) of item in sequence.
+    position = Column(Float(), index=True)
+
+    # Topic of the item (e.g. path to domain event class).
+    topic = Column(String(255))
+
+    # State of the item (bytes from a binary codec, possibly encrypted).
+    data = Column(LargeBinary())
+
+    __table_args__ = (
+        UniqueConstraint('sequence_id', 'position', name='binary_timestamp_sequenced_items_uc'),
+        Index('binary_timestamp_sequenced_items_topic_idx', 'sequence_id', 'topic', 'position'),
+        Index('binary_timestamp_sequenced_items_partition_idx', 'sequence_id', 'id'),
+    )
+
+
+class SqlCommitOrderedIntegerSequencedItem(Base):
+    """
+    Integer-sequenced items, with the position of each record in the order records were committed.
+    """
+    __tablename__ = 'commit_ordered_integer_sequenced_items'
+
+    id = Column(Integer, Sequence('integer_sequened_item_id_seq'), primary_key=True)
+
+    # Sequence ID (e.g. an entity or aggregate ID).
+    sequence_id = Column(UUIDType(), index=True)
+
+    # Position (index) of item in sequence.
+    position = Column(BigInteger(), index=True)
+
+    # Topic of the item (e.g. path to domain event class).
+    topic = Column(String(255))
+
+    # State of the item (serialized dict, possibly encrypted).
+    data = Column(Text())
+
+    # Position of the record in the order records were committed.
+    commit_position = Column(BigInteger(), unique=True, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('sequence_id', 'position', name='commit_ordered_integer_sequenced_item_uc'),
+        Index('commit_ordered_integer_sequenced_items_topic_idx', 'sequence_id', 'topic', 'position'),
+        Index('commit_ordered_integer_sequenced_items_partition_idx', 'sequence_id', 'commit_position'),
+    )
+
+
+class SqlCommitOrderedTimestampSequencedItem(Base):
+    """
+    Timestamp-sequenced items, with the position of each record in the order records were committed.
+    """
+    __tablename__ = 'commit_ordered_timestamp_sequenced_items'
+
+    id = Column(Integer, Sequence('integer_sequened_item_id_seq'), primary_key=True)
+
+    # Sequence ID (e.g. an entity or aggregate ID).
+    sequence_id = Column(UUIDType(), index=True)
+
+    # Position (timestamp) of item in sequence.
+    position = Column(Float(), index=True)
+
+    # Topic of the item (e.g. path to domain event class).
+    topic = Column(String(255))
+
+    # State of the item (serialized dict, possibly encrypted).
+    data = Column(Text())
+
+    # Position of the record in the order records were committed.
+    commit_position = Column(BigInteger(), unique=True, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('sequence_id', 'position', name='commit_ordered_time_sequenced_items_uc'),
+        Index('commit_ordered_timestamp_sequenced_items_topic_idx', 'sequence_id', 'topic', 'position'),
+        Index('commit_ordered_timestamp_sequenced_items_partition_idx', 'sequence_id', 'commit_position'),
+    )
+
+
+class SqlIntegerSequenceHead(Base):
+    __tablename__ = 'integer_sequence_heads'
+
+    # Sequence ID (e.g. an entity or aggregate ID).
+    sequence_id = Column(UUIDType(), primary_key=True)
+
+    # Position (index) of the last item in the sequence.
+    position = Column(BigInteger(), nullable=False)
+
+    # Topic of the last item in the sequence.
+    topic = Column(String(255))
+
+
+class SqlTimestampSequenceHead(Base):
+    __tablename__ = 'timestamp_sequence_heads'
+
+    # Sequence ID (e.g. an entity or aggregate ID).
+    sequence_id = Column(UUIDType(), primary_key=True)
+
+    # Position (timestamp) of the last item in the sequence.
+    position = Column(Float(), nullable=False)
+
+    # Topic of the last item in the sequence.
+    topic = Column(String(255))
+
+
+class SqlTopicCode(Base):
+    __tablename__ = 'topic_codes'
+
+    # Topic (e.g. path to domain event class).
+    topic = Column(String(255), primary_key=True)
+
+    # Code which is stored instead of the topic.
+    code = Column(String(255), nullable=False, unique=True)
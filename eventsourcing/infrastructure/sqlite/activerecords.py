@@ -0,0 +1,415 @@
+import sqlite3
+from collections import OrderedDict
+from uuid import UUID
+
+import six
+
+from eventsourcing.exceptions import ConcurrencyError
+from eventsourcing.infrastructure.activerecord import AbstractActiveRecordStrategy, SequenceHead
+from eventsourcing.infrastructure.sqlite.datastore import SQLiteDatastore
+from eventsourcing.infrastructure.topiccodes import AbstractTopicCodeTable
+
+
+class SQLiteActiveRecordStrategy(AbstractActiveRecordStrategy):
+    """
+    Reads and writes sequenced items with the sqlite3 module, without an ORM.
+
+    Rows are selected as plain tuples, and made directly into sequenced
+    items. The SQL of each kind of query is constructed once, so that its
+    prepared statement is reused from the connection's statement cache.
+
+    Each row is given a commit position, one greater than the greatest
+    commit position in the table. Since SQLite has only one writer at a
+    time, commit positions increase in the order rows are committed.
+
+    If a head record class is given, the position and topic of the last
+    item of each sequence is kept in the head table, and updated in the
+    same transaction as the items are inserted, so that the head of a
+    sequence can be looked up by its key.
+    """
+
+    # The number of sequences selected by each query in get_items_many().
+    get_items_many_chunk_size = 200
+
+    def __init__(self, datastore, all_items_page_size=1000, head_record_class=None, *args, **kwargs):
+        assert isinstance(datastore, SQLiteDatastore)
+        super(SQLiteActiveRecordStrategy, self).__init__(*args, **kwargs)
+        self.datastore = datastore
+        self.all_items_page_size = all_items_page_size
+        self.table_name = self.active_record_class.__tablename__
+        self._statements = {}
+        self.insert_statement = (
+            "INSERT INTO {0} (sequence_id, position, topic, data, commit_position) "
+            "SELECT ?, ?, ?, ?, IFNULL(MAX(commit_position), 0) + 1 FROM {0}".format(self.table_name)
+        )
+        self.select_item_statement = (
+            "SELECT topic, data FROM {} WHERE sequence_id = ? AND position = ?".format(self.table_name)
+        )
+        self.head_record_class = head_record_class
+        if head_record_class is None:
+            self.select_head_statement = (
+                "SELECT position, topic FROM {} WHERE sequence_id = ? "
+                "ORDER BY position DESC LIMIT 1".format(self.table_name)
+            )
+        else:
+            head_table_name = head_record_class.__tablename__
+            self.select_head_statement = (
+                "SELECT position, topic FROM {} WHERE sequence_id = ?".format(head_table_name)
+            )
+            # Replaces the head, unless it is already at or after the position.
+            self.update_head_statement = (
+                "INSERT OR REPLACE INTO {0} (sequence_id, position, topic) SELECT ?, ?, ? "
+                "WHERE NOT EXISTS (SELECT 1 FROM {0} WHERE sequence_id = ? AND position >= ?)".format(head_table_name)
+            )
+
+    def append_item(self, sequenced_item):
+        if isinstance(sequenced_item, list):
+            items = sequenced_item
+        else:
+            items = [sequenced_item]
+
+        if not items:
+            return
+
+        rows = [self.to_row(item) for item in items]
+
+        with self.datastore.lock:
+            connection = self.datastore.connection
+            try:
+                if len(rows) == 1 and self.head_record_class is None:
+                    connection.execute(self.insert_statement, rows[0])
+                else:
+                    # Write all the items, and update the heads, in one transaction.
+                    connection.execute('BEGIN')
+                    try:
+                        connection.executemany(self.insert_statement, rows)
+                        if self.head_record_class is not None:
+                            connection.executemany(self.update_head_statement, self.head_rows(items))
+                    except Exception:
+                        connection.execute('ROLLBACK')
+                        raise
+                    else:
+                        connection.execute('COMMIT')
+            except sqlite3.IntegrityError as e:
+                self.raise_sequence_item_error(items[0].sequence_id, items[0].position, e)
+
+    def get_item(self, sequence_id, eq):
+        with self.datastore.lock:
+            params = (sqlite3.Binary(sequence_id.bytes), eq)
+            row = self.datastore.connection.execute(self.select_item_statement, params).fetchone()
+        if row is None:
+            self.raise_index_error(eq)
+        return self.sequenced_item_class(sequence_id, eq, row[0], row[1])
+
+    def get_head(self, sequence_id):
+        with self.datastore.lock:
+            params = (sqlite3.Binary(sequence_id.bytes),)
+            row = self.datastore.connection.execute(self.select_head_statement, params).fetchone()
+        if row is not None:
+            return SequenceHead(sequence_id, row[0], row[1])
+
+    def get_heads(self, sequence_ids):
+        if self.head_record_class is None:
+            return super(SQLiteActiveRecordStrategy, self).get_heads(sequence_ids)
+
+        sequence_ids = list(sequence_ids)
+        heads = OrderedDict((sequence_id, None) for sequence_id in sequence_ids)
+        chunk_size = self.get_items_many_chunk_size
+        for i in six.moves.range(0, len(sequence_ids), chunk_size):
+            chunk = sequence_ids[i:i + chunk_size]
+            statement = "SELECT sequence_id, position, topic FROM {} WHERE sequence_id IN ({})".format(
+                self.head_record_class.__tablename__, ', '.join('?' * len(chunk))
+            )
+            params = [sqlite3.Binary(sequence_id.bytes) for sequence_id in chunk]
+            with self.datastore.lock:
+                rows = self.datastore.connection.execute(statement, params).fetchall()
+            sequence_ids_by_bytes = {sequence_id.bytes: sequence_id for sequence_id in chunk}
+            for sequence_id, position, topic in rows:
+                sequence_id = sequence_ids_by_bytes[bytes(sequence_id)]
+                heads[sequence_id] = SequenceHead(sequence_id, position, topic)
+        return heads
+
+    def get_items(self, sequence_id, gt=None, gte=None, lt=None, lte=None, limit=None,
+                  query_ascending=True, results_ascending=True, topics=None):
+
+        assert limit is None or limit >= 1, limit
+
+        topics = None if topics is None else list(topics)
+        params = [sqlite3.Binary(sequence_id.bytes)]
+        for value in (gt, gte, lt, lte):
+            if value is not None:
+                params.append(value)
+        if topics is not None:
+            params += topics
+        if limit is not None:
+            params.append(limit)
+
+        statement = self.get_items_statement(
+            gt is not None, gte is not None, lt is not None, lte is not None, limit is not None, query_ascending,
+            num_topics=None if topics is None else len(topics),
+        )
+
+        with self.datastore.lock:
+            rows = self.datastore.connection.execute(statement, params).fetchall()
+
+        sequenced_item_class = self.sequenced_item_class
+        items = [sequenced_item_class(sequence_id, position, topic, data) for position, topic, data in rows]
+
+        if results_ascending != query_ascending:
+            items.reverse()
+
+        return items
+
+    def get_items_many(self, sequence_ids, gt=None, gte=None, lt=None, lte=None, limit=None,
+                       query_ascending=True, results_ascending=True):
+        """
+        Returns ordered dict of lists of sequenced items, for each of the given sequence IDs.
+
+        The items of many sequences are selected with one query (for each
+        chunk of sequence IDs). If there is a limit, the rows of each
+        sequence are numbered with a window function, so that only the
+        first rows of each sequence are selected.
+        """
+        if limit is not None and sqlite3.sqlite_version_info < (3, 25):
+            # SQLite has window functions since version 3.25.
+            return super(SQLiteActiveRecordStrategy, self).get_items_many(
+                sequence_ids, gt=gt, gte=gte, lt=lt, lte=lte, limit=limit,
+                query_ascending=query_ascending, results_ascending=results_ascending,
+            )
+
+        assert limit is None or limit >= 1, limit
+
+        sequence_ids = list(sequence_ids)
+        items = OrderedDict((sequence_id, []) for sequence_id in sequence_ids)
+        sequenced_item_class = self.sequenced_item_class
+        order = 'ASC' if query_ascending else 'DESC'
+        chunk_size = self.get_items_many_chunk_size
+        for i in six.moves.range(0, len(sequence_ids), chunk_size):
+            chunk = sequence_ids[i:i + chunk_size]
+
+            # Group the sequences that have the same range, so each group is one "IN" condition.
+            groups = OrderedDict()
+            for sequence_id in chunk:
+                groups.setdefault(self.get_bounds(sequence_id, gt, gte, lt, lte), []).append(sequence_id)
+
+            conditions = []
+            params = []
+            for bounds, group in groups.items():
+                condition = "sequence_id IN ({})".format(', '.join('?' * len(group)))
+                params += [sqlite3.Binary(sequence_id.bytes) for sequence_id in group]
+                for operator, value in zip(('>', '>=', '<', '<='), bounds):
+                    if value is not None:
+                        condition += " AND position {} ?".format(operator)
+                        params.append(value)
+                conditions.append("({})".format(condition))
+
+            where = " OR ".join(conditions)
+            if limit is None:
+                statement = "SELECT sequence_id, position, topic, data FROM {} WHERE {} ORDER BY position {}".format(
+                    self.table_name, where, order
+                )
+            else:
+                # Number the rows of each sequence, and select the first rows of each.
+                statement = (
+                    "SELECT sequence_id, position, topic, data FROM ("
+                    "SELECT sequence_id, position, topic, data, "
+                    "ROW_NUMBER() OVER (PARTITION BY sequence_id ORDER BY position {2}) AS row_number "
+                    "FROM {0} WHERE {1}"
+                    ") WHERE row_number <= ? ORDER BY position {2}".format(self.table_name, where, order)
+                )
+                params.append(limit)
+
+            with self.datastore.lock:
+                rows = self.datastore.connection.execute(statement, params).fetchall()
+
+            sequence_ids_by_bytes = {sequence_id.bytes: sequence_id for sequence_id in chunk}
+            for sequence_id, position, topic, data in rows:
+                sequence_id = sequence_ids_by_bytes[bytes(sequence_id)]
+                items[sequence_id].append(sequenced_item_class(sequence_id, position, topic, data))
+
+        if results_ascending != query_ascending:
+            for sequence_items in items.values():
+                sequence_items.reverse()
+
+        return items
+
+    def all_items(self, page_size=None, topics=None):
+        """
+        Yields all items, in the order they were committed, reading one page at a time.
+        """
+        page_size = page_size or self.all_items_page_size
+        after = None
+        while True:
+            page = self.read_all(after=after, limit=page_size, topics=topics)
+            for _, item in page:
+                yield item
+            if len(page) < page_size:
+                break
+            after = page[-1][0]
+
+    def read_all(self, after=None, limit=None, topics=None):
+        """
+        Returns list of (position, item) pairs, where the position is the commit position of the row.
+        """
+        return self.select_all(after, limit, topics)
+
+    def read_partition(self, partition, num_partitions, after=None, limit=None, topics=None):
+        """
+        Returns list of (position, item) pairs for the partition, where the position is the commit position of the row.
+
+        Sequence IDs are compared as blobs, so the partitions are ranges of the primary key.
+        """
+        partition_range = self.get_partition_range(partition, num_partitions)
+        return self.select_all(after, limit, topics, partition_range=partition_range)
+
+    def select_all(self, after, limit, topics, partition_range=None):
+        """
+        Returns list of (commit position, item) pairs, in the order the rows were committed.
+        """
+        statement = "SELECT commit_position, sequence_id, position, topic, data FROM {}".format(self.table_name)
+        conditions = []
+        params = []
+        if partition_range is not None:
+            lo, hi = partition_range
+            conditions.append("sequence_id >= ?")
+            params.append(sqlite3.Binary(lo.bytes))
+            if hi is not None:
+                conditions.append("sequence_id < ?")
+                params.append(sqlite3.Binary(hi.bytes))
+        if after is not None:
+            conditions.append("commit_position > ?")
+            params.append(after)
+        if topics is not None:
+            topics = list(topics)
+            conditions.append(self.topics_condition(len(topics)))
+            params += topics
+        if conditions:
+            statement += " WHERE " + " AND ".join(conditions)
+        statement += " ORDER BY commit_position"
+        if limit is not None:
+            statement += " LIMIT ?"
+            params.append(limit)
+
+        with self.datastore.lock:
+            rows = self.datastore.connection.execute(statement, params).fetchall()
+
+        sequenced_item_class = self.sequenced_item_class
+        return [
+            (commit_position, sequenced_item_class(UUID(bytes=bytes(sequence_id)), position, topic, data))
+            for commit_position, sequence_id, position, topic, data in rows
+        ]
+
+    def get_items_statement(self, has_gt, has_gte, has_lt, has_lte, has_limit, query_ascending, num_topics=None):
+        """
+        Returns SQL that selects a range of items, constructed once for each combination of arguments.
+        """
+        key = (has_gt, has_gte, has_lt, has_lte, has_limit, query_ascending, num_topics)
+        try:
+            return self._statements[key]
+        except KeyError:
+            statement = "SELECT position, topic, data FROM {} WHERE sequence_id = ?".format(self.table_name)
+            if has_gt:
+                statement += " AND position > ?"
+            if has_gte:
+                statement += " AND position >= ?"
+            if has_lt:
+                statement += " AND position < ?"
+            if has_lte:
+                statement += " AND position <= ?"
+            if num_topics is not None:
+                statement += " AND " + self.topics_condition(num_topics)
+            statement += " ORDER BY position {}".format('ASC' if query_ascending else 'DESC')
+            if has_limit:
+                statement += " LIMIT ?"
+            self._statements[key] = statement
+            return statement
+
+    @staticmethod
+    def topics_condition(num_topics):
+        """
+        Returns SQL condition that the topic is one of the given number of topics.
+        """
+        if num_topics == 0:
+            # No topics match.
+            return "0"
+        return "topic IN ({})".format(', '.join('?' * num_topics))
+
+    def head_rows(self, items):
+        """
+        Returns list of parameters for the head statement, for the last of the given items in each sequence.
+        """
+        rows = []
+        for item in self.last_items(items):
+            sequence_id = sqlite3.Binary(item.sequence_id.bytes)
+            rows.append((sequence_id, item.position, item.topic, sequence_id, item.position))
+        return rows
+
+    def to_row(self, sequenced_item):
+        """
+        Returns tuple of column values, from given sequenced item.
+        """
+        assert isinstance(sequenced_item, self.sequenced_item_class), type(sequenced_item)
+        return (
+            sqlite3.Binary(sequenced_item.sequence_id.bytes),
+            sequenced_item.position,
+            sequenced_item.topic,
+            sequenced_item.data,
+        )
+
+
+class SQLiteTopicCodeTable(AbstractTopicCodeTable):
+    def __init__(self, datastore, record_class=None):
+        assert isinstance(datastore, SQLiteDatastore)
+        self.datastore = datastore
+        self.table_name = (record_class or SQLiteTopicCode).__tablename__
+
+    def get_codes(self):
+        with self.datastore.lock:
+            statement = "SELECT topic, code FROM {}".format(self.table_name)
+            return self.datastore.connection.execute(statement).fetchall()
+
+    def insert_code(self, topic, code):
+        with self.datastore.lock:
+            statement = "INSERT INTO {} (topic, code) VALUES (?, ?)".format(self.table_name)
+            try:
+                self.datastore.connection.execute(statement, (topic, code))
+            except sqlite3.IntegrityError as e:
+                raise ConcurrencyError(e)
+
+
+class SQLiteIntegerSequencedItem(object):
+    __tablename__ = 'integer_sequenced_items'
+
+    # Position (index) of item in sequence.
+    position_type = 'INTEGER'
+
+
+class SQLiteTimestampSequencedItem(object):
+    __tablename__ = 'timestamp_sequenced_items'
+
+    # Position (timestamp) of item in sequence.
+    position_type = 'REAL'
+
+
+class SQLiteIntegerSequenceHead(object):
+    __tablename__ = 'integer_sequence_heads'
+
+    # Position of the last item in the sequence.
+    position_type = 'INTEGER'
+
+    is_head_table = True
+
+
+class SQLiteTimestampSequenceHead(object):
+    __tablename__ = 'timestamp_sequence_heads'
+
+    # Position of the last item in the sequence.
+    position_type = 'REAL'
+
+    is_head_table = True
+
+
+class SQLiteTopicCode(object):
+    __tablename__ = 'topic_codes'
+
+    is_topic_code_table = True
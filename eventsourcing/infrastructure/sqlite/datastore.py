@@ -0,0 +1,106 @@
+import os
+import sqlite3
+from threading import RLock
+
+from eventsourcing.infrastructure.datastore import Datastore, DatastoreConnectionError, DatastoreSettings
+
+DEFAULT_SQLITE_DB_PATH = ':memory:'
+
+
+class SQLiteSettings(DatastoreSettings):
+    DB_PATH = os.getenv('SQLITE_DB_PATH', DEFAULT_SQLITE_DB_PATH)
+
+    def __init__(self, path=None, journal_mode='WAL', synchronous='NORMAL', cached_statements=200):
+        self.path = path or self.DB_PATH
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cached_statements = cached_statements
+
+
+class SQLiteDatastore(Datastore):
+    """
+    Uses the sqlite3 module directly, with one connection shared by all threads.
+    """
+
+    def __init__(self, **kwargs):
+        super(SQLiteDatastore, self).__init__(**kwargs)
+        self._connection = None
+        self.lock = RLock()
+
+    def setup_connection(self):
+        assert isinstance(self.settings, SQLiteSettings), self.settings
+        with self.lock:
+            if self._connection is not None:
+                return
+            # Statements are prepared once, and reused from the connection's statement cache.
+            # Transactions are started explicitly, by the active record strategies.
+            connection = sqlite3.connect(
+                self.settings.path,
+                check_same_thread=False,
+                isolation_level=None,
+                cached_statements=self.settings.cached_statements,
+            )
+            if self.settings.journal_mode:
+                connection.execute('PRAGMA journal_mode={}'.format(self.settings.journal_mode))
+            if self.settings.synchronous:
+                connection.execute('PRAGMA synchronous={}'.format(self.settings.synchronous))
+            self._connection = connection
+
+    def drop_connection(self):
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def setup_tables(self):
+        with self.lock:
+            for table in self.tables:
+                if getattr(table, 'is_head_table', False):
+                    # The position and topic of the last item in each sequence.
+                    self.connection.execute(
+                        "CREATE TABLE IF NOT EXISTS {} ("
+                        "sequence_id BLOB NOT NULL PRIMARY KEY, "
+                        "position {} NOT NULL, "
+                        "topic TEXT NOT NULL"
+                        ") WITHOUT ROWID".format(table.__tablename__, table.position_type)
+                    )
+                    continue
+                if getattr(table, 'is_topic_code_table', False):
+                    # The codes which are stored instead of topics.
+                    self.connection.execute(
+                        "CREATE TABLE IF NOT EXISTS {} ("
+                        "topic TEXT NOT NULL PRIMARY KEY, "
+                        "code TEXT NOT NULL UNIQUE"
+                        ")".format(table.__tablename__)
+                    )
+                    continue
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS {} ("
+                    "sequence_id BLOB NOT NULL, "
+                    "position {} NOT NULL, "
+                    "topic TEXT NOT NULL, "
+                    "data TEXT NOT NULL, "
+                    "commit_position INTEGER NOT NULL, "
+                    "PRIMARY KEY (sequence_id, position)"
+                    ") WITHOUT ROWID".format(table.__tablename__, table.position_type)
+                )
+                self.connection.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS {0}_commit_position "
+                    "ON {0} (commit_position)".format(table.__tablename__)
+                )
+                # Supports selecting the items of a sequence that have particular topics.
+                self.connection.execute(
+                    "CREATE INDEX IF NOT EXISTS {0}_topic "
+                    "ON {0} (sequence_id, topic, position)".format(table.__tablename__)
+                )
+
+    def drop_tables(self):
+        with self.lock:
+            for table in self.tables:
+                self.connection.execute("DROP TABLE IF EXISTS {}".format(table.__tablename__))
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            raise DatastoreConnectionError("Need to call setup_connection() first")
+        return self._connection
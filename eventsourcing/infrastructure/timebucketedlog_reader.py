@@ -27,14 +27,19 @@ class TimebucketedlogReader(with_metaclass(QualnameABCMeta)):
         self.position = None
 
     def get_messages(self, gt=None, gte=None, lt=None, lte=None, limit=None, is_ascending=False, page_size=None):
+        # Events that aren't logged messages are skipped without being decoded.
         events = self.get_events(gt=gt, gte=gte, lt=lt, lte=lte, limit=limit, is_ascending=is_ascending,
-                                 page_size=page_size)
+                                 page_size=page_size, event_filter=self.is_message_logged)
         for event in events:
-            if isinstance(event, MessageLogged):
-                self.position = event.timestamp
-                yield event.message
+            self.position = event.timestamp
+            yield event.message
 
-    def get_events(self, gt=None, gte=None, lt=None, lte=None, limit=None, is_ascending=False, page_size=None):
+    @staticmethod
+    def is_message_logged(lazy_event):
+        return issubclass(lazy_event.event_class, MessageLogged)
+
+    def get_events(self, gt=None, gte=None, lt=None, lte=None, limit=None, is_ascending=False, page_size=None,
+                   event_filter=None):
         assert limit is None or limit > 0
 
         # Identify the first time bucket.
@@ -61,23 +66,24 @@ class TimebucketedlogReader(with_metaclass(QualnameABCMeta)):
                 limit=limit,
                 is_ascending=is_ascending,
                 page_size=page_size,
+                event_filter=event_filter,
             ):
                 yield message_logged_event
 
                 if limit is not None:
                     count_events += 1
                     if count_events >= limit:
-                        raise StopIteration
+                        return
 
             # See if there's another bucket.
             if is_ascending:
                 next_timestamp = next_bucket_starts(position, self.log.bucket_size)
                 if next_timestamp > absolute_latest:
-                    raise StopIteration
+                    return
                 else:
                     position = next_timestamp
             else:
                 if position < absolute_earlyist:
-                    raise StopIteration
+                    return
                 else:
                     position = previous_bucket_starts(position, self.log.bucket_size)
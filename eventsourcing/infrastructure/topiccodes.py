@@ -0,0 +1,120 @@
+from abc import ABCMeta, abstractmethod
+from threading import Lock
+
+import six
+
+from eventsourcing.exceptions import ConcurrencyError, TopicResolutionError
+
+
+class AbstractTopicCodeTable(six.with_metaclass(ABCMeta)):
+    """
+    Persists the codes of topics.
+    """
+
+    @abstractmethod
+    def get_codes(self):
+        """
+        Returns list of (topic, code) pairs.
+        """
+
+    @abstractmethod
+    def insert_code(self, topic, code):
+        """
+        Saves code of topic. Raises ConcurrencyError if the topic or the code has already been saved.
+        """
+
+
+class PythonObjectsTopicCodeTable(AbstractTopicCodeTable):
+    def __init__(self):
+        self._codes = {}
+        self._lock = Lock()
+
+    def get_codes(self):
+        with self._lock:
+            return list(self._codes.items())
+
+    def insert_code(self, topic, code):
+        with self._lock:
+            if topic in self._codes or code in self._codes.values():
+                raise ConcurrencyError((topic, code))
+            self._codes[topic] = code
+
+
+class TopicCodes(object):
+    """
+    Maps topics to compact codes, which are stored in place of the topics.
+
+    Codes are small integers, as text so that they fit the topic columns
+    of the existing tables. A code is allocated the first time a topic is
+    encoded. If a code table is given, codes are saved in it, so that all
+    the processes using the table agree on the codes.
+
+    Stored topics that aren't codes (e.g. items stored before codes were
+    used) are decoded as they are.
+    """
+
+    def __init__(self, code_table=None):
+        assert code_table is None or isinstance(code_table, AbstractTopicCodeTable), code_table
+        self.code_table = code_table
+        self._codes = {}
+        self._topics = {}
+        self._lock = Lock()
+        if code_table is not None:
+            self.load()
+
+    def load(self):
+        """
+        Loads the codes in the code table.
+        """
+        for topic, code in self.code_table.get_codes():
+            self._codes[topic] = code
+            self._topics[code] = topic
+
+    def encode(self, topic):
+        try:
+            return self._codes[topic]
+        except KeyError:
+            return self._allocate(topic)
+
+    def lookup(self, topic):
+        """
+        Returns the code of the topic, or None if it hasn't got one. Doesn't allocate a code.
+        """
+        try:
+            return self._codes[topic]
+        except KeyError:
+            # The code may have been allocated by another process.
+            if self.code_table is not None:
+                with self._lock:
+                    self.load()
+            return self._codes.get(topic)
+
+    def decode(self, stored_topic):
+        try:
+            return self._topics[stored_topic]
+        except KeyError:
+            if not stored_topic.isdigit():
+                return stored_topic
+            # The code may have been allocated by another process.
+            if self.code_table is not None:
+                with self._lock:
+                    self.load()
+            try:
+                return self._topics[stored_topic]
+            except KeyError:
+                raise TopicResolutionError("Topic code not found: {}".format(stored_topic))
+
+    def _allocate(self, topic):
+        with self._lock:
+            while topic not in self._codes:
+                code = six.text_type(max([int(c) for c in self._topics] or [0]) + 1)
+                if self.code_table is not None:
+                    try:
+                        self.code_table.insert_code(topic, code)
+                    except ConcurrencyError:
+                        # Another process saved the topic or the code first.
+                        self.load()
+                        continue
+                self._codes[topic] = code
+                self._topics[code] = topic
+            return self._codes[topic]
@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 
+import base64
 import datetime
 import json
 from abc import ABCMeta, abstractmethod
@@ -9,10 +10,14 @@ from json.encoder import JSONEncoder
 from uuid import UUID
 
 import dateutil.parser
+import dateutil.tz
 import six
 
-from eventsourcing.domain.model.events import resolve_domain_topic, topic_from_domain_class
+from eventsourcing.domain.model.events import resolve_domain_topic, topic_from_domain_class, \
+    topic_registry as default_topic_registry
 from eventsourcing.domain.services.cipher import AbstractCipher
+from eventsourcing.infrastructure.compression import AbstractCompressor
+from eventsourcing.infrastructure.topiccodes import TopicCodes
 
 EntityVersion = namedtuple('EntityVersion', ['entity_version_id', 'event_id'])
 
@@ -54,15 +59,128 @@ class AbstractSequencedItemMapper(six.with_metaclass(ABCMeta)):
     def from_sequenced_item(self, serialized_event):
         """Deserializes domain events."""
 
+    def from_sequenced_items(self, sequenced_items):
+        """Deserializes a page of domain events, returning a list."""
+        return [self.from_sequenced_item(i) for i in sequenced_items]
+
+    def from_sequenced_item_lazy(self, sequenced_item):
+        """Returns a lazy domain event, that is deserialized when its attributes are first accessed."""
+        event_class = resolve_domain_topic(self.decode_topic(sequenced_item.topic))
+        return LazyDomainEvent(sequenced_item, event_class, lambda item, cls: self.from_sequenced_item(item))
+
+    def encode_topic(self, topic):
+        """Returns the topic as it is stored in sequenced items."""
+        return topic
+
+    def decode_topic(self, stored_topic):
+        """Returns the topic, from the topic of a sequenced item."""
+        return stored_topic
+
+    def get_stored_topics(self, topic):
+        """Returns list of the topics that items with the given topic may be stored with, for selecting items."""
+        return [topic]
+
+
+class LazyDomainEvent(object):
+    """
+    Wraps a sequenced item, and decodes the domain event when its attributes are first accessed.
+
+    The class of the domain event, and the entity ID and position, are
+    available without decoding (or decrypting) the data of the item.
+    """
+    __slots__ = ('sequenced_item', 'event_class', '_decode', '_domain_event')
+
+    def __init__(self, sequenced_item, event_class, decode):
+        self.sequenced_item = sequenced_item
+        self.event_class = event_class
+        self._decode = decode
+        self._domain_event = None
+
+    @property
+    def entity_id(self):
+        return self.sequenced_item.sequence_id
+
+    @property
+    def position(self):
+        return self.sequenced_item.position
+
+    @property
+    def is_decoded(self):
+        return self._domain_event is not None
+
+    @property
+    def domain_event(self):
+        """
+        Returns the decoded domain event.
+        """
+        if self._domain_event is None:
+            self._domain_event = self._decode(self.sequenced_item, self.event_class)
+        return self._domain_event
+
+    def __getattr__(self, name):
+        return getattr(self.domain_event, name)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyDomainEvent):
+            other = other.domain_event
+        return self.domain_event == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.domain_event)
+
+    def __repr__(self):
+        return "<{} {} {!r}>".format(type(self).__name__, self.event_class.__name__, self.sequenced_item)
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# The time zones of UTC offsets (in seconds).
+_tzinfos = {}
+
+
+def tzinfo_from_offset(offset):
+    """
+    Returns time zone with given UTC offset in seconds, as dateutil would parse it.
+    """
+    try:
+        return _tzinfos[offset]
+    except KeyError:
+        tzinfo = _tzinfos[offset] = dateutil.tz.tzutc() if offset == 0 else dateutil.tz.tzoffset(None, offset)
+        return tzinfo
+
+
+def timedelta_micros(delta):
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
 
 class ObjectJSONEncoder(JSONEncoder):
+    """
+    Encodes datetimes, dates, UUIDs and objects as JSON objects.
+
+    If compact_datetimes is set, datetimes are encoded as integer microseconds
+    since the epoch (with the UTC offset, if they are aware). If compact_uuids
+    is set, UUIDs are encoded as their 16 bytes in base64.
+    """
+
+    def __init__(self, compact_datetimes=False, compact_uuids=False, **kwargs):
+        super(ObjectJSONEncoder, self).__init__(**kwargs)
+        self.compact_datetimes = compact_datetimes
+        self.compact_uuids = compact_uuids
+
     def default(self, obj):
         if isinstance(obj, datetime.datetime):
-            return {'ISO8601_datetime': obj.strftime('%Y-%m-%dT%H:%M:%S.%f%z')}
+            if self.compact_datetimes:
+                return ObjectJSONEncoder._encode_datetime_compact(obj)
+            return ObjectJSONEncoder._encode_datetime(obj)
         elif isinstance(obj, datetime.date):
-            return {'ISO8601_date': obj.isoformat()}
+            return ObjectJSONEncoder._encode_date(obj)
         elif isinstance(obj, UUID):
-            return {'UUID': obj.hex}
+            if self.compact_uuids:
+                return ObjectJSONEncoder._encode_uuid_compact(obj)
+            return ObjectJSONEncoder._encode_uuid(obj)
         elif hasattr(obj, '__class__') and hasattr(obj, '__dict__'):
             topic = topic_from_domain_class(obj.__class__)
             state = obj.__dict__.copy()
@@ -76,34 +194,99 @@ class ObjectJSONEncoder(JSONEncoder):
         # Let the base class default method raise the TypeError.
         return JSONEncoder.default(self, obj)
 
+    @staticmethod
+    def _encode_datetime(obj):
+        return {'ISO8601_datetime': obj.strftime('%Y-%m-%dT%H:%M:%S.%f%z')}
+
+    @staticmethod
+    def _encode_datetime_compact(obj):
+        offset = obj.utcoffset()
+        if offset is None:
+            return {'datetime_us': timedelta_micros(obj - EPOCH)}
+        # The wall time, and the UTC offset in seconds.
+        return {'datetime_us_tz': [timedelta_micros(obj.replace(tzinfo=None) - EPOCH),
+                                   offset.days * 86400 + offset.seconds]}
+
+    @staticmethod
+    def _encode_date(obj):
+        return {'ISO8601_date': obj.isoformat()}
+
+    @staticmethod
+    def _encode_uuid(obj):
+        return {'UUID': obj.hex}
+
+    @staticmethod
+    def _encode_uuid_compact(obj):
+        return {'UUID_b64': base64.urlsafe_b64encode(obj.bytes)[:22].decode('ascii')}
+
 
 class ObjectJSONDecoder(JSONDecoder):
+    """
+    Decodes the JSON objects of ObjectJSONEncoder, whether or not they are compact.
+    """
+
     def __init__(self, **kwargs):
         super(ObjectJSONDecoder, self).__init__(object_hook=ObjectJSONDecoder.from_jsonable, **kwargs)
 
     @staticmethod
     def from_jsonable(d):
-        if 'ISO8601_datetime' in d:
-            return ObjectJSONDecoder._decode_datetime(d)
-        elif 'ISO8601_date' in d:
-            return ObjectJSONDecoder._decode_date(d)
-        elif 'UUID' in d:
-            return ObjectJSONDecoder._decode_uuid(d)
-        elif '__class__' in d:
-            return ObjectJSONDecoder._decode_object(d)
+        if len(d) == 1:
+            for key in d:
+                decode = _value_decoders.get(key)
+                if decode is not None:
+                    return decode(d)
         return d
 
     @staticmethod
     def _decode_date(d):
-        return datetime.datetime.strptime(d['ISO8601_date'], '%Y-%m-%d').date()
+        value = d['ISO8601_date']
+        if len(value) == 10:
+            try:
+                return datetime.date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+            except ValueError:
+                pass
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
 
     @staticmethod
     def _decode_datetime(d):
-        return dateutil.parser.parse(d['ISO8601_datetime'])
+        # Values written by the encoder have a fixed format (with or without
+        # a UTC offset), so they are sliced, rather than parsed with dateutil.
+        value = d['ISO8601_datetime']
+        length = len(value)
+        if (length == 26 or length == 31) and value[10] == 'T' and value[19] == '.':
+            try:
+                dt = datetime.datetime(
+                    int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                    int(value[11:13]), int(value[14:16]), int(value[17:19]), int(value[20:26]),
+                )
+                if length == 26:
+                    return dt
+                if value[26] in '+-':
+                    offset = int(value[27:29]) * 3600 + int(value[29:31]) * 60
+                    return dt.replace(tzinfo=tzinfo_from_offset(-offset if value[26] == '-' else offset))
+            except ValueError:
+                pass
+        return dateutil.parser.parse(value)
+
+    @staticmethod
+    def _decode_datetime_compact(d):
+        return EPOCH + datetime.timedelta(microseconds=d['datetime_us'])
+
+    @staticmethod
+    def _decode_datetime_tz_compact(d):
+        micros, offset = d['datetime_us_tz']
+        return (EPOCH + datetime.timedelta(microseconds=micros)).replace(tzinfo=tzinfo_from_offset(offset))
 
     @staticmethod
     def _decode_uuid(d):
-        return UUID(d['UUID'])
+        value = d['UUID']
+        if len(value) == 32:
+            return UUID(int=int(value, 16))
+        return UUID(value)
+
+    @staticmethod
+    def _decode_uuid_compact(d):
+        return UUID(bytes=base64.urlsafe_b64decode(d['UUID_b64'].encode('ascii') + b'=='))
 
     @staticmethod
     def _decode_object(d):
@@ -115,13 +298,193 @@ class ObjectJSONDecoder(JSONDecoder):
         return obj
 
 
+# Decodes the JSON objects of ObjectJSONEncoder, by their keys.
+_value_decoders = {
+    'ISO8601_datetime': ObjectJSONDecoder._decode_datetime,
+    'ISO8601_date': ObjectJSONDecoder._decode_date,
+    'UUID': ObjectJSONDecoder._decode_uuid,
+    'datetime_us': ObjectJSONDecoder._decode_datetime_compact,
+    'datetime_us_tz': ObjectJSONDecoder._decode_datetime_tz_compact,
+    'UUID_b64': ObjectJSONDecoder._decode_uuid_compact,
+    '__class__': ObjectJSONDecoder._decode_object,
+}
+
+
+class AbstractCodec(six.with_metaclass(ABCMeta)):
+    """
+    Encodes the attributes of domain events as the data of sequenced items.
+    """
+
+    # Whether the encoded data is bytes, rather than text.
+    is_binary = False
+
+    @abstractmethod
+    def encode(self, obj):
+        """Returns data that represents the given dict of attribute values."""
+
+    @abstractmethod
+    def decode(self, data):
+        """Returns dict of attribute values, from the given data."""
+
+    def encode_event_attrs(self, event_class, attrs):
+        """Returns data that represents the attributes of an event of the given class, without changing them."""
+        return self.encode(attrs)
+
+    def decode_event_attrs(self, event_class, data):
+        """Returns dict of attribute values of an event of the given class, from the given data."""
+        return self.decode(data)
+
+
+class JSONCodec(AbstractCodec):
+    """
+    Encodes attribute values as JSON text, with the given encoder and decoder classes.
+
+    The compact options are passed to the encoder, if they are set.
+    """
+
+    def __init__(self, encoder_class=ObjectJSONEncoder, decoder_class=ObjectJSONDecoder, compact_datetimes=False,
+                 compact_uuids=False):
+        self.encoder_class = encoder_class
+        self.decoder_class = decoder_class
+        encoder_options = {}
+        if compact_datetimes:
+            encoder_options['compact_datetimes'] = True
+        if compact_uuids:
+            encoder_options['compact_uuids'] = True
+        # The encoder and decoder are made once, rather than for each call.
+        self.encoder = encoder_class(separators=(',', ':'), sort_keys=True, **encoder_options)
+        self.decoder = decoder_class()
+
+    def encode(self, obj):
+        return self.encoder.encode(obj)
+
+    def decode(self, data):
+        return self.decoder.decode(data)
+
+
+class CompiledJSONCodec(JSONCodec):
+    """
+    Encodes attribute values as JSON text, in the same format as JSONCodec
+    with the object encoder and decoder, using an encoder and a decoder
+    made for each class of event.
+
+    The encoder of a class converts the values of the attributes which,
+    in the first event of the class, were UUIDs, datetimes or dates,
+    without the JSON encoder's default method. The decoder of a class
+    parses the JSON without an object hook, and converts UUIDs, datetimes
+    and dates. If an event has other objects, or nested values, it is
+    decoded with the object hook, and so are later events of its class.
+
+    It isn't the default codec, since whether it is faster than JSONCodec
+    depends on the events (see the codec benchmarks in test_performance),
+    so it needs to be passed to the sequenced item mapper explicitly.
+    """
+
+    # Converts JSON objects with one of these keys to values.
+    value_decoders = {
+        'ISO8601_datetime': ObjectJSONDecoder._decode_datetime,
+        'ISO8601_date': ObjectJSONDecoder._decode_date,
+        'UUID': ObjectJSONDecoder._decode_uuid,
+        'datetime_us': ObjectJSONDecoder._decode_datetime_compact,
+        'datetime_us_tz': ObjectJSONDecoder._decode_datetime_tz_compact,
+        'UUID_b64': ObjectJSONDecoder._decode_uuid_compact,
+    }
+
+    def __init__(self, compact_datetimes=False, compact_uuids=False):
+        super(CompiledJSONCodec, self).__init__(compact_datetimes=compact_datetimes, compact_uuids=compact_uuids)
+        # Converts values of these types to JSON objects.
+        self.value_encoders = {
+            datetime.datetime: (ObjectJSONEncoder._encode_datetime_compact if compact_datetimes
+                                else ObjectJSONEncoder._encode_datetime),
+            datetime.date: ObjectJSONEncoder._encode_date,
+            UUID: ObjectJSONEncoder._encode_uuid_compact if compact_uuids else ObjectJSONEncoder._encode_uuid,
+        }
+        self._encoders = {}
+        self._decoders = {}
+
+    def encode_event_attrs(self, event_class, attrs):
+        try:
+            encoder = self._encoders[event_class]
+        except KeyError:
+            encoder = self._encoders[event_class] = self.compile_encoder(attrs)
+        return encoder(attrs)
+
+    def decode_event_attrs(self, event_class, data):
+        try:
+            decoder = self._decoders[event_class]
+        except KeyError:
+            decoder = self._decoders[event_class] = self.compile_decoder(event_class)
+        return decoder(data)
+
+    def compile_encoder(self, attrs):
+        """
+        Returns function that encodes attributes, with the types of the given attribute values.
+        """
+        field_encoders = []
+        for name, value in six.iteritems(attrs):
+            value_encoder = self.value_encoders.get(type(value))
+            if value_encoder is not None:
+                field_encoders.append((name, type(value), value_encoder))
+
+        if not field_encoders:
+            return self.encode
+
+        def encode(attrs):
+            jsonable = dict(attrs)
+            for name, value_type, value_encoder in field_encoders:
+                value = jsonable.get(name)
+                if type(value) is value_type:
+                    jsonable[name] = value_encoder(value)
+            return self.encode(jsonable)
+
+        return encode
+
+    def compile_decoder(self, event_class):
+        """
+        Returns function that decodes attributes of events of the given class.
+        """
+        value_decoders = self.value_decoders
+
+        def decode(data):
+            attrs = json.loads(data)
+            for name, value in six.iteritems(attrs):
+                value_type = type(value)
+                if value_type is dict:
+                    if len(value) == 1:
+                        for key in value:
+                            value_decoder = value_decoders.get(key)
+                        if value_decoder is not None:
+                            attrs[name] = value_decoder(value)
+                            continue
+                elif value_type is not list:
+                    continue
+                # Decode this event, and later events of this class, with the object hook.
+                self._decoders[event_class] = self.decode
+                return self.decode(data)
+            return attrs
+
+        return decode
+
+
 class SequencedItemMapper(AbstractSequencedItemMapper):
     """
-    Uses JSON to transcode domain events.
+    Uses a codec (JSON by default) to transcode domain events.
+
+    Topics are got and resolved with a topic registry. If topic codes are
+    given, sequenced items have the codes of the topics instead of the topics.
+
+    The compact options make the default codec encode datetimes as integers,
+    and UUIDs as base64. Data in either format can be decoded either way.
+
+    If a compressor is given, the encoded data is compressed (before it is
+    encrypted), and the data of sequenced items is bytes. Data stored
+    without compression is still decoded.
     """
 
     def __init__(self, position_attr_name, encoder_class=ObjectJSONEncoder, decoder_class=ObjectJSONDecoder,
-                 always_encrypt=False, cipher=None, sequenced_item_class=SequencedItem):
+                 always_encrypt=False, cipher=None, sequenced_item_class=SequencedItem, codec=None,
+                 topic_registry=None, topic_codes=None, compact_datetimes=False, compact_uuids=False,
+                 compressor=None):
 
         self.position_attr_name = position_attr_name
         self.json_encoder_class = encoder_class
@@ -129,6 +492,18 @@ class SequencedItemMapper(AbstractSequencedItemMapper):
         self.cipher = cipher
         self.always_encrypt = always_encrypt
         self.sequenced_item_class = sequenced_item_class
+        if codec is None:
+            codec = JSONCodec(encoder_class=encoder_class, decoder_class=decoder_class,
+                              compact_datetimes=compact_datetimes, compact_uuids=compact_uuids)
+        assert isinstance(codec, AbstractCodec), codec
+        self.codec = codec
+        self.topic_registry = topic_registry or default_topic_registry
+        assert topic_codes is None or isinstance(topic_codes, TopicCodes), topic_codes
+        self.topic_codes = topic_codes
+        assert compressor is None or isinstance(compressor, AbstractCompressor), compressor
+        self.compressor = compressor
+        # Whether the data of sequenced items is bytes, rather than text.
+        self.is_binary = codec.is_binary or compressor is not None
 
     def to_sequenced_item(self, domain_event):
         """
@@ -139,32 +514,30 @@ class SequencedItemMapper(AbstractSequencedItemMapper):
         """
         # assert isinstance(domain_event, EventWithEntityID), type(domain_event)
 
-        # Copy the state of the domain event.
-        event_attrs = domain_event.__dict__.copy()
+        # The state of the domain event, which isn't changed by the codec.
+        event_attrs = domain_event.__dict__
 
         # Pick out the attributes of a sequenced item.
         sequence_id = domain_event.entity_id
         position = event_attrs[self.position_attr_name]
-        topic = topic_from_domain_class(type(domain_event))
-
-        # Serialise event attributes to JSON.
-        event_data = json.dumps(
-            event_attrs,
-            separators=(',', ':'),
-            sort_keys=True,
-            cls=self.json_encoder_class,
-        )
+        topic = self.topic_registry.get_topic(type(domain_event))
+
+        # Serialise event attributes with the codec.
+        event_data = self.codec.encode_event_attrs(type(domain_event), event_attrs)
+
+        # Compress (optional).
+        if self.compressor is not None:
+            event_data = self.compressor.compress(event_data, topic)
 
         # Encrypt (optional).
-        if self.always_encrypt or getattr(domain_event.__class__, '__always_encrypt__', None):
-            assert isinstance(self.cipher, AbstractCipher)
-            event_data = self.cipher.encrypt(event_data)
+        if self.is_encrypted(type(domain_event)):
+            event_data = self.encrypt(event_data)
 
         # Return a sequenced item.
         sequenced_item = self.sequenced_item_class(
             sequence_id=sequence_id,
             position=position,
-            topic=topic,
+            topic=self.encode_topic(topic),
             data=event_data,
         )
         return sequenced_item
@@ -177,23 +550,109 @@ class SequencedItemMapper(AbstractSequencedItemMapper):
         assert isinstance(sequenced_item, self.sequenced_item_class), type(sequenced_item)
 
         # Get the domain event class from the topic.
-        event_class = resolve_domain_topic(sequenced_item.topic)
+        event_class = self.resolve_topic(sequenced_item.topic)
 
-        event_attrs = sequenced_item.data
+        return self._from_sequenced_item(sequenced_item, event_class)
 
-        # Decrypt (optional).
-        if self.always_encrypt or getattr(event_class, '__always_encrypt__', None):
-            assert isinstance(self.cipher, AbstractCipher), self.cipher
-            event_attrs = self.cipher.decrypt(event_attrs)
+    def from_sequenced_items(self, sequenced_items):
+        """
+        Recreates the domain events of a page of sequenced items, in one pass.
+
+        Each distinct stored topic in the page is resolved once, and
+        whether the events of its class are encrypted is decided once.
+        """
+        event_classes = {}
+        decode_data = self._decode_data
+        new_object = object.__new__
+        domain_events = []
+        for sequenced_item in sequenced_items:
+            assert isinstance(sequenced_item, self.sequenced_item_class), type(sequenced_item)
+            stored_topic = sequenced_item.topic
+            try:
+                event_class, is_encrypted = event_classes[stored_topic]
+            except KeyError:
+                event_class = self.resolve_topic(stored_topic)
+                is_encrypted = self.is_encrypted(event_class)
+                event_classes[stored_topic] = event_class, is_encrypted
+            domain_event = new_object(event_class)
+            domain_event.__dict__.update(decode_data(sequenced_item.data, event_class, is_encrypted))
+            domain_events.append(domain_event)
+        return domain_events
+
+    def from_sequenced_item_lazy(self, sequenced_item):
+        assert isinstance(sequenced_item, self.sequenced_item_class), type(sequenced_item)
+        event_class = self.resolve_topic(sequenced_item.topic)
+        return LazyDomainEvent(sequenced_item, event_class, self._from_sequenced_item)
+
+    def is_encrypted(self, event_class):
+        return bool(self.always_encrypt or getattr(event_class, '__always_encrypt__', None))
+
+    def resolve_topic(self, stored_topic):
+        return self.topic_registry.resolve_topic(self.decode_topic(stored_topic))
+
+    def encode_topic(self, topic):
+        if self.topic_codes is None:
+            return topic
+        return self.topic_codes.encode(topic)
 
-        # Deserialize event attributes from JSON, optionally decrypted with cipher.
-        event_attrs = json.loads(event_attrs, cls=self.json_decoder_class)
+    def decode_topic(self, stored_topic):
+        if self.topic_codes is None:
+            return stored_topic
+        return self.topic_codes.decode(stored_topic)
+
+    def get_stored_topics(self, topic):
+        # Items stored before codes were used have the topic, so both are selected. A code isn't allocated.
+        if self.topic_codes is None:
+            return [topic]
+        code = self.topic_codes.lookup(topic)
+        return [topic] if code is None else [topic, code]
+
+    def _from_sequenced_item(self, sequenced_item, event_class):
+        event_attrs = self._decode_data(sequenced_item.data, event_class, self.is_encrypted(event_class))
 
         # Reinstantiate and return the domain event object.
         domain_event = object.__new__(event_class)
         domain_event.__dict__.update(event_attrs)
         return domain_event
 
+    def _decode_data(self, event_attrs, event_class, is_encrypted):
+        """
+        Returns dict of attribute values, from the data of a sequenced item.
+        """
+        # Decrypt (optional).
+        if is_encrypted:
+            event_attrs = self.decrypt(event_attrs)
+
+        # Decompress (optional).
+        if self.compressor is not None:
+            event_attrs = self.compressor.decompress(event_attrs)
+            if not self.codec.is_binary and not isinstance(event_attrs, six.text_type):
+                event_attrs = bytes(event_attrs).decode('utf8')
+
+        # Deserialize event attributes with the codec, optionally decrypted with cipher.
+        return self.codec.decode_event_attrs(event_class, event_attrs)
+
+    def encrypt(self, data):
+        """
+        Returns ciphertext for the given data. Binary data is encrypted by the cipher as bytes.
+        """
+        assert isinstance(self.cipher, AbstractCipher), self.cipher
+        if not self.is_binary:
+            return self.cipher.encrypt(data)
+        return self.cipher.encrypt_bytes(data)
+
+    def decrypt(self, data):
+        """
+        Returns data, from the given ciphertext.
+        """
+        assert isinstance(self.cipher, AbstractCipher), self.cipher
+        if not self.is_binary:
+            return self.cipher.decrypt(data)
+        if isinstance(data, six.text_type):
+            # Encrypted before the compressor was used, so the plaintext is the text of the codec.
+            return self.cipher.decrypt(data)
+        return self.cipher.decrypt_bytes(data)
+
 
 def deserialize_domain_entity(entity_topic, entity_attrs):
     """
@@ -0,0 +1,224 @@
+from abc import abstractmethod
+from unittest import skipIf
+from uuid import uuid4
+
+from eventsourcing.domain.model.events import publish
+from eventsourcing.example.domainmodel import Example
+from eventsourcing.exceptions import ConcurrencyError, RepositoryKeyError
+from eventsourcing.infrastructure.transcoding import SequencedItemMapper
+from eventsourcing.tests.base import AbstractTestCase
+from eventsourcing.tests.datastore_tests.test_sqlite import SQLiteDatastoreTestCase
+from eventsourcing.tests.sequenced_item_tests.test_sqlite_active_record_strategy import \
+    construct_integer_sequence_active_record_strategy
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+else:
+    from eventsourcing.application.asyncpolicies import AsyncPersistencePolicy
+    from eventsourcing.infrastructure.asynceventstore import AsyncEventStore, \
+        AsyncPythonObjectsActiveRecordStrategy, ExecutorActiveRecordStrategy, StopAsyncIteration
+    from eventsourcing.infrastructure.asyncrepository import AsyncEventSourcedRepository
+
+
+@skipIf(asyncio is None, 'asyncio is not available')
+class AsyncEventStoreTestCase(AbstractTestCase):
+
+    def setUp(self):
+        super(AsyncEventStoreTestCase, self).setUp()
+        self.loop = asyncio.new_event_loop()
+        self.event_store = AsyncEventStore(
+            active_record_strategy=self.construct_active_record_strategy(),
+            sequenced_item_mapper=SequencedItemMapper(
+                position_attr_name='entity_version'
+            )
+        )
+        self.policy = None
+
+    def tearDown(self):
+        if self.policy is not None:
+            self.policy.close()
+        self.event_store.close()
+        self.loop.close()
+        super(AsyncEventStoreTestCase, self).tearDown()
+
+    @abstractmethod
+    def construct_active_record_strategy(self):
+        """
+        Returns async active record strategy, that uses self.loop.
+        """
+
+    def run_future(self, future):
+        return self.loop.run_until_complete(future)
+
+    def collect(self, async_iterator):
+        items = []
+        async_iterator = async_iterator.__aiter__()
+        while True:
+            try:
+                items.append(self.run_future(async_iterator.__anext__()))
+            except StopAsyncIteration:
+                return items
+
+    def append_example_events(self, entity_id, count):
+        events = [Example.Created(entity_id=entity_id, a=0, b=0)]
+        for i in range(1, count):
+            events.append(Example.AttributeChanged(entity_id=entity_id, entity_version=i, name='_a', value=i))
+        self.run_future(self.event_store.append(events))
+        return events
+
+    def test_append_and_get_domain_events(self):
+        entity_id = uuid4()
+
+        # Check there are no events.
+        self.assertEqual(self.run_future(self.event_store.get_domain_events(entity_id)), [])
+        self.assertIsNone(self.run_future(self.event_store.get_most_recent_event(entity_id)))
+
+        # Append an event, and then a list of events.
+        event1 = Example.Created(entity_id=entity_id, a=1, b=2)
+        self.assertIsNone(self.run_future(self.event_store.append(event1)))
+        events = [
+            Example.AttributeChanged(entity_id=entity_id, entity_version=1, name='a', value=3),
+            Example.AttributeChanged(entity_id=entity_id, entity_version=2, name='b', value=4),
+        ]
+        self.run_future(self.event_store.append(events))
+
+        # Get the events.
+        self.assertEqual(self.run_future(self.event_store.get_domain_events(entity_id)), [event1] + events)
+        self.assertEqual(self.run_future(self.event_store.get_domain_events(entity_id, gt=0, limit=1)), events[:1])
+        self.assertEqual(self.run_future(self.event_store.get_domain_events(entity_id, is_ascending=False)),
+                         list(reversed([event1] + events)))
+        self.assertEqual(self.run_future(self.event_store.get_domain_event(entity_id, eq=1)), events[0])
+        self.assertEqual(self.run_future(self.event_store.get_most_recent_event(entity_id)), events[1])
+        self.assertEqual(self.run_future(self.event_store.get_most_recent_event(entity_id, lt=2)), events[0])
+
+        # Read all the events.
+        self.assertEqual([e for _, e in self.run_future(self.event_store.read_all())], [event1] + events)
+        self.assertEqual([e for _, e in self.run_future(self.event_store.read_all(after=1, limit=1))], events[:1])
+
+    def test_concurrency_error(self):
+        entity_id = uuid4()
+        self.run_future(self.event_store.append(Example.Created(entity_id=entity_id, a=1, b=2)))
+
+        # Check appending another event at the same position fails.
+        with self.assertRaises(ConcurrencyError):
+            self.run_future(self.event_store.append(Example.Created(entity_id=entity_id, a=3, b=4)))
+
+        # Check getting an event that doesn't exist fails.
+        with self.assertRaises(IndexError):
+            self.run_future(self.event_store.get_domain_event(entity_id, eq=1))
+
+    def test_iter_domain_events(self):
+        entity_id = uuid4()
+        events = self.append_example_events(entity_id, 5)
+
+        # Check the events are iterated over in pages.
+        iterator = self.event_store.iter_domain_events(entity_id, page_size=2)
+        self.assertEqual(self.collect(iterator), events)
+        self.assertEqual(iterator.query_counter, 3)
+
+        # Check the range arguments are used.
+        iterator = self.event_store.iter_domain_events(entity_id, gt=0, lte=3, page_size=2)
+        self.assertEqual(self.collect(iterator), events[1:4])
+        iterator = self.event_store.iter_domain_events(entity_id, is_ascending=False, limit=3, page_size=2)
+        self.assertEqual(self.collect(iterator), list(reversed(events))[:3])
+        self.assertEqual(iterator.query_counter, 2)
+
+        # Check a sequence with no events.
+        self.assertEqual(self.collect(self.event_store.iter_domain_events(uuid4())), [])
+
+    def test_repository(self):
+        entity_id = uuid4()
+        self.append_example_events(entity_id, 5)
+        repo = AsyncEventSourcedRepository(self.event_store, domain_class=Example)
+
+        # Check the entity is reconstituted from its events.
+        entity = self.run_future(repo.get_entity(entity_id))
+        self.assertEqual(entity.id, entity_id)
+        self.assertEqual(entity.a, 4)
+        self.assertEqual(entity.version, 5)
+        self.assertEqual(self.run_future(repo.get_entity(entity_id, lte=2)).a, 2)
+
+        # Check the entity is the same when the events are replayed in pages.
+        paged_repo = AsyncEventSourcedRepository(self.event_store, domain_class=Example)
+        paged_repo.__page_size__ = 2
+        self.assertEqual(self.run_future(paged_repo.get_entity(entity_id)), entity)
+        self.assertEqual(self.run_future(paged_repo.get_entity(entity_id, lte=2)).a, 2)
+
+        # Check entities that don't exist.
+        self.assertIsNone(self.run_future(repo.get_entity(uuid4())))
+        self.assertIsNone(self.run_future(paged_repo.get_entity(uuid4())))
+        self.assertTrue(self.run_future(repo.contains(entity_id)))
+        self.assertFalse(self.run_future(repo.contains(uuid4())))
+        self.assertEqual(self.run_future(repo.get_item(entity_id)), entity)
+        with self.assertRaises(RepositoryKeyError):
+            self.run_future(repo.get_item(uuid4()))
+
+        # Check many entities are got concurrently.
+        self.assertEqual(self.run_future(repo.get_entities([entity_id, uuid4()])), [entity, None])
+        self.assertEqual(self.run_future(repo.get_entities([])), [])
+
+    def test_persistence_policy(self):
+        self.policy = AsyncPersistencePolicy(self.event_store)
+
+        # Publish some events.
+        entity_id = uuid4()
+        event1 = Example.Created(entity_id=entity_id, a=1, b=2)
+        events = [
+            Example.AttributeChanged(entity_id=entity_id, entity_version=1, name='a', value=3),
+            Example.AttributeChanged(entity_id=entity_id, entity_version=2, name='b', value=4),
+        ]
+        publish(event1)
+        publish(events)
+
+        # Check the events are stored, after the appends have finished.
+        self.run_future(self.policy.flush())
+        self.assertEqual(self.run_future(self.event_store.get_domain_events(entity_id)), [event1] + events)
+        self.assertEqual(self.run_future(self.policy.flush()), [])
+
+        # Check errors are raised by flush, and reported to the loop's exception handler.
+        contexts = []
+        self.loop.set_exception_handler(lambda loop, context: contexts.append(context))
+        publish(event1)
+        with self.assertRaises(ConcurrencyError):
+            self.run_future(self.policy.flush())
+        self.assertFalse(self.policy.pending_appends)
+        self.assertEqual(len(contexts), 1)
+        self.assertIsInstance(contexts[0]['exception'], ConcurrencyError)
+
+
+class TestAsyncEventStoreWithPythonObjects(AsyncEventStoreTestCase):
+    def construct_active_record_strategy(self):
+        return AsyncPythonObjectsActiveRecordStrategy(loop=self.loop)
+
+    def test_loop_is_got_when_first_used(self):
+        # Check a strategy can be constructed without a loop.
+        strategy = AsyncPythonObjectsActiveRecordStrategy()
+
+        # Check it uses the loop that is running when it is first used.
+        result = asyncio.Future(loop=self.loop)
+        self.loop.call_soon(lambda: result.set_result(strategy.loop))
+        self.assertIs(self.run_future(result), self.loop)
+
+
+class TestAsyncEventStoreWithSQLite(SQLiteDatastoreTestCase, AsyncEventStoreTestCase):
+    use_named_temporary_file = True
+
+    def setUp(self):
+        super(TestAsyncEventStoreWithSQLite, self).setUp()
+        self.datastore.setup_connection()
+        self.datastore.setup_tables()
+
+    def tearDown(self):
+        self.datastore.drop_tables()
+        self.datastore.drop_connection()
+        super(TestAsyncEventStoreWithSQLite, self).tearDown()
+
+    def construct_active_record_strategy(self):
+        # The blocking SQLite strategy is run in a pool of threads.
+        return ExecutorActiveRecordStrategy(
+            active_record_strategy=construct_integer_sequence_active_record_strategy(self.datastore),
+            max_workers=4,
+            loop=self.loop,
+        )
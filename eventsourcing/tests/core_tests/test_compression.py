@@ -0,0 +1,116 @@
+from unittest import TestCase, skipIf
+from uuid import uuid4
+
+import six
+
+from eventsourcing.domain.model.events import topic_from_domain_class
+from eventsourcing.domain.services.cipher import AESCipher
+from eventsourcing.example.domainmodel import Example
+from eventsourcing.exceptions import DataIntegrityError
+from eventsourcing.infrastructure.compression import ZlibCompressor, train_dictionary
+from eventsourcing.infrastructure.transcoding import SequencedItem, SequencedItemMapper
+
+
+class TestZlibCompressor(TestCase):
+
+    def test_compress_and_decompress(self):
+        compressor = ZlibCompressor()
+        data = u'{"a":"' + u'x' * 100 + u'"}'
+
+        # Check the data is compressed, and decompressed as bytes.
+        compressed = compressor.compress(data, 'topic')
+        self.assertIsInstance(compressed, bytes)
+        self.assertLess(len(compressed), len(data))
+        self.assertEqual(compressor.decompress(compressed), data.encode('utf8'))
+
+        # Check data that doesn't get smaller isn't compressed.
+        self.assertEqual(compressor.compress(u'{}', 'topic'), b'{}')
+        self.assertEqual(compressor.decompress(b'{}'), b'{}')
+
+        # Check data that isn't compressed is returned as it is.
+        self.assertEqual(compressor.decompress(data), data)
+        self.assertEqual(compressor.decompress(b'\x09\x00'), b'\x09\x00')
+
+    @skipIf(six.PY2, 'zlib preset dictionaries need Python 3')
+    def test_preset_dictionaries(self):
+        mapper = SequencedItemMapper(position_attr_name='entity_version')
+        topic = topic_from_domain_class(Example.AttributeChanged)
+        events = [
+            Example.AttributeChanged(entity_id=uuid4(), entity_version=i, name='_a', value=i)
+            for i in range(20)
+        ]
+        samples = [mapper.to_sequenced_item(e).data for e in events]
+
+        # Check a dictionary is trained from the samples.
+        dictionary = train_dictionary(samples[:10], size=1024)
+        self.assertIsInstance(dictionary, bytes)
+        self.assertTrue(0 < len(dictionary) <= 1024)
+        self.assertIn(b'"entity_version":', dictionary)
+        self.assertEqual(train_dictionary([]), b'')
+
+        # Check small items are compressed much more with the dictionary of their topic.
+        compressor = ZlibCompressor()
+        with_dictionary = ZlibCompressor(dictionaries=[(1, topic, dictionary)])
+        for sample in samples[10:]:
+            compressed = with_dictionary.compress(sample, topic)
+            self.assertEqual(bytearray(compressed[:2]), bytearray([0xff, 1]))
+            self.assertLess(len(compressed), len(compressor.compress(sample, topic)) * 0.7)
+            self.assertEqual(with_dictionary.decompress(compressed), sample.encode('utf8'))
+
+        # Check the dictionary isn't used for other topics.
+        self.assertEqual(bytearray(with_dictionary.compress(samples[10], 'other')[1:2]), bytearray([0]))
+
+        # Check items compressed with an earlier dictionary are still decompressed.
+        compressed = with_dictionary.compress(samples[10], topic)
+        with_dictionary.add_dictionary(2, topic, train_dictionary(samples[10:]))
+        self.assertEqual(bytearray(with_dictionary.compress(samples[10], topic)[1:2]), bytearray([2]))
+        self.assertEqual(with_dictionary.decompress(compressed), samples[10].encode('utf8'))
+
+        # Check invalid dictionary IDs.
+        with self.assertRaises(ValueError):
+            with_dictionary.add_dictionary(256, topic, dictionary)
+        with self.assertRaises(ValueError):
+            with_dictionary.add_dictionary(1, topic, b'other')
+
+        # Check data compressed with an unknown dictionary is an error.
+        with self.assertRaises(DataIntegrityError):
+            compressor.decompress(compressed)
+
+
+class TestMapperWithCompressor(TestCase):
+
+    def test_mapper(self):
+        event = Example.AttributeChanged(entity_id=uuid4(), entity_version=1, name='_a', value=u'x' * 100)
+        mapper = SequencedItemMapper(position_attr_name='entity_version', compressor=ZlibCompressor())
+        uncompressed_mapper = SequencedItemMapper(position_attr_name='entity_version')
+
+        # Check the data is compressed bytes.
+        sequenced_item = mapper.to_sequenced_item(event)
+        self.assertIsInstance(sequenced_item.data, bytes)
+        uncompressed_item = uncompressed_mapper.to_sequenced_item(event)
+        self.assertLess(len(sequenced_item.data), len(uncompressed_item.data))
+        self.assertEqual(mapper.from_sequenced_item(sequenced_item), event)
+        self.assertEqual(mapper.from_sequenced_item_lazy(sequenced_item).value, event.value)
+
+        # Check data stored before the compressor was used is decoded.
+        self.assertEqual(mapper.from_sequenced_item(uncompressed_item), event)
+
+    def test_mapper_with_cipher(self):
+        cipher = AESCipher(aes_key=b'0123456789abcdef')
+        event = Example.AttributeChanged(entity_id=uuid4(), entity_version=1, name='_a', value=u'x' * 100)
+        mapper = SequencedItemMapper(position_attr_name='entity_version', compressor=ZlibCompressor(),
+                                     cipher=cipher, always_encrypt=True)
+
+        # Check the compressed data is encrypted, without being encoded as base64.
+        sequenced_item = mapper.to_sequenced_item(event)
+        self.assertIsInstance(sequenced_item.data, bytes)
+        self.assertEqual(mapper.from_sequenced_item(sequenced_item), event)
+        compressed = ZlibCompressor().compress(SequencedItemMapper(position_attr_name='entity_version')
+                                               .to_sequenced_item(event).data, sequenced_item.topic)
+        self.assertLessEqual(len(sequenced_item.data), len(compressed) + 2 * AESCipher.BLOCK_SIZE)
+
+        # Check data encrypted before the compressor was used is decoded.
+        old_mapper = SequencedItemMapper(position_attr_name='entity_version', cipher=cipher, always_encrypt=True)
+        old_item = old_mapper.to_sequenced_item(event)
+        self.assertIsInstance(old_item.data, six.text_type)
+        self.assertEqual(mapper.from_sequenced_item(SequencedItem(*old_item)), event)
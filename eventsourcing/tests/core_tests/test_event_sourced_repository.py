@@ -54,3 +54,24 @@ class TestEventSourcedRepository(SQLAlchemyDatastoreTestCase):
         self.assertEqual(1, example.a)
         self.assertEqual(2, example.b)
         self.assertEqual(entity_id, example.id)
+
+    def test_get_entities(self):
+        event_store = self.construct_event_store()
+        example_repo = ExampleRepository(event_store=event_store)
+
+        # Put events for two entities in the event store, and discard one of them.
+        entity_id1 = uuid4()
+        entity_id2 = uuid4()
+        event_store.append(Example.Created(entity_id=entity_id1, a=1, b=2))
+        event_store.append(Example.AttributeChanged(entity_id=entity_id1, entity_version=1, name='a', value=3))
+        event_store.append(Example.Created(entity_id=entity_id2, a=1, b=2))
+        event_store.append(Example.Discarded(entity_id=entity_id2, entity_version=1))
+
+        # Check the entities are returned, with None for discarded and missing entities.
+        entity_id3 = uuid4()
+        entities = example_repo.get_entities([entity_id1, entity_id2, entity_id3])
+        self.assertEqual(list(entities.keys()), [entity_id1, entity_id2, entity_id3])
+        self.assertEqual(entities[entity_id1].a, 3)
+        self.assertEqual(entities[entity_id1], example_repo[entity_id1])
+        self.assertIsNone(entities[entity_id2])
+        self.assertIsNone(entities[entity_id3])
@@ -1,8 +1,17 @@
 from uuid import uuid4
 
+from eventsourcing.domain.model.events import topic_from_domain_class
 from eventsourcing.example.domainmodel import Example
+from eventsourcing.infrastructure.binarycodec import BinaryCodec
+from eventsourcing.infrastructure.compression import ZlibCompressor
 from eventsourcing.infrastructure.eventstore import EventStore
-from eventsourcing.infrastructure.transcoding import SequencedItemMapper
+from eventsourcing.infrastructure.iterators import AdaptiveSequencedItemIterator, SequencedItemIterator
+from eventsourcing.infrastructure.sqlalchemy.activerecords import SQLAlchemyActiveRecordStrategy, \
+    SQLAlchemyTopicCodeTable, SqlBinaryIntegerSequencedItem, SqlBinaryTimestampSequencedItem, SqlIntegerSequencedItem, \
+    SqlTopicCode
+from eventsourcing.infrastructure.sqlalchemy.datastore import Base, SQLAlchemyDatastore, SQLAlchemySettings
+from eventsourcing.infrastructure.topiccodes import TopicCodes
+from eventsourcing.infrastructure.transcoding import LazyDomainEvent, SequencedItemMapper
 from eventsourcing.tests.datastore_tests.test_sqlalchemy import SQLAlchemyDatastoreTestCase
 from eventsourcing.tests.sequenced_item_tests.test_sqlalchemy_active_record_strategy import \
     construct_integer_sequence_active_record_strategy
@@ -22,14 +31,15 @@ class TestEventStore(SQLAlchemyDatastoreTestCase):
             self.datastore.drop_connection()
         super(TestEventStore, self).tearDown()
 
-    def construct_event_store(self):
+    def construct_event_store(self, **kwargs):
         event_store = EventStore(
             active_record_strategy=construct_integer_sequence_active_record_strategy(
                 datastore=self.datastore,
             ),
             sequenced_item_mapper=SequencedItemMapper(
                 position_attr_name='entity_version'
-            )
+            ),
+            **kwargs
         )
         return event_store
 
@@ -75,6 +85,104 @@ class TestEventStore(SQLAlchemyDatastoreTestCase):
         entity_events = list(entity_events)
         self.assertEqual(2, len(entity_events))
 
+    def test_get_domain_events_in_pages(self):
+        event_store = self.construct_event_store()
+
+        # Store some domain events.
+        entity_id1 = uuid4()
+        events = [Example.Created(entity_id=entity_id1, a=1, b=2)]
+        events += [Example.Heartbeat(entity_id=entity_id1, entity_version=i) for i in range(1, 5)]
+        event_store.append(events)
+
+        # Check the events are listed, after being retrieved in pages.
+        entity_events = event_store.get_domain_events(entity_id=entity_id1, page_size=2)
+        self.assertEqual(entity_events, events)
+        self.assertEqual(event_store.get_domain_events(entity_id=entity_id1, page_size=2, limit=3), events[:3])
+
+        # Check the iterated events aren't retrieved until they are needed.
+        entity_events = event_store.iter_domain_events(entity_id=entity_id1, page_size=2)
+        self.assertIsInstance(entity_events, SequencedItemIterator)
+        self.assertEqual(entity_events.query_counter, 0)
+
+        # Check the events are retrieved a page at a time.
+        entity_events_iter = iter(entity_events)
+        self.assertEqual([next(entity_events_iter) for _ in range(2)], events[:2])
+        self.assertEqual(entity_events.query_counter, 1)
+        self.assertEqual(next(entity_events_iter), events[2])
+        self.assertEqual(entity_events.query_counter, 2)
+        self.assertEqual(list(entity_events_iter), events[3:])
+        self.assertEqual(entity_events.query_counter, 3)
+
+    def test_iterator_class(self):
+        event_store = self.construct_event_store(iterator_class=AdaptiveSequencedItemIterator)
+
+        # Store some domain events.
+        entity_id1 = uuid4()
+        events = [Example.Created(entity_id=entity_id1, a=1, b=2)]
+        events += [Example.Heartbeat(entity_id=entity_id1, entity_version=i) for i in range(1, 5)]
+        event_store.append(events)
+
+        # Check the events are retrieved with the given iterator class.
+        entity_events = event_store.iter_domain_events(entity_id=entity_id1, page_size=2)
+        self.assertIsInstance(entity_events, AdaptiveSequencedItemIterator)
+        self.assertEqual(list(entity_events), events)
+        self.assertEqual(entity_events.page_sizes[0], AdaptiveSequencedItemIterator.DEFAULT_MIN_PAGE_SIZE)
+
+    def test_get_domain_events_with_filter(self):
+        event_store = self.construct_event_store()
+
+        # Store some domain events.
+        entity_id1 = uuid4()
+        events = [Example.Created(entity_id=entity_id1, a=1, b=2)]
+        events += [Example.Heartbeat(entity_id=entity_id1, entity_version=i) for i in range(1, 5)]
+        event_store.append(events)
+
+        # Check the filter is called with lazy events, and the events it skips aren't decoded.
+        lazy_events = []
+
+        def is_created(lazy_event):
+            lazy_events.append(lazy_event)
+            return issubclass(lazy_event.event_class, Example.Created)
+
+        for page_size in [None, 2]:
+            del lazy_events[:]
+            entity_events = event_store.get_domain_events(entity_id1, page_size=page_size, event_filter=is_created)
+            self.assertEqual(list(entity_events), events[:1])
+            self.assertEqual(len(lazy_events), 5)
+            self.assertTrue(all(isinstance(e, LazyDomainEvent) for e in lazy_events))
+            self.assertEqual([e.is_decoded for e in lazy_events], [True, False, False, False, False])
+
+        # Check lazy events are returned.
+        entity_events = event_store.get_domain_events(entity_id1, is_lazy=True)
+        self.assertEqual([e.position for e in entity_events], [0, 1, 2, 3, 4])
+        self.assertFalse(any(e.is_decoded for e in entity_events))
+        self.assertEqual(entity_events, events)
+
+    def test_get_domain_events_with_topics(self):
+        event_store = self.construct_event_store()
+
+        # Store some domain events.
+        entity_id1 = uuid4()
+        events = [Example.Created(entity_id=entity_id1, a=1, b=2)]
+        events += [Example.Heartbeat(entity_id=entity_id1, entity_version=i) for i in range(1, 5)]
+        events += [Example.AttributeChanged(entity_id=entity_id1, entity_version=5, name='_a', value=3)]
+        event_store.append(events)
+
+        # Check only events with the given topics are retrieved, with and without pages.
+        topics = [topic_from_domain_class(Example.Created), topic_from_domain_class(Example.AttributeChanged)]
+        for page_size in [None, 1]:
+            entity_events = event_store.get_domain_events(entity_id1, page_size=page_size, topics=topics)
+            self.assertEqual(list(entity_events), [events[0], events[5]])
+            entity_events = event_store.get_domain_events(entity_id1, page_size=page_size, topics=topics[1:])
+            self.assertEqual(list(entity_events), events[5:])
+            entity_events = event_store.get_domain_events(entity_id1, page_size=page_size, limit=1,
+                                                          is_ascending=False, topics=topics)
+            self.assertEqual(list(entity_events), events[5:])
+
+        # Check all domain events, and reading all, can be filtered by topic.
+        self.assertEqual(list(event_store.all_domain_events(topics=topics[:1])), events[:1])
+        self.assertEqual([e for _, e in event_store.read_all(topics=topics[1:])], events[5:])
+
     def test_get_most_recent_event(self):
         event_store = self.construct_event_store()
 
@@ -91,6 +199,52 @@ class TestEventStore(SQLAlchemyDatastoreTestCase):
         entity_event = event_store.get_most_recent_event(entity_id=entity_id1)
         self.assertEqual(entity_event, event1)
 
+    def test_get_head(self):
+        event_store = self.construct_event_store()
+
+        # Check there is no head.
+        entity_id1 = uuid4()
+        self.assertIsNone(event_store.get_head(entity_id1))
+
+        # Store some domain events.
+        events = [Example.Created(entity_id=entity_id1, a=1, b=2)]
+        events += [Example.Heartbeat(entity_id=entity_id1, entity_version=i) for i in range(1, 3)]
+        event_store.append(events)
+
+        # Check the head has the version and topic of the last event.
+        head = event_store.get_head(entity_id1)
+        self.assertEqual(head.position, 2)
+        self.assertEqual(head.topic, topic_from_domain_class(Example.Heartbeat))
+        entity_id2 = uuid4()
+        heads = event_store.get_heads([entity_id1, entity_id2])
+        self.assertEqual(heads[entity_id1], head)
+        self.assertIsNone(heads[entity_id2])
+
+    def test_get_domain_events_many(self):
+        event_store = self.construct_event_store()
+
+        # Store domain events for two entities.
+        entity_id1 = uuid4()
+        entity_id2 = uuid4()
+        event1 = Example.Created(entity_id=entity_id1, a=1, b=2)
+        event2 = Example.AttributeChanged(entity_id=entity_id1, a=1, b=2, entity_version=1)
+        event3 = Example.Created(entity_id=entity_id2, a=1, b=2)
+        event_store.append([event1, event2])
+        event_store.append(event3)
+
+        # Check the events are grouped by entity.
+        entity_id3 = uuid4()
+        domain_events = event_store.get_domain_events_many([entity_id1, entity_id2, entity_id3])
+        self.assertEqual(list(domain_events.keys()), [entity_id1, entity_id2, entity_id3])
+        self.assertEqual(domain_events[entity_id1], [event1, event2])
+        self.assertEqual(domain_events[entity_id2], [event3])
+        self.assertEqual(domain_events[entity_id3], [])
+
+        # Check the range arguments apply to each entity.
+        domain_events = event_store.get_domain_events_many([entity_id1, entity_id2], limit=1, is_ascending=False)
+        self.assertEqual(domain_events[entity_id1], [event2])
+        self.assertEqual(domain_events[entity_id2], [event3])
+
     def test_all_domain_events(self):
         event_store = self.construct_event_store()
 
@@ -118,3 +272,183 @@ class TestEventStore(SQLAlchemyDatastoreTestCase):
         domain_events = list(domain_events)
         self.assertEqual(len(domain_events), 3)
 
+    def test_read_all(self):
+        event_store = self.construct_event_store()
+
+        # Store domain events for two entities.
+        entity_id1 = uuid4()
+        entity_id2 = uuid4()
+        events = [
+            Example.Created(entity_id=entity_id1, a=1, b=2),
+            Example.Created(entity_id=entity_id2, a=1, b=2),
+            Example.AttributeChanged(entity_id=entity_id1, a=1, b=2, entity_version=1),
+        ]
+        for event in events:
+            event_store.append(event)
+
+        # Check the events are read in the order they were stored.
+        pairs = event_store.read_all()
+        self.assertEqual([event for _, event in pairs], events)
+
+        # Check reading can continue after a checkpoint.
+        self.assertEqual(event_store.read_all(after=pairs[0][0], limit=1), pairs[1:2])
+        self.assertEqual(event_store.read_all(after=pairs[1][0]), pairs[2:])
+
+
+class TestEventStoreWithBinaryCodec(TestEventStore):
+    def construct_datastore(self):
+        return SQLAlchemyDatastore(
+            base=Base,
+            settings=SQLAlchemySettings(),
+            tables=(SqlBinaryIntegerSequencedItem,),
+        )
+
+    def construct_event_store(self, **kwargs):
+        return EventStore(
+            active_record_strategy=SQLAlchemyActiveRecordStrategy(
+                active_record_class=SqlBinaryIntegerSequencedItem,
+                datastore=self.datastore,
+            ),
+            sequenced_item_mapper=SequencedItemMapper(
+                position_attr_name='entity_version',
+                codec=BinaryCodec(),
+            ),
+            **kwargs
+        )
+
+    def test_data_is_binary(self):
+        event_store = self.construct_event_store()
+        event1 = Example.Created(entity_id=uuid4(), a=1, b=2)
+        event_store.append(event1)
+
+        # Check the stored data is bytes, and the event is decoded from it.
+        item = event_store.active_record_strategy.get_item(event1.entity_id, 0)
+        self.assertIsInstance(item.data, bytes)
+        self.assertEqual(event_store.get_domain_event(event1.entity_id, eq=0), event1)
+
+
+class TestEventStoreWithBinaryTimestampSequences(SQLAlchemyDatastoreTestCase):
+    def setUp(self):
+        super(TestEventStoreWithBinaryTimestampSequences, self).setUp()
+        self.datastore.setup_connection()
+        self.datastore.setup_tables()
+
+    def tearDown(self):
+        self.datastore.drop_tables()
+        self.datastore.drop_connection()
+        super(TestEventStoreWithBinaryTimestampSequences, self).tearDown()
+
+    def construct_datastore(self):
+        return SQLAlchemyDatastore(
+            base=Base,
+            settings=SQLAlchemySettings(),
+            tables=(SqlBinaryTimestampSequencedItem,),
+        )
+
+    def construct_event_store(self, **kwargs):
+        return EventStore(
+            active_record_strategy=SQLAlchemyActiveRecordStrategy(
+                active_record_class=SqlBinaryTimestampSequencedItem,
+                datastore=self.datastore,
+            ),
+            sequenced_item_mapper=SequencedItemMapper(
+                position_attr_name='timestamp',
+                codec=BinaryCodec(),
+            ),
+            **kwargs
+        )
+
+    def test_get_domain_events(self):
+        event_store = self.construct_event_store()
+        entity_id = uuid4()
+        events = [
+            Example.Created(entity_id=entity_id, a=1, b=2),
+            Example.AttributeChanged(entity_id=entity_id, entity_version=1, name='a', value=3),
+        ]
+        for event in events:
+            event_store.append(event)
+
+        # Check the stored data is bytes, and the events are got by their timestamps.
+        items = event_store.active_record_strategy.get_items(entity_id)
+        self.assertEqual([i.position for i in items], [e.timestamp for e in events])
+        self.assertIsInstance(items[0].data, bytes)
+        self.assertEqual(event_store.get_domain_events(entity_id), events)
+        self.assertEqual(event_store.get_domain_events(entity_id, gt=events[0].timestamp), events[1:])
+        self.assertEqual(event_store.get_most_recent_event(entity_id), events[1])
+
+    def test_all_domain_events(self):
+        event_store = self.construct_event_store()
+        events = [Example.Created(entity_id=uuid4(), a=1, b=2) for _ in range(3)]
+        for event in events:
+            event_store.append(event)
+        self.assertEqual(list(event_store.all_domain_events()), events)
+
+
+class TestEventStoreWithCompressor(TestEventStoreWithBinaryCodec):
+    def construct_event_store(self, **kwargs):
+        return EventStore(
+            active_record_strategy=SQLAlchemyActiveRecordStrategy(
+                active_record_class=SqlBinaryIntegerSequencedItem,
+                datastore=self.datastore,
+            ),
+            sequenced_item_mapper=SequencedItemMapper(
+                position_attr_name='entity_version',
+                compressor=ZlibCompressor(),
+            ),
+            **kwargs
+        )
+
+
+class TestEventStoreWithTopicCodes(TestEventStore):
+    def construct_datastore(self):
+        return SQLAlchemyDatastore(
+            base=Base,
+            settings=SQLAlchemySettings(),
+            tables=(SqlIntegerSequencedItem, SqlTopicCode),
+        )
+
+    def construct_event_store(self, **kwargs):
+        return EventStore(
+            active_record_strategy=construct_integer_sequence_active_record_strategy(
+                datastore=self.datastore,
+            ),
+            sequenced_item_mapper=SequencedItemMapper(
+                position_attr_name='entity_version',
+                topic_codes=TopicCodes(SQLAlchemyTopicCodeTable(self.datastore)),
+            ),
+            **kwargs
+        )
+
+    def test_codes_are_stored(self):
+        event_store = self.construct_event_store()
+        event1 = Example.Created(entity_id=uuid4(), a=1, b=2)
+        event_store.append(event1)
+
+        # Check the stored topic is a code, and the event is decoded with it.
+        item = event_store.active_record_strategy.get_item(event1.entity_id, 0)
+        self.assertEqual(item.topic, '1')
+        self.assertEqual(event_store.get_domain_event(event1.entity_id, eq=0), event1)
+
+    def test_topic_filters_select_items_stored_before_codes(self):
+        # Store an event without topic codes.
+        event_store = self.construct_event_store()
+        entity_id = uuid4()
+        old_event_store = EventStore(
+            active_record_strategy=event_store.active_record_strategy,
+            sequenced_item_mapper=SequencedItemMapper(position_attr_name='entity_version'),
+        )
+        event1 = Example.Created(entity_id=entity_id, a=1, b=2)
+        old_event_store.append(event1)
+        topic = topic_from_domain_class(Example.Created)
+
+        # Check the old item is selected by topic, and a code isn't allocated by the query.
+        self.assertEqual(event_store.get_domain_events(entity_id, topics=[topic]), [event1])
+        self.assertEqual(event_store.sequenced_item_mapper.topic_codes.code_table.get_codes(), [])
+
+        # Check items stored with the code, and with the topic, are both selected.
+        event2 = Example.AttributeChanged(entity_id=entity_id, entity_version=1, name='a', value=3)
+        event3 = Example.Created(entity_id=uuid4(), a=1, b=2)
+        event_store.append(event2)
+        event_store.append(event3)
+        self.assertEqual(event_store.active_record_strategy.get_item(event3.entity_id, 0).topic, '2')
+        self.assertEqual([e for _, e in event_store.read_all(topics=[topic])], [event1, event3])
@@ -5,8 +5,8 @@ from uuid import UUID, uuid4
 from eventsourcing.domain.model.decorators import subscribe_to
 from eventsourcing.domain.model.events import DomainEvent, EventWithEntityID, EventHandlersNotEmptyError, \
     EventWithEntityVersion, EventWithTimestamp, TimestampedEntityEvent, VersionedEntityEvent, _event_handlers, \
-    all_events, assert_event_handlers_empty, create_timesequenced_event_id, publish, resolve_domain_topic, subscribe, \
-    unsubscribe
+    TopicRegistry, all_events, assert_event_handlers_empty, create_timesequenced_event_id, publish, \
+    resolve_domain_topic, subscribe, topic_from_domain_class, unsubscribe
 from eventsourcing.example.domainmodel import Example
 from eventsourcing.exceptions import TopicResolutionError
 
@@ -408,3 +408,30 @@ class TestEvents(unittest.TestCase):
             resolve_domain_topic('eventsourcing.domain.model.broken#DomainEvent')
         with self.assertRaises(TopicResolutionError):
             resolve_domain_topic('eventsourcing.domain.model.events#Broken')
+
+    def test_topic_registry(self):
+        registry = TopicRegistry()
+        topic = 'eventsourcing.example.domainmodel#Example.Created'
+        self.assertEqual(registry.get_topic(Example.Created), topic)
+        self.assertEqual(topic_from_domain_class(Example.Created), topic)
+
+        # Check topics are only imported the first time they are resolved.
+        with mock.patch('importlib.import_module') as import_module:
+            import_module.side_effect = AssertionError
+            with self.assertRaises(AssertionError):
+                registry.resolve_topic(topic)
+        self.assertIs(registry.resolve_topic(topic), Example.Created)
+        with mock.patch('importlib.import_module') as import_module:
+            import_module.side_effect = AssertionError
+            self.assertIs(registry.resolve_topic(topic), Example.Created)
+
+        # Check an alias resolves to the class, which still has its own topic.
+        old_topic = 'eventsourcing.example.old#Example.Created'
+        with self.assertRaises(TopicResolutionError):
+            registry.resolve_topic(old_topic)
+        registry.add_alias(old_topic, Example.Created)
+        self.assertIs(registry.resolve_topic(old_topic), Example.Created)
+        self.assertEqual(registry.get_topic(Example.Created), topic)
+        registry.remove_alias(old_topic)
+        with self.assertRaises(TopicResolutionError):
+            registry.resolve_topic(old_topic)
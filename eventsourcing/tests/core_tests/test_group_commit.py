@@ -0,0 +1,186 @@
+from threading import Thread
+from time import sleep
+from uuid import uuid4
+
+import mock
+
+from eventsourcing.application.policies import PersistencePolicy
+from eventsourcing.domain.model.events import publish
+from eventsourcing.example.domainmodel import Example
+from eventsourcing.exceptions import ConcurrencyError, GroupCommitError
+from eventsourcing.infrastructure.eventstore import EventStore
+from eventsourcing.infrastructure.groupcommit import GroupCommitter
+from eventsourcing.infrastructure.transcoding import SequencedItemMapper
+from eventsourcing.tests.datastore_tests.test_sqlalchemy import SQLAlchemyDatastoreTestCase
+from eventsourcing.tests.sequenced_item_tests.test_sqlalchemy_active_record_strategy import \
+    construct_integer_sequence_active_record_strategy
+
+
+class SlowEventStore(EventStore):
+    """
+    Event store that takes a while to append, so that appends pile up.
+    """
+    def append(self, domain_event):
+        sleep(0.01)
+        super(SlowEventStore, self).append(domain_event)
+
+
+class TestGroupCommit(SQLAlchemyDatastoreTestCase):
+    use_named_temporary_file = True
+
+    def setUp(self):
+        super(TestGroupCommit, self).setUp()
+        self.datastore.setup_connection()
+        self.datastore.setup_tables()
+        self.event_store = SlowEventStore(
+            active_record_strategy=construct_integer_sequence_active_record_strategy(
+                datastore=self.datastore,
+            ),
+            sequenced_item_mapper=SequencedItemMapper(
+                position_attr_name='entity_version'
+            )
+        )
+        self.policy = None
+
+    def tearDown(self):
+        if self.policy is not None:
+            self.policy.close()
+        self.datastore.drop_tables()
+        self.datastore.drop_connection()
+        super(TestGroupCommit, self).tearDown()
+
+    def append_in_threads(self, append, events):
+        errors = [None] * len(events)
+
+        def target(i):
+            try:
+                append(events[i])
+            except Exception as e:
+                errors[i] = e
+
+        threads = [Thread(target=target, args=(i,)) for i in range(len(events))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        return errors
+
+    def test_appends_are_grouped(self):
+        committer = GroupCommitter(self.event_store)
+
+        # Append events from lots of threads.
+        entity_ids = [uuid4() for _ in range(20)]
+        events = [Example.Created(entity_id=entity_id, a=1, b=2) for entity_id in entity_ids]
+        errors = self.append_in_threads(committer.append, events)
+
+        # Check there were no errors.
+        self.assertEqual(errors, [None] * len(events))
+
+        # Check all the events were stored, with fewer writes than appends.
+        for entity_id, event in zip(entity_ids, events):
+            self.assertEqual(self.event_store.get_domain_events(entity_id), [event])
+        self.assertLess(committer.group_counter, len(events))
+
+    def test_group_size_is_limited(self):
+        committer = GroupCommitter(self.event_store, max_group_size=1)
+        events = [Example.Created(entity_id=uuid4(), a=1, b=2) for _ in range(5)]
+        errors = self.append_in_threads(committer.append, events)
+        self.assertEqual(errors, [None] * len(events))
+        self.assertEqual(committer.group_counter, len(events))
+
+    def test_concurrency_error_is_raised_to_caller(self):
+        committer = GroupCommitter(self.event_store, max_delay=0.05)
+
+        # Store an event.
+        entity_id = uuid4()
+        self.event_store.append(Example.Created(entity_id=entity_id, a=1, b=2))
+
+        # Append from lots of threads, including one conflicting event.
+        events = [Example.Created(entity_id=uuid4(), a=1, b=2) for _ in range(9)]
+        events.insert(4, Example.AttributeChanged(entity_id=entity_id, entity_version=0, name='a', value=3))
+        errors = self.append_in_threads(committer.append, events)
+
+        # Check only the conflicting append failed.
+        self.assertIsInstance(errors[4], ConcurrencyError)
+        self.assertEqual(errors[:4] + errors[5:], [None] * 9)
+
+        # Check the other events were stored.
+        for event in events[:4] + events[5:]:
+            self.assertEqual(self.event_store.get_domain_events(event.entity_id), [event])
+        self.assertEqual(len(self.event_store.get_domain_events(entity_id)), 1)
+
+    def test_group_error_is_raised_separately_to_each_caller(self):
+        committer = GroupCommitter(self.event_store, max_delay=0.05)
+        error = ValueError('datastore is down')
+
+        # Append from lots of threads, with the group write failing.
+        events = [Example.Created(entity_id=uuid4(), a=1, b=2) for _ in range(5)]
+        with mock.patch.object(self.event_store, 'append', side_effect=error):
+            errors = self.append_in_threads(committer.append, events)
+
+        # Check each caller got its own exception, chained from the error.
+        for e in errors:
+            self.assertIsInstance(e, GroupCommitError)
+            self.assertIs(getattr(e, '__cause__', error), error)
+        self.assertEqual(len(set(map(id, errors))), len(errors))
+
+    def test_appends_are_grouped_per_sequence(self):
+        # Check strategies that can't write many sequences atomically (e.g. Cassandra) aren't given lists of them.
+        self.event_store.active_record_strategy.can_append_many_sequences = False
+        committer = GroupCommitter(self.event_store, max_delay=0.05)
+        self.assertTrue(committer.is_per_sequence)
+        appended = []
+        append = self.event_store.append
+
+        def record_append(domain_event):
+            appended.append(domain_event)
+            append(domain_event)
+
+        self.event_store.append = record_append
+
+        # Append events of several entities from lots of threads, including lists of events.
+        entity_ids = [uuid4() for _ in range(5)]
+        events = [Example.Created(entity_id=entity_id, a=1, b=2) for entity_id in entity_ids]
+        events += [[Example.Created(entity_id=entity_id, a=1, b=2),
+                    Example.AttributeChanged(entity_id=entity_id, entity_version=1, name='a', value=3)]
+                   for entity_id in [uuid4() for _ in range(5)]]
+        errors = self.append_in_threads(committer.append, events)
+
+        # Check there were no errors, and each write was for one entity.
+        self.assertEqual(errors, [None] * len(events))
+        for domain_events in appended:
+            self.assertEqual(len(set(e.entity_id for e in domain_events)), 1)
+
+        # Check all the events were stored.
+        for event in events:
+            event = event if isinstance(event, list) else [event]
+            self.assertEqual(self.event_store.get_domain_events(event[0].entity_id), event)
+
+        # Check a concurrency error is still raised only to the conflicting caller.
+        events = [Example.AttributeChanged(entity_id=entity_ids[0], entity_version=0, name='a', value=3)]
+        events += [Example.Created(entity_id=uuid4(), a=1, b=2) for _ in range(4)]
+        errors = self.append_in_threads(committer.append, events)
+        self.assertIsInstance(errors[0], ConcurrencyError)
+        self.assertEqual(errors[1:], [None] * 4)
+
+    def test_persistence_policy_with_group_commit(self):
+        self.policy = PersistencePolicy(self.event_store, group_commit=True)
+        self.assertIsInstance(self.policy.group_committer, GroupCommitter)
+
+        # Publish events from lots of threads.
+        events = [Example.Created(entity_id=uuid4(), a=1, b=2) for _ in range(10)]
+        errors = self.append_in_threads(publish, events)
+
+        # Check the events were stored.
+        self.assertEqual(errors, [None] * len(events))
+        for event in events:
+            self.assertEqual(self.event_store.get_domain_events(event.entity_id), [event])
+
+        # Check lists of events are stored together.
+        entity_id = uuid4()
+        events = [
+            Example.Created(entity_id=entity_id, a=1, b=2),
+            Example.AttributeChanged(entity_id=entity_id, entity_version=1, name='a', value=3),
+        ]
+        publish(events)
+        self.assertEqual(self.event_store.get_domain_events(entity_id), events)
@@ -0,0 +1,85 @@
+from collections import Counter
+from functools import partial
+from uuid import uuid4
+
+from eventsourcing.example.domainmodel import Example
+from eventsourcing.infrastructure.eventstore import EventStore
+from eventsourcing.infrastructure.partitions import PartitionResult, scan_partition, scan_partitions
+from eventsourcing.infrastructure.sqlite.activerecords import SQLiteIntegerSequencedItem, \
+    SQLiteTimestampSequencedItem
+from eventsourcing.infrastructure.sqlite.datastore import SQLiteDatastore, SQLiteSettings
+from eventsourcing.infrastructure.transcoding import SequencedItemMapper
+from eventsourcing.tests.datastore_tests.test_sqlite import SQLiteDatastoreTestCase
+from eventsourcing.tests.sequenced_item_tests.test_sqlite_active_record_strategy import \
+    construct_integer_sequence_active_record_strategy
+
+
+def construct_event_store(path):
+    # Called in the worker processes, so each has its own connection.
+    datastore = SQLiteDatastore(
+        settings=SQLiteSettings(path=path),
+        tables=(SQLiteIntegerSequencedItem, SQLiteTimestampSequencedItem),
+    )
+    datastore.setup_connection()
+    return EventStore(
+        active_record_strategy=construct_integer_sequence_active_record_strategy(datastore),
+        sequenced_item_mapper=SequencedItemMapper(position_attr_name='entity_version'),
+    )
+
+
+def count_events(state, domain_event):
+    state = Counter(state)
+    state[domain_event.entity_id] += 1
+    return state
+
+
+class TestScanPartitions(SQLiteDatastoreTestCase):
+    use_named_temporary_file = True
+
+    def setUp(self):
+        super(TestScanPartitions, self).setUp()
+        self.datastore.setup_connection()
+        self.datastore.setup_tables()
+        self.event_store_factory = partial(construct_event_store, self.temp_file.name)
+
+        # Store events for many entities.
+        event_store = self.event_store_factory()
+        self.entity_ids = [uuid4() for _ in range(10)]
+        for entity_id in self.entity_ids:
+            events = [Example.Created(entity_id=entity_id, a=1, b=2)]
+            events += [Example.Heartbeat(entity_id=entity_id, entity_version=i) for i in range(1, 3)]
+            event_store.append(events)
+
+    def tearDown(self):
+        self.datastore.drop_tables()
+        self.datastore.drop_connection()
+        super(TestScanPartitions, self).tearDown()
+
+    def test_scan_partition(self):
+        result = scan_partition(self.event_store_factory, count_events, 0, 1)
+        self.assertIsInstance(result, PartitionResult)
+        self.assertEqual(result.num_events, 30)
+        self.assertEqual(result.state, Counter({entity_id: 3 for entity_id in self.entity_ids}))
+
+        # Check the scan can continue from the checkpoint.
+        result = scan_partition(self.event_store_factory, count_events, 0, 1, after=result.checkpoint)
+        self.assertEqual(result.num_events, 0)
+
+    def test_scan_partitions(self):
+        finished = []
+        results = scan_partitions(self.event_store_factory, count_events, 3, processes=2, callback=finished.append)
+        self.assertEqual([r.partition for r in results], [0, 1, 2])
+        self.assertEqual(sorted(finished), sorted(results))
+
+        # Check each entity's events were all reduced in one partition.
+        total = Counter()
+        for result in results:
+            self.assertEqual(result.num_events, sum(result.state.values()) if result.state else 0)
+            total.update(result.state or {})
+        self.assertEqual(total, Counter({entity_id: 3 for entity_id in self.entity_ids}))
+
+        # Check the scans can continue from the checkpoints.
+        checkpoints = {r.partition: r.checkpoint for r in results}
+        results = scan_partitions(self.event_store_factory, count_events, 3, checkpoints=checkpoints, processes=2)
+        self.assertEqual([r.num_events for r in results], [0, 0, 0])
+        self.assertEqual([r.checkpoint for r in results], [checkpoints[p] for p in range(3)])
@@ -3,12 +3,27 @@ from unittest.case import TestCase
 
 import datetime
 
+import dateutil.parser
+
 from decimal import Decimal
+
+import six
 from uuid import uuid4
 
 from eventsourcing.domain.model.events import VersionedEntityEvent, TimestampedEntityEvent, \
-    topic_from_domain_class, DomainEvent
-from eventsourcing.infrastructure.transcoding import SequencedItemMapper, SequencedItem
+    topic_from_domain_class, DomainEvent, TopicRegistry
+from dateutil.tz import tzoffset, tzutc
+
+from eventsourcing.domain.services.cipher import AbstractCipher
+from eventsourcing.infrastructure.binarycodec import BinaryCodec
+from eventsourcing.infrastructure.topiccodes import TopicCodes
+from eventsourcing.infrastructure.transcoding import CompiledJSONCodec, JSONCodec, LazyDomainEvent, \
+    ObjectJSONDecoder, SequencedItemMapper, SequencedItem
+
+try:
+    from unittest import mock
+except:
+    import mock
 
 
 class Event1(VersionedEntityEvent):
@@ -23,6 +38,10 @@ class Event3(DomainEvent):
     pass
 
 
+class Event4(VersionedEntityEvent):
+    pass
+
+
 class ValueObject1(object):
 
     def __init__(self, value):
@@ -32,6 +51,20 @@ class ValueObject1(object):
         return self.__dict__ == other.__dict__
 
 
+class ReversingTextCipher(AbstractCipher):
+    """Cipher that only implements the text methods."""
+
+    def __init__(self):
+        self.plaintexts = []
+
+    def encrypt(self, plaintext):
+        self.plaintexts.append(plaintext)
+        return plaintext[::-1]
+
+    def decrypt(self, ciphertext):
+        return ciphertext[::-1]
+
+
 class TestSequencedItemMapper(TestCase):
 
     def test_with_versioned_entity_event(self):
@@ -144,3 +177,253 @@ class TestSequencedItemMapper(TestCase):
         # Check to_sequenced_item() method results in a sequenced item.
         with self.assertRaises(TypeError):
             mapper.to_sequenced_item(event3)
+
+    def test_topic_registry_and_codes(self):
+        registry = TopicRegistry()
+        mapper = SequencedItemMapper(position_attr_name='entity_version', topic_registry=registry,
+                                     topic_codes=TopicCodes())
+        event1 = Event1(entity_id=uuid4(), entity_version=101)
+
+        # Check the item has the code of the topic.
+        sequenced_item = mapper.to_sequenced_item(event1)
+        self.assertEqual(sequenced_item.topic, '1')
+        self.assertEqual(mapper.decode_topic('1'), topic_from_domain_class(Event1))
+        self.assertEqual(mapper.from_sequenced_item(sequenced_item), event1)
+
+        # Check items with an old topic are mapped with an alias.
+        old_item = SequencedItem(sequenced_item.sequence_id, 101, 'old.module#Event1', sequenced_item.data)
+        registry.add_alias('old.module#Event1', Event1)
+        self.assertEqual(mapper.from_sequenced_item(old_item), event1)
+        self.assertEqual(mapper.from_sequenced_item_lazy(old_item).event_class, Event1)
+
+    def test_from_sequenced_items(self):
+        mapper = SequencedItemMapper(position_attr_name='entity_version', topic_codes=TopicCodes())
+        entity_id = uuid4()
+        events = [Event1(entity_id=entity_id, entity_version=i, a=i) for i in range(5)]
+        events += [Event4(entity_id=entity_id, entity_version=i, b=i) for i in range(5, 10)]
+        sequenced_items = [mapper.to_sequenced_item(e) for e in events]
+
+        # Check a page of items is mapped to the same events as each item.
+        self.assertEqual(mapper.from_sequenced_items(sequenced_items), events)
+        self.assertEqual(mapper.from_sequenced_items(sequenced_items),
+                         [mapper.from_sequenced_item(i) for i in sequenced_items])
+        self.assertEqual(mapper.from_sequenced_items([]), [])
+
+        # Check each topic is resolved once for the page.
+        with mock.patch.object(mapper, 'resolve_topic', wraps=mapper.resolve_topic) as resolve_topic:
+            mapper.from_sequenced_items(sequenced_items)
+        self.assertEqual(resolve_topic.call_count, 2)
+
+    def test_lazy_domain_event(self):
+        # Setup the mapper, with a cipher that counts how often it decrypts.
+        cipher = mock.Mock(spec=AbstractCipher)
+        cipher.encrypt.side_effect = lambda plaintext: plaintext
+        cipher.decrypt.side_effect = lambda ciphertext: ciphertext
+        mapper = SequencedItemMapper(position_attr_name='entity_version', always_encrypt=True, cipher=cipher)
+        event1 = Event1(entity_id=uuid4(), entity_version=101, a=1)
+        sequenced_item = mapper.to_sequenced_item(event1)
+
+        # Check the class, entity ID and position are available without decrypting.
+        lazy_event = mapper.from_sequenced_item_lazy(sequenced_item)
+        self.assertIsInstance(lazy_event, LazyDomainEvent)
+        self.assertEqual(lazy_event.event_class, Event1)
+        self.assertEqual(lazy_event.entity_id, event1.entity_id)
+        self.assertEqual(lazy_event.position, 101)
+        self.assertFalse(lazy_event.is_decoded)
+        self.assertEqual(cipher.decrypt.call_count, 0)
+
+        # Check the event is decoded once, when its attributes are first accessed.
+        self.assertEqual(lazy_event.a, 1)
+        self.assertTrue(lazy_event.is_decoded)
+        self.assertEqual(lazy_event.domain_event, event1)
+        self.assertEqual(lazy_event, event1)
+        self.assertEqual(cipher.decrypt.call_count, 1)
+
+
+class TestCompiledJSONCodec(TestCase):
+
+    def test_same_as_json_codec(self):
+        codec = CompiledJSONCodec()
+        json_codec = JSONCodec()
+        # Check the compiled codec is opt-in.
+        self.assertNotIsInstance(SequencedItemMapper(position_attr_name='a').codec, CompiledJSONCodec)
+        self.assertIs(SequencedItemMapper(position_attr_name='a', codec=codec).codec, codec)
+
+        # Check events of a class are encoded as they are by the JSON codec, whatever the types of the values.
+        attrs_list = [
+            {'entity_id': uuid4(), 'a': datetime.datetime(2017, 3, 22, 9, 12, 14), 'b': datetime.date(2017, 3, 22)},
+            {'entity_id': uuid4(), 'a': datetime.datetime(2017, 3, 22, 9, 12, 14, tzinfo=tzutc()), 'b': None},
+            {'entity_id': u'entity1', 'a': 1, 'b': [uuid4()], 'c': ValueObject1(uuid4())},
+            {'entity_id': uuid4(), 'a': 2, 'b': {u'x': 1, u'y': uuid4()}},
+        ]
+        for attrs in attrs_list:
+            copy = dict(attrs)
+            data = codec.encode_event_attrs(Event3, attrs)
+            self.assertEqual(data, json_codec.encode(attrs))
+            self.assertEqual(attrs, copy)
+
+        # Check the data is decoded as it is by the JSON codec.
+        for attrs in attrs_list:
+            data = json_codec.encode(attrs)
+            self.assertEqual(codec.decode_event_attrs(Event1, data), json_codec.decode(data))
+
+    def test_decoder_uses_object_hook_after_nested_values(self):
+        codec = CompiledJSONCodec()
+        flat_data = codec.encode({'entity_id': uuid4(), 'a': 1})
+        nested_data = codec.encode({'entity_id': uuid4(), 'a': [ValueObject1(1)]})
+
+        # Check events are decoded without the object hook, until an event has nested values.
+        with mock.patch.object(codec, 'decode', wraps=codec.decode) as decode:
+            codec.decode_event_attrs(Event1, flat_data)
+            self.assertEqual(decode.call_count, 0)
+            self.assertEqual(codec.decode_event_attrs(Event1, nested_data)['a'], [ValueObject1(1)])
+            self.assertEqual(decode.call_count, 1)
+            codec.decode_event_attrs(Event1, flat_data)
+            self.assertEqual(decode.call_count, 2)
+            codec.decode_event_attrs(Event2, flat_data)
+            self.assertEqual(decode.call_count, 2)
+
+
+class TestObjectJSONDecoder(TestCase):
+
+    def test_decode_datetime(self):
+        # Check values in the encoder's format are decoded as dateutil would parse them.
+        values = [
+            '2017-03-22T09:12:14.123456',
+            '2017-03-22T09:12:14.000000+0000',
+            '2017-03-22T09:12:14.000000+0530',
+            '2017-03-22T09:12:14.000001-0500',
+        ]
+        for value in values:
+            decoded = ObjectJSONDecoder._decode_datetime({'ISO8601_datetime': value})
+            parsed = dateutil.parser.parse(value)
+            self.assertEqual(decoded, parsed)
+            self.assertEqual(decoded.utcoffset(), parsed.utcoffset())
+            self.assertEqual(decoded.tzinfo, parsed.tzinfo)
+
+        # Check values in other formats are parsed with dateutil.
+        for value in ['2017-03-22T09:12:14', '2017-03-22 09:12:14+00:00', '2017-03-22T09:12:14.123456Z']:
+            decoded = ObjectJSONDecoder._decode_datetime({'ISO8601_datetime': value})
+            self.assertEqual(decoded, dateutil.parser.parse(value))
+
+        with self.assertRaises(ValueError):
+            ObjectJSONDecoder._decode_datetime({'ISO8601_datetime': '2017-13-22T09:12:14.123456'})
+
+    def test_decode_date_and_uuid(self):
+        self.assertEqual(ObjectJSONDecoder._decode_date({'ISO8601_date': '2017-03-22'}), datetime.date(2017, 3, 22))
+        uuid = uuid4()
+        self.assertEqual(ObjectJSONDecoder._decode_uuid({'UUID': uuid.hex}), uuid)
+        self.assertEqual(ObjectJSONDecoder._decode_uuid({'UUID': str(uuid)}), uuid)
+
+    def test_compact_encodings(self):
+        event3 = Event3(
+            entity_id=uuid4(),
+            entity_version=303,
+            a=datetime.datetime(2017, 3, 22, 9, 12, 14, 123456),
+            b=datetime.datetime(2017, 3, 22, 9, 12, 14, tzinfo=tzoffset(None, 19800)),
+            c=[uuid4(), datetime.datetime(1900, 1, 1)],
+        )
+        mapper = SequencedItemMapper(position_attr_name='entity_version')
+        compact_mappers = [
+            SequencedItemMapper(position_attr_name='entity_version', compact_datetimes=True, compact_uuids=True),
+            SequencedItemMapper(position_attr_name='entity_version', codec=JSONCodec(
+                compact_datetimes=True, compact_uuids=True)
+            ),
+        ]
+        for compact_mapper in compact_mappers:
+            # Check the compact encodings are used, and are smaller.
+            sequenced_item = compact_mapper.to_sequenced_item(event3)
+            self.assertIn('datetime_us', sequenced_item.data)
+            self.assertIn('datetime_us_tz', sequenced_item.data)
+            self.assertIn('UUID_b64', sequenced_item.data)
+            self.assertNotIn('ISO8601_datetime', sequenced_item.data)
+            self.assertLess(len(sequenced_item.data), len(mapper.to_sequenced_item(event3).data))
+
+            # Check data in either format is decoded by either mapper.
+            for item in [sequenced_item, mapper.to_sequenced_item(event3)]:
+                for m in [mapper, compact_mapper]:
+                    domain_event = m.from_sequenced_item(item)
+                    self.assertEqual(domain_event, event3)
+                    self.assertEqual(domain_event.b.utcoffset(), datetime.timedelta(hours=5, minutes=30))
+
+
+class TestBinaryCodec(TestCase):
+
+    def test_encode_and_decode(self):
+        codec = BinaryCodec()
+        values = [
+            None, True, False, 0, 1, -1, 63, -64, 2 ** 70, -2 ** 70, 1.5, float('inf'),
+            u'', u'text', u'\u00e9\u4e2d', b'', b'\x00\xff',
+            [], [1, [2, u'3']], (1, (2,)), {}, {u'a': 1, 2: [None]},
+            uuid4(),
+            datetime.datetime(2017, 3, 22, 9, 12, 14, 123456),
+            datetime.datetime(1900, 1, 1),
+            datetime.datetime(2017, 3, 22, 9, 12, 14, tzinfo=tzutc()),
+            datetime.datetime(2017, 3, 22, 9, 12, 14, tzinfo=tzoffset(None, -18000)),
+            datetime.date(2017, 3, 22),
+            ValueObject1(u'value1'),
+            ValueObject1(ValueObject1([uuid4()])),
+        ]
+        for value in values:
+            data = codec.encode(value)
+            self.assertIsInstance(data, bytes)
+            decoded = codec.decode(data)
+            self.assertEqual(decoded, value)
+            self.assertEqual(type(decoded), type(value))
+
+        # Check the offset of aware datetimes is kept.
+        value = codec.decode(codec.encode(values[-4]))
+        self.assertEqual(value.utcoffset(), datetime.timedelta(hours=-5))
+
+        # Check small values are small.
+        self.assertEqual(len(codec.encode(1)), 2)
+        self.assertEqual(len(codec.encode(uuid4())), 17)
+
+        # Check subclasses of encoded types are encoded as the base type.
+        class Text(six.text_type):
+            pass
+
+        self.assertEqual(codec.decode(codec.encode(Text(u'text'))), u'text')
+
+        # Check values that can't be encoded.
+        with self.assertRaises(TypeError):
+            codec.encode(Decimal(1.0))
+        with self.assertRaises(TypeError):
+            codec.encode(ValueObject1)
+
+    def test_with_mapper(self):
+        mapper = SequencedItemMapper(position_attr_name='a', codec=BinaryCodec())
+        self.assertIsInstance(SequencedItemMapper(position_attr_name='a').codec, JSONCodec)
+
+        # Check domain events are mapped to binary data, which is smaller than JSON.
+        event3 = Event3(
+            entity_id=uuid4(),
+            entity_version=303,
+            a=datetime.datetime(2017, 3, 22, 9, 12, 14),
+            b=datetime.date(2017, 3, 22),
+            c=uuid4(),
+            e=ValueObject1(u'value1'),
+        )
+        sequenced_item = mapper.to_sequenced_item(event3)
+        self.assertIsInstance(sequenced_item.data, bytes)
+        json_item = SequencedItemMapper(position_attr_name='a').to_sequenced_item(event3)
+        self.assertLess(len(sequenced_item.data), len(json_item.data))
+        self.assertEqual(mapper.from_sequenced_item(sequenced_item), event3)
+
+        # Check the binary data can be encrypted with a cipher for text.
+        cipher = ReversingTextCipher()
+        mapper = SequencedItemMapper(position_attr_name='a', codec=BinaryCodec(), always_encrypt=True, cipher=cipher)
+        sequenced_item = mapper.to_sequenced_item(event3)
+        self.assertIsInstance(sequenced_item.data, bytes)
+        self.assertIsInstance(cipher.plaintexts[-1], six.text_type)
+        self.assertEqual(mapper.from_sequenced_item(sequenced_item), event3)
+
+        # Check the binary data is encrypted as bytes, by ciphers that can.
+        cipher = mock.Mock(spec=AbstractCipher)
+        cipher.encrypt_bytes.side_effect = lambda plaintext: plaintext[::-1]
+        cipher.decrypt_bytes.side_effect = lambda ciphertext: ciphertext[::-1]
+        mapper = SequencedItemMapper(position_attr_name='a', codec=BinaryCodec(), always_encrypt=True, cipher=cipher)
+        sequenced_item = mapper.to_sequenced_item(event3)
+        self.assertEqual(sequenced_item.data, cipher.encrypt_bytes.call_args[0][0][::-1])
+        self.assertEqual(mapper.from_sequenced_item(sequenced_item), event3)
+        self.assertEqual(cipher.encrypt.call_count, 0)
@@ -0,0 +1,107 @@
+from abc import abstractmethod
+
+from eventsourcing.exceptions import ConcurrencyError, TopicResolutionError
+from eventsourcing.infrastructure.sqlalchemy.activerecords import SQLAlchemyTopicCodeTable, SqlTopicCode
+from eventsourcing.infrastructure.sqlalchemy.datastore import Base, SQLAlchemyDatastore, SQLAlchemySettings
+from eventsourcing.infrastructure.sqlite.activerecords import SQLiteTopicCode, SQLiteTopicCodeTable
+from eventsourcing.infrastructure.sqlite.datastore import SQLiteDatastore, SQLiteSettings
+from eventsourcing.infrastructure.topiccodes import PythonObjectsTopicCodeTable, TopicCodes
+from eventsourcing.tests.base import AbstractTestCase
+
+
+class TopicCodesTestCase(AbstractTestCase):
+    datastore = None
+
+    def setUp(self):
+        super(TopicCodesTestCase, self).setUp()
+        if self.datastore is not None:
+            self.datastore.setup_connection()
+            self.datastore.setup_tables()
+        self.code_table = self.construct_code_table()
+
+    def tearDown(self):
+        if self.datastore is not None:
+            self.datastore.drop_tables()
+            self.datastore.drop_connection()
+        super(TopicCodesTestCase, self).tearDown()
+
+    @abstractmethod
+    def construct_code_table(self):
+        """
+        Returns topic code table.
+        """
+
+    def test_codes(self):
+        topic_codes = TopicCodes(code_table=self.code_table)
+
+        # Check codes are allocated when topics are first encoded.
+        self.assertEqual(topic_codes.encode('module#Class1'), '1')
+        self.assertEqual(topic_codes.encode('module#Class2'), '2')
+        self.assertEqual(topic_codes.encode('module#Class1'), '1')
+        self.assertEqual(topic_codes.decode('2'), 'module#Class2')
+        self.assertEqual(sorted(self.code_table.get_codes()), [('module#Class1', '1'), ('module#Class2', '2')])
+
+        # Check topics that aren't codes are decoded as they are.
+        self.assertEqual(topic_codes.decode('module#Class3'), 'module#Class3')
+
+        # Check the codes are loaded from the table.
+        other_topic_codes = TopicCodes(code_table=self.code_table)
+        self.assertEqual(other_topic_codes.decode('1'), 'module#Class1')
+        self.assertEqual(other_topic_codes.encode('module#Class2'), '2')
+
+        # Check codes allocated by others are found.
+        self.assertEqual(other_topic_codes.encode('module#Class3'), '3')
+        self.assertEqual(topic_codes.decode('3'), 'module#Class3')
+
+        # Check a code isn't allocated twice, when another has saved it first.
+        self.assertEqual(other_topic_codes.encode('module#Class4'), '4')
+        self.assertEqual(topic_codes.encode('module#Class5'), '5')
+        self.assertEqual(topic_codes.encode('module#Class4'), '4')
+        self.assertEqual(other_topic_codes.decode('5'), 'module#Class5')
+
+        # Check the table doesn't save a topic or a code twice.
+        with self.assertRaises(ConcurrencyError):
+            self.code_table.insert_code('module#Class1', '6')
+        with self.assertRaises(ConcurrencyError):
+            self.code_table.insert_code('module#Class6', '1')
+
+        # Check codes are looked up without allocating them, including codes allocated by others.
+        self.assertEqual(topic_codes.lookup('module#Class1'), '1')
+        self.assertIsNone(topic_codes.lookup('module#Class7'))
+        self.assertEqual(len(self.code_table.get_codes()), 5)
+        self.assertEqual(other_topic_codes.encode('module#Class7'), '6')
+        self.assertEqual(topic_codes.lookup('module#Class7'), '6')
+
+        # Check an unknown code can't be decoded.
+        with self.assertRaises(TopicResolutionError):
+            topic_codes.decode('8')
+
+
+class TestTopicCodesWithPythonObjects(TopicCodesTestCase):
+    def construct_code_table(self):
+        return PythonObjectsTopicCodeTable()
+
+    def test_without_code_table(self):
+        topic_codes = TopicCodes()
+        self.assertEqual(topic_codes.encode('module#Class1'), '1')
+        self.assertEqual(topic_codes.decode('1'), 'module#Class1')
+        with self.assertRaises(TopicResolutionError):
+            topic_codes.decode('2')
+
+
+class TestTopicCodesWithSQLite(TopicCodesTestCase):
+    def setUp(self):
+        self.datastore = SQLiteDatastore(settings=SQLiteSettings(), tables=(SQLiteTopicCode,))
+        super(TestTopicCodesWithSQLite, self).setUp()
+
+    def construct_code_table(self):
+        return SQLiteTopicCodeTable(self.datastore)
+
+
+class TestTopicCodesWithSQLAlchemy(TopicCodesTestCase):
+    def setUp(self):
+        self.datastore = SQLAlchemyDatastore(base=Base, settings=SQLAlchemySettings(), tables=(SqlTopicCode,))
+        super(TestTopicCodesWithSQLAlchemy, self).setUp()
+
+    def construct_code_table(self):
+        return SQLAlchemyTopicCodeTable(self.datastore)
@@ -0,0 +1,37 @@
+import os
+import shutil
+from tempfile import mkdtemp
+
+from eventsourcing.infrastructure.filesystem.activerecords import FileIntegerSequencedItem, \
+    FileTimestampSequencedItem
+from eventsourcing.infrastructure.filesystem.datastore import FileDatastore, FileSettings
+from eventsourcing.tests.datastore_tests.base import AbstractDatastoreTestCase, DatastoreTestCase
+
+
+class FileDatastoreTestCase(AbstractDatastoreTestCase):
+    def __init__(self, *args, **kwargs):
+        super(FileDatastoreTestCase, self).__init__(*args, **kwargs)
+        self.temp_dir = None
+
+    def construct_datastore(self):
+        self.temp_dir = mkdtemp()
+        return FileDatastore(
+            settings=FileSettings(path=os.path.join(self.temp_dir, 'data')),
+            tables=(FileIntegerSequencedItem, FileTimestampSequencedItem),
+        )
+
+    def tearDown(self):
+        super(FileDatastoreTestCase, self).tearDown()
+        if self.temp_dir is not None:
+            shutil.rmtree(self.temp_dir)
+            self.temp_dir = None
+
+
+class TestFileDatastore(FileDatastoreTestCase, DatastoreTestCase):
+    def list_records(self):
+        return os.listdir(self.datastore.get_table_path(FileIntegerSequencedItem))
+
+    def create_record(self):
+        table_path = self.datastore.get_table_path(FileIntegerSequencedItem)
+        with open(os.path.join(table_path, 'record'), 'w') as f:
+            f.write('record')
@@ -0,0 +1,49 @@
+import sqlite3
+from tempfile import NamedTemporaryFile
+from uuid import uuid4
+
+from eventsourcing.infrastructure.datastore import DatastoreTableError
+from eventsourcing.infrastructure.sqlite.activerecords import SQLiteIntegerSequenceHead, \
+    SQLiteIntegerSequencedItem, SQLiteTimestampSequenceHead, SQLiteTimestampSequencedItem
+from eventsourcing.infrastructure.sqlite.datastore import DEFAULT_SQLITE_DB_PATH, SQLiteDatastore, SQLiteSettings
+from eventsourcing.tests.datastore_tests.base import AbstractDatastoreTestCase, DatastoreTestCase
+
+
+class SQLiteDatastoreTestCase(AbstractDatastoreTestCase):
+    use_named_temporary_file = False
+
+    def construct_datastore(self):
+        if self.use_named_temporary_file:
+            self.temp_file = NamedTemporaryFile('a', delete=True)
+            path = self.temp_file.name
+        else:
+            path = DEFAULT_SQLITE_DB_PATH
+        return SQLiteDatastore(
+            settings=SQLiteSettings(path=path),
+            tables=(SQLiteIntegerSequencedItem, SQLiteTimestampSequencedItem,
+                    SQLiteIntegerSequenceHead, SQLiteTimestampSequenceHead),
+        )
+
+
+class TestSQLiteDatastore(SQLiteDatastoreTestCase, DatastoreTestCase):
+    use_named_temporary_file = True
+
+    def list_records(self):
+        try:
+            return self.datastore.connection.execute("SELECT * FROM integer_sequenced_items").fetchall()
+        except sqlite3.OperationalError as e:
+            raise DatastoreTableError(e)
+
+    def create_record(self):
+        try:
+            self.datastore.connection.execute(
+                "INSERT INTO integer_sequenced_items VALUES (?, ?, ?, ?, ?)",
+                (sqlite3.Binary(uuid4().bytes), 0, 'topic', '{}', 1)
+            )
+        except sqlite3.OperationalError as e:
+            raise DatastoreTableError(e)
+
+    def test_journal_mode(self):
+        self.datastore.setup_connection()
+        journal_mode = self.datastore.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(journal_mode.lower(), 'wal')
@@ -1,3 +1,5 @@
+from uuid import uuid4
+
 from eventsourcing.application.policies import CombinedPersistencePolicy
 from eventsourcing.domain.model.snapshot import Snapshot
 from eventsourcing.example.application import ExampleApplication
@@ -96,3 +98,22 @@ class ExampleApplicationTestCase(WithExampleApplication):
 
             # Check the new snapshot is not equal to the first.
             self.assertNotEqual(snapshot1, snapshot4)
+
+            # Register another example, and discard it.
+            example2 = app.register_new_example(a=1, b=2)
+            example2.discard()
+
+            # Change the first example again, so there are events after its snapshot.
+            entity1.b = 30
+
+            # Check entities can be retrieved together.
+            example3 = app.register_new_example(a=3, b=4)
+            entity_ids = [example1.id, example2.id, uuid4(), example3.id]
+            entities = app.example_repo.get_entities(entity_ids)
+            self.assertEqual(list(entities.keys()), entity_ids)
+            self.assertEqual(entities[example1.id].a, 100)
+            self.assertEqual(entities[example1.id].b, 30)
+            self.assertEqual(entities[example1.id], app.example_repo[example1.id])
+            self.assertIsNone(entities[example2.id])
+            self.assertIsNone(entities[entity_ids[2]])
+            self.assertEqual(entities[example3.id], example3)
@@ -0,0 +1,7 @@
+from eventsourcing.tests.example_application_tests.base import ExampleApplicationTestCase
+from eventsourcing.tests.sequenced_item_tests.test_file_active_record_strategy import \
+    WithFileActiveRecordStrategies
+
+
+class TestExampleApplicationWithFiles(WithFileActiveRecordStrategies, ExampleApplicationTestCase):
+    pass
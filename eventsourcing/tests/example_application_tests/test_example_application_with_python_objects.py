@@ -0,0 +1,7 @@
+from eventsourcing.tests.example_application_tests.base import ExampleApplicationTestCase
+from eventsourcing.tests.sequenced_item_tests.test_python_objects_active_record_strategy import \
+    WithPythonObjectsActiveRecordStrategies
+
+
+class TestExampleApplicationWithPythonObjects(WithPythonObjectsActiveRecordStrategies, ExampleApplicationTestCase):
+    pass
@@ -0,0 +1,7 @@
+from eventsourcing.tests.example_application_tests.base import ExampleApplicationTestCase
+from eventsourcing.tests.sequenced_item_tests.test_sqlite_active_record_strategy import \
+    WithSQLiteActiveRecordStrategies
+
+
+class TestExampleApplicationWithSQLite(WithSQLiteActiveRecordStrategies, ExampleApplicationTestCase):
+    pass
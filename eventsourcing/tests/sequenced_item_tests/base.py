@@ -1,16 +1,19 @@
 import json
 import uuid
-from time import time
+from itertools import count
+from time import sleep, time
 from uuid import uuid4
 
+import mock
 import six
 
 from eventsourcing.application.policies import CombinedPersistencePolicy
 from eventsourcing.domain.model.events import TimestampedEntityEvent, VersionedEntityEvent, topic_from_domain_class
 from eventsourcing.exceptions import SequencedItemError
-from eventsourcing.infrastructure.activerecord import AbstractActiveRecordStrategy
+from eventsourcing.infrastructure.activerecord import AbstractActiveRecordStrategy, SequenceHead
 from eventsourcing.infrastructure.eventstore import EventStore
-from eventsourcing.infrastructure.iterators import SequencedItemIterator, ThreadedSequencedItemIterator
+from eventsourcing.infrastructure.iterators import AdaptiveSequencedItemIterator, SequencedItemIterator, \
+    ThreadedSequencedItemIterator
 from eventsourcing.infrastructure.transcoding import SequencedItem, SequencedItemMapper, StoredEvent
 from eventsourcing.tests.datastore_tests.base import AbstractDatastoreTestCase
 
@@ -259,6 +262,246 @@ class ActiveRecordStrategyTestCase(AbstractDatastoreTestCase):
         entity_ids = set([i.sequence_id for i in retrieved_items])
         self.assertEqual(entity_ids, {sequence_id1, sequence_id2})
 
+    def test_append_items(self):
+        sequence_id1 = uuid.uuid1()
+        position1, position2, position3 = self.construct_positions()
+
+        # Append a list of items.
+        items = [
+            SequencedItem(
+                sequence_id=sequence_id1,
+                position=position,
+                topic=self.EXAMPLE_EVENT_TOPIC1,
+                data=json.dumps({'name': 'value{}'.format(i)}),
+            )
+            for i, position in enumerate([position1, position2])
+        ]
+        self.active_record_strategy.append_item(items)
+
+        # Check the items are in the sequence.
+        retrieved_items = self.active_record_strategy.get_items(sequence_id1)
+        self.assertEqual(len(retrieved_items), 2)
+        self.assertEqual(retrieved_items[0].position, position1)
+        self.assertEqual(retrieved_items[0].data, items[0].data)
+        self.assertEqual(retrieved_items[1].position, position2)
+        self.assertEqual(retrieved_items[1].data, items[1].data)
+
+        # Check appending an empty list doesn't write anything.
+        self.active_record_strategy.append_item([])
+        self.assertEqual(len(self.active_record_strategy.get_items(sequence_id1)), 2)
+
+        # Check raises SequencedItemError when a list includes an existing position.
+        item3 = SequencedItem(
+            sequence_id=sequence_id1,
+            position=position3,
+            topic=self.EXAMPLE_EVENT_TOPIC2,
+            data=json.dumps({'name': 'value3'}),
+        )
+        item4 = SequencedItem(
+            sequence_id=sequence_id1,
+            position=position2,
+            topic=self.EXAMPLE_EVENT_TOPIC2,
+            data=json.dumps({'name': 'value4'}),
+        )
+        with self.assertRaises(SequencedItemError):
+            self.active_record_strategy.append_item([item3, item4])
+
+        # Check none of the items in the failed list were written.
+        retrieved_items = self.active_record_strategy.get_items(sequence_id1)
+        self.assertEqual(len(retrieved_items), 2)
+        self.assertEqual(retrieved_items[1].data, items[1].data)
+
+    def test_get_items_many(self):
+        sequence_id1 = uuid.uuid1()
+        sequence_id2 = uuid.uuid1()
+        sequence_id3 = uuid.uuid1()
+        positions = self.construct_positions()
+        for sequence_id in [sequence_id1, sequence_id2]:
+            self.active_record_strategy.append_item([
+                SequencedItem(
+                    sequence_id=sequence_id,
+                    position=position,
+                    topic=self.EXAMPLE_EVENT_TOPIC1,
+                    data=json.dumps({'name': 'value'}),
+                )
+                for position in positions
+            ])
+
+        # Check the items are grouped by sequence, in the order of the given sequence IDs.
+        items = self.active_record_strategy.get_items_many([sequence_id2, sequence_id3, sequence_id1])
+        self.assertEqual(list(items.keys()), [sequence_id2, sequence_id3, sequence_id1])
+        self.assertEqual([i.position for i in items[sequence_id1]], list(positions))
+        self.assertEqual([i.position for i in items[sequence_id2]], list(positions))
+        self.assertEqual(items[sequence_id3], [])
+
+        # Check the range arguments apply to each sequence.
+        items = self.active_record_strategy.get_items_many(
+            [sequence_id1, sequence_id2], gt=positions[0], limit=1, query_ascending=False
+        )
+        self.assertEqual([i.position for i in items[sequence_id1]], [positions[2]])
+        self.assertEqual([i.position for i in items[sequence_id2]], [positions[2]])
+
+        # Check the range arguments can be different for each sequence.
+        items = self.active_record_strategy.get_items_many(
+            [sequence_id1, sequence_id2], gte={sequence_id1: positions[1]}, lt={sequence_id2: positions[1]}
+        )
+        self.assertEqual([i.position for i in items[sequence_id1]], [positions[1], positions[2]])
+        self.assertEqual([i.position for i in items[sequence_id2]], [positions[0]])
+        items = self.active_record_strategy.get_items_many(
+            [sequence_id1, sequence_id2], gt={sequence_id2: positions[0]}, limit=1, results_ascending=False
+        )
+        self.assertEqual([i.position for i in items[sequence_id1]], [positions[0]])
+        self.assertEqual([i.position for i in items[sequence_id2]], [positions[1]])
+
+    def test_get_items_with_topics(self):
+        # Append items with alternate topics to a sequence.
+        sequence_id1 = uuid.uuid1()
+        positions = self.construct_positions()
+        topics = [self.EXAMPLE_EVENT_TOPIC1, self.EXAMPLE_EVENT_TOPIC2, self.EXAMPLE_EVENT_TOPIC1]
+        self.active_record_strategy.append_item([
+            SequencedItem(
+                sequence_id=sequence_id1,
+                position=position,
+                topic=topic,
+                data=json.dumps({'name': 'value'}),
+            )
+            for position, topic in zip(positions, topics)
+        ])
+
+        # Check only items with the given topics are returned.
+        items = self.active_record_strategy.get_items(sequence_id1, topics=[self.EXAMPLE_EVENT_TOPIC1])
+        self.assertEqual([i.position for i in items], [positions[0], positions[2]])
+        items = self.active_record_strategy.get_items(sequence_id1, topics=[self.EXAMPLE_EVENT_TOPIC2])
+        self.assertEqual([i.position for i in items], [positions[1]])
+        items = self.active_record_strategy.get_items(sequence_id1, topics=[
+            self.EXAMPLE_EVENT_TOPIC1, self.EXAMPLE_EVENT_TOPIC2])
+        self.assertEqual([i.position for i in items], list(positions))
+        self.assertEqual(self.active_record_strategy.get_items(sequence_id1, topics=[]), [])
+
+        # Check the limit applies to the selected items.
+        items = self.active_record_strategy.get_items(sequence_id1, limit=1, query_ascending=False,
+                                                      topics=[self.EXAMPLE_EVENT_TOPIC1])
+        self.assertEqual([i.position for i in items], [positions[2]])
+        items = self.active_record_strategy.get_items(sequence_id1, gt=positions[0], limit=1,
+                                                      topics=[self.EXAMPLE_EVENT_TOPIC1])
+        self.assertEqual([i.position for i in items], [positions[2]])
+        items = self.active_record_strategy.get_items(sequence_id1, limit=2, query_ascending=False,
+                                                      results_ascending=True, topics=[self.EXAMPLE_EVENT_TOPIC1])
+        self.assertEqual([i.position for i in items], [positions[0], positions[2]])
+
+        # Check all items can be filtered by topic.
+        items = self.active_record_strategy.all_items(topics=[self.EXAMPLE_EVENT_TOPIC2])
+        self.assertEqual([i.position for i in items], [positions[1]])
+
+    def test_get_head(self):
+        sequence_id1 = uuid.uuid1()
+        sequence_id2 = uuid.uuid1()
+        sequence_id3 = uuid.uuid1()
+        positions = self.construct_positions()
+
+        # Check there are no heads.
+        self.assertIsNone(self.active_record_strategy.get_head(sequence_id1))
+
+        # Append an item, and then a list of items.
+        self.active_record_strategy.append_item(
+            SequencedItem(sequence_id1, positions[0], self.EXAMPLE_EVENT_TOPIC1, json.dumps({'name': 'value'}))
+        )
+        self.assertEqual(self.active_record_strategy.get_head(sequence_id1),
+                         SequenceHead(sequence_id1, positions[0], self.EXAMPLE_EVENT_TOPIC1))
+        self.active_record_strategy.append_item([
+            SequencedItem(sequence_id1, positions[1], self.EXAMPLE_EVENT_TOPIC1, json.dumps({'name': 'value'})),
+            SequencedItem(sequence_id1, positions[2], self.EXAMPLE_EVENT_TOPIC2, json.dumps({'name': 'value'})),
+            SequencedItem(sequence_id2, positions[0], self.EXAMPLE_EVENT_TOPIC1, json.dumps({'name': 'value'})),
+        ])
+
+        # Check the heads are the last items.
+        head = self.active_record_strategy.get_head(sequence_id1)
+        self.assertEqual(head, SequenceHead(sequence_id1, positions[2], self.EXAMPLE_EVENT_TOPIC2))
+        self.assertEqual(head.position, positions[2])
+
+        # Check the heads aren't changed by a failed append.
+        with self.assertRaises(SequencedItemError):
+            self.active_record_strategy.append_item([
+                SequencedItem(sequence_id2, positions[1], self.EXAMPLE_EVENT_TOPIC2, json.dumps({'name': 'value'})),
+                SequencedItem(sequence_id1, positions[2], self.EXAMPLE_EVENT_TOPIC1, json.dumps({'name': 'value'})),
+            ])
+        heads = self.active_record_strategy.get_heads([sequence_id3, sequence_id2, sequence_id1])
+        self.assertEqual(list(heads.keys()), [sequence_id3, sequence_id2, sequence_id1])
+        self.assertEqual(list(heads.values()), [
+            None,
+            SequenceHead(sequence_id2, positions[0], self.EXAMPLE_EVENT_TOPIC1),
+            SequenceHead(sequence_id1, positions[2], self.EXAMPLE_EVENT_TOPIC2),
+        ])
+
+    def test_read_partition(self):
+        # Append items to many sequences.
+        sequence_ids = [uuid.uuid4() for _ in range(8)]
+        items = []
+        for position in self.construct_positions():
+            for sequence_id in sequence_ids:
+                item = SequencedItem(sequence_id, position, self.EXAMPLE_EVENT_TOPIC1, json.dumps({'name': 'value'}))
+                self.active_record_strategy.append_item(item)
+                items.append(item)
+
+        for num_partitions in [1, 3]:
+            partition_items = []
+            for partition in range(num_partitions):
+                pairs = self.active_record_strategy.read_partition(partition, num_partitions)
+
+                # Check each sequence is in one partition, with its items in order.
+                for sequence_id in sequence_ids:
+                    sequence_items = [item for _, item in pairs if item.sequence_id == sequence_id]
+                    self.assertIn(sequence_items, [[], [item for item in items if item.sequence_id == sequence_id]])
+
+                # Check reading can continue from checkpoints.
+                self.assertEqual(
+                    list(self.active_record_strategy.iter_partition(partition, num_partitions, page_size=2)), pairs
+                )
+                partition_items += [item for _, item in pairs]
+
+            # Check the partitions have all the items.
+            self.assertEqual(sorted(partition_items), sorted(items))
+
+        # Check only items with the given topics are read.
+        self.assertEqual(self.active_record_strategy.read_partition(0, 1, topics=[self.EXAMPLE_EVENT_TOPIC2]), [])
+
+    def test_read_all(self):
+        # Check there are no items.
+        self.assertEqual(self.active_record_strategy.read_all(), [])
+
+        # Append items to different sequences, alternately.
+        sequence_id1 = uuid.uuid1()
+        sequence_id2 = uuid.uuid1()
+        items = []
+        for position in self.construct_positions():
+            for sequence_id in [sequence_id1, sequence_id2]:
+                item = SequencedItem(
+                    sequence_id=sequence_id,
+                    position=position,
+                    topic=self.EXAMPLE_EVENT_TOPIC1,
+                    data=json.dumps({'name': 'value'}),
+                )
+                self.active_record_strategy.append_item(item)
+                items.append(item)
+
+        # Check all the items are read in the order they were recorded, with increasing positions.
+        pairs = self.active_record_strategy.read_all()
+        self.assertEqual([item for _, item in pairs], items)
+        positions = [position for position, _ in pairs]
+        self.assertEqual(positions, sorted(set(positions)))
+
+        # Check reading can continue from a checkpoint.
+        checkpoint = pairs[1][0]
+        self.assertEqual(self.active_record_strategy.read_all(after=checkpoint, limit=2), pairs[2:4])
+        self.assertEqual(self.active_record_strategy.read_all(after=checkpoint), pairs[2:])
+        self.assertEqual(self.active_record_strategy.read_all(after=pairs[-1][0]), [])
+
+        # Check only items with the given topics are read.
+        self.assertEqual(self.active_record_strategy.read_all(topics=[self.EXAMPLE_EVENT_TOPIC1]), pairs)
+        self.assertEqual(self.active_record_strategy.read_all(topics=[self.EXAMPLE_EVENT_TOPIC2]), [])
+        self.assertEqual(self.active_record_strategy.read_all(after=checkpoint, limit=1, topics=[
+            self.EXAMPLE_EVENT_TOPIC1, self.EXAMPLE_EVENT_TOPIC2]), pairs[2:3])
+
 
 class WithActiveRecordStrategies(AbstractDatastoreTestCase):
     def __init__(self, *args, **kwargs):
@@ -450,6 +693,27 @@ class SequencedItemIteratorTestCase(WithActiveRecordStrategies):
             limit=12,
         )
 
+    def test_page_func(self):
+        self.setup_sequenced_items()
+
+        # Check each page of items is mapped by one call to the page function.
+        pages = []
+
+        def page_func(sequenced_items):
+            pages.append(len(sequenced_items))
+            return [item.position for item in sequenced_items]
+
+        iterator = self.iterator_cls(
+            active_record_strategy=self.integer_sequence_active_record_strategy,
+            sequence_id=self.entity_id,
+            page_size=5,
+            page_func=page_func,
+        )
+        self.assertEqual(list(iterator), list(range(self.number_of_sequenced_items)))
+        self.assertEqual(sum(pages), self.number_of_sequenced_items)
+        self.assertEqual(len(pages), iterator.query_counter)
+        self.assertEqual(iterator.all_item_counter, self.number_of_sequenced_items)
+
     def assert_iterator_yields_events(self, is_ascending, expect_at_start, expect_at_end, expect_item_count=1,
                                       expect_page_count=0, expect_query_count=0, page_size=1, limit=None):
         iterator = self.construct_iterator(is_ascending, page_size, limit=limit)
@@ -468,11 +732,130 @@ class SimpleSequencedItemteratorTestCase(SequencedItemIteratorTestCase):
         return SequencedItemIterator
 
 
+class AdaptiveSequencedItemIteratorTestCase(SequencedItemIteratorTestCase):
+    @property
+    def iterator_cls(self):
+        return AdaptiveSequencedItemIterator
+
+    def construct_iterator(self, is_ascending, page_size, gt=None, lte=None, limit=None):
+        # Check the adaptive iterator works like the others, when the page size can't grow.
+        return self.iterator_cls(
+            active_record_strategy=self.integer_sequence_active_record_strategy,
+            sequence_id=self.entity_id,
+            page_size=page_size,
+            gt=gt,
+            lte=lte,
+            limit=limit,
+            is_ascending=is_ascending,
+            min_page_size=1,
+            max_page_size=page_size,
+        )
+
+    def test_adaptive_page_sizes(self):
+        sequence_id = uuid4()
+        self.integer_sequence_active_record_strategy.append_item([
+            SequencedItem(sequence_id, i, 'topic', 'x' * 100) for i in six.moves.range(100)
+        ])
+
+        def construct_iterator(page_size, **kwargs):
+            return self.iterator_cls(
+                active_record_strategy=self.integer_sequence_active_record_strategy,
+                sequence_id=sequence_id,
+                page_size=page_size,
+                min_page_size=2,
+                max_page_size=40,
+                **kwargs
+            )
+
+        # Check the page size grows when queries are fast, up to the maximum.
+        with mock.patch('eventsourcing.infrastructure.iterators.default_timer', side_effect=count(0, 0.0001)):
+            iterator = construct_iterator(None)
+            self.assertEqual(len(list(iterator)), 100)
+        self.assertEqual(iterator.page_sizes, [2, 4, 8, 16, 32, 40])
+        self.assertEqual(iterator.query_counter, 6)
+
+        # Check the page size is limited by the target number of bytes.
+        with mock.patch('eventsourcing.infrastructure.iterators.default_timer', side_effect=count(0, 0.0001)):
+            iterator = construct_iterator(None, target_page_bytes=1000)
+            self.assertEqual(len(list(iterator)), 100)
+        self.assertEqual(iterator.page_sizes[:5], [2, 4, 8, 10, 10])
+
+        # Check the page size shrinks when queries are slow, down to the minimum.
+        with mock.patch('eventsourcing.infrastructure.iterators.default_timer', side_effect=count(0, 0.125)):
+            iterator = construct_iterator(32, limit=64, target_page_duration=0.0625)
+            self.assertEqual(len(list(iterator)), 64)
+        self.assertEqual(iterator.page_sizes[:6], [32, 16, 8, 4, 2, 2])
+
+
 class ThreadedSequencedItemIteratorTestCase(SequencedItemIteratorTestCase):
     @property
     def iterator_cls(self):
         return ThreadedSequencedItemIterator
 
+    def test_prefetching(self):
+        self.setup_sequenced_items()
+
+        # Check items can be mapped by the iterator.
+        iterator = self.iterator_cls(
+            active_record_strategy=self.integer_sequence_active_record_strategy,
+            sequence_id=self.entity_id,
+            page_size=5,
+            prefetch_depth=1,
+            item_func=lambda item: item.position,
+        )
+        self.assertEqual(list(iterator), list(range(self.number_of_sequenced_items)))
+
+        # Check the fetching task stops when the consumer stops early.
+        iterator = self.iterator_cls(
+            active_record_strategy=self.integer_sequence_active_record_strategy,
+            sequence_id=self.entity_id,
+            page_size=1,
+            prefetch_depth=1,
+        )
+        items = iter(iterator)
+        self.assertEqual(next(items), self.sequenced_items[0])
+        items.close()
+        sleep(0.3)
+        self.assertLess(iterator.query_counter, self.number_of_sequenced_items)
+
+        # Check lots of iterators can be left partly read, without stopping others fetching pages.
+        abandoned = []
+        for _ in range(30):
+            items = iter(self.iterator_cls(
+                active_record_strategy=self.integer_sequence_active_record_strategy,
+                sequence_id=self.entity_id,
+                page_size=1,
+                prefetch_depth=1,
+            ))
+            next(items)
+            abandoned.append(items)
+        iterator = self.iterator_cls(
+            active_record_strategy=self.integer_sequence_active_record_strategy,
+            sequence_id=self.entity_id,
+            page_size=1,
+        )
+        self.assertEqual(len(list(iterator)), self.number_of_sequenced_items)
+        for items in abandoned:
+            items.close()
+
+        # Check errors are raised to the consumer.
+        def get_items(*args, **kwargs):
+            raise ValueError("Failed to get items")
+
+        strategy = self.integer_sequence_active_record_strategy
+        with mock.patch.object(strategy, 'get_items', get_items):
+            iterator = self.iterator_cls(active_record_strategy=strategy, sequence_id=self.entity_id)
+            with self.assertRaises(ValueError):
+                list(iterator)
+
+        # Check errors in the item function are raised to the consumer.
+        def item_func(item):
+            raise KeyError(item.position)
+
+        iterator = self.iterator_cls(active_record_strategy=strategy, sequence_id=self.entity_id, item_func=item_func)
+        with self.assertRaises(KeyError):
+            list(iterator)
+
 
 class WithPersistencePolicy(WithActiveRecordStrategies):
     """
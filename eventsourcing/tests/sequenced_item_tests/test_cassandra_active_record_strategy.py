@@ -1,3 +1,9 @@
+from unittest import TestCase
+from uuid import uuid4
+
+import mock
+
+from eventsourcing.exceptions import SequencedItemError
 from eventsourcing.infrastructure.cassandra.activerecords import CassandraActiveRecordStrategy, \
     CqlIntegerSequencedItem, CqlTimestampSequencedItem
 from eventsourcing.infrastructure.transcoding import SequencedItem
@@ -7,17 +13,19 @@ from eventsourcing.tests.sequenced_item_tests.base import IntegerSequencedItemTe
     WithActiveRecordStrategies
 
 
-def construct_integer_sequenced_active_record_strategy():
+def construct_integer_sequenced_active_record_strategy(**kwargs):
     return CassandraActiveRecordStrategy(
         active_record_class=CqlIntegerSequencedItem,
         sequenced_item_class=SequencedItem,
+        **kwargs
     )
 
 
-def construct_timestamp_sequenced_active_record_strategy():
+def construct_timestamp_sequenced_active_record_strategy(**kwargs):
     return CassandraActiveRecordStrategy(
         active_record_class=CqlTimestampSequencedItem,
         sequenced_item_class=SequencedItem,
+        **kwargs
     )
 
 
@@ -26,19 +34,138 @@ class TestCassandraActiveRecordStrategyWithIntegerSequences(CassandraDatastoreTe
     def construct_active_record_strategy(self):
         return construct_integer_sequenced_active_record_strategy()
 
+    def test_read_all(self):
+        # Cassandra doesn't record items in a global order.
+        with self.assertRaises(NotImplementedError):
+            self.active_record_strategy.read_all()
+
 
 class TestCassandraActiveRecordStrategyWithTimestampSequences(CassandraDatastoreTestCase,
                                                               TimestampSequencedItemTestCase):
     def construct_active_record_strategy(self):
         return construct_timestamp_sequenced_active_record_strategy()
 
+    def test_read_all(self):
+        # Cassandra doesn't record items in a global order.
+        with self.assertRaises(NotImplementedError):
+            self.active_record_strategy.read_all()
+
+
+class TestCassandraActiveRecordStrategyWithPreparedStatements(CassandraDatastoreTestCase,
+                                                               IntegerSequencedItemTestCase):
+    def construct_active_record_strategy(self):
+        return construct_integer_sequenced_active_record_strategy(use_prepared_statements=True)
+
+    def test_read_all(self):
+        # Cassandra doesn't record items in a global order.
+        with self.assertRaises(NotImplementedError):
+            self.active_record_strategy.read_all()
+
+
+class TestCassandraPreparedStatementsWithMockedSession(TestCase):
+    def setUp(self):
+        self.session = mock.Mock()
+        self.strategy = construct_integer_sequenced_active_record_strategy(use_prepared_statements=True)
+        patch_session = mock.patch.object(self.strategy, 'get_session', return_value=self.session)
+        patch_table_name = mock.patch.object(CqlIntegerSequencedItem, 'column_family_name',
+                                             return_value='eventsourcing.integer_sequenced_items')
+        for patcher in [patch_session, patch_table_name]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_get_items(self):
+        sequence_id = uuid4()
+        self.session.execute.return_value = [
+            {'p': 2, 't': 'topic', 'd': '{}'},
+            {'p': 1, 't': 'topic', 'd': '{}'},
+        ]
+
+        # Check items are made from the rows, and results are reversed.
+        items = self.strategy.get_items(sequence_id, gt=0, limit=2, query_ascending=False)
+        self.assertEqual(items, [
+            SequencedItem(sequence_id, 1, 'topic', '{}'),
+            SequencedItem(sequence_id, 2, 'topic', '{}'),
+        ])
+        self.session.prepare.assert_called_once_with(
+            "SELECT p, t, d FROM eventsourcing.integer_sequenced_items WHERE s = ? AND p > ? ORDER BY p DESC LIMIT ?"
+        )
+        self.session.execute.assert_called_once_with(self.session.prepare.return_value, [sequence_id, 0, 2])
+
+        # Check the statement is only prepared once.
+        self.strategy.get_items(sequence_id, gt=1, limit=5, query_ascending=False)
+        self.assertEqual(self.session.prepare.call_count, 1)
+
+        # Check a different combination of arguments has its own statement.
+        self.strategy.get_items(sequence_id)
+        self.assertEqual(self.session.prepare.call_count, 2)
+
+    def test_get_item(self):
+        sequence_id = uuid4()
+        self.session.execute.return_value = [{'p': 3, 't': 'topic', 'd': '{}'}]
+        self.assertEqual(self.strategy.get_item(sequence_id, 3), SequencedItem(sequence_id, 3, 'topic', '{}'))
+
+        self.session.execute.return_value = []
+        with self.assertRaises(IndexError):
+            self.strategy.get_item(sequence_id, 4)
+
+    def test_append_item(self):
+        item = SequencedItem(uuid4(), 0, 'topic', '{}')
+        self.session.execute.return_value = [{'[applied]': True}]
+        self.strategy.append_item(item)
+        self.session.prepare.assert_called_once_with(
+            "INSERT INTO eventsourcing.integer_sequenced_items (s, p, t, d) VALUES (?, ?, ?, ?) IF NOT EXISTS"
+        )
+        self.session.execute.assert_called_once_with(self.session.prepare.return_value, tuple(item))
+
+        # Check a conditional insert that isn't applied raises a sequenced item error.
+        self.session.execute.return_value = [{'[applied]': False, 'p': 0, 's': item.sequence_id}]
+        with self.assertRaises(SequencedItemError):
+            self.strategy.append_item(item)
+
+        # Check lists of items are inserted in one batch.
+        with mock.patch('eventsourcing.infrastructure.cassandra.activerecords.BatchStatement') as batch_class:
+            with self.assertRaises(SequencedItemError):
+                self.strategy.append_item([item])
+            batch_class.return_value.add.assert_called_once_with(self.session.prepare.return_value, tuple(item))
+            self.session.execute.assert_called_with(batch_class.return_value, None)
+
+    def test_get_items_many(self):
+        sequence_id1 = uuid4()
+        sequence_id2 = uuid4()
+        rows1 = [{'p': 0, 't': 'topic', 'd': '{}'}, {'p': 1, 't': 'topic', 'd': '{}'}]
+        rows2 = [{'p': 0, 't': 'topic', 'd': '{}'}]
+        target = 'eventsourcing.infrastructure.cassandra.activerecords.execute_concurrent'
+        with mock.patch(target, return_value=[(True, rows1), (True, rows2)]) as execute_concurrent:
+            items = self.strategy.get_items_many([sequence_id1, sequence_id2], limit=2, concurrency=10)
+
+        # Check the queries were executed concurrently, with the same prepared statement.
+        statement = self.session.prepare.return_value
+        execute_concurrent.assert_called_once_with(
+            self.session,
+            [(statement, [sequence_id1, 2]), (statement, [sequence_id2, 2])],
+            concurrency=10,
+            raise_on_first_error=True,
+        )
+        self.assertEqual(self.session.prepare.call_count, 1)
+
+        # Check the items are grouped by sequence.
+        self.assertEqual(list(items.keys()), [sequence_id1, sequence_id2])
+        self.assertEqual(items[sequence_id1], [SequencedItem(sequence_id1, p, 'topic', '{}') for p in [0, 1]])
+        self.assertEqual(items[sequence_id2], [SequencedItem(sequence_id2, 0, 'topic', '{}')])
+
 
 class WithCassandraActiveRecordStrategies(CassandraDatastoreTestCase, WithActiveRecordStrategies):
+    use_prepared_statements = False
+
     def construct_integer_sequence_active_record_strategy(self):
-        return construct_integer_sequenced_active_record_strategy()
+        return construct_integer_sequenced_active_record_strategy(
+            use_prepared_statements=self.use_prepared_statements
+        )
 
     def construct_timestamp_sequence_active_record_strategy(self):
-        return construct_timestamp_sequenced_active_record_strategy()
+        return construct_timestamp_sequenced_active_record_strategy(
+            use_prepared_statements=self.use_prepared_statements
+        )
 
 
 class TestSimpleSequencedItemIteratorWithCassandra(WithCassandraActiveRecordStrategies,
@@ -0,0 +1,280 @@
+# coding=utf-8
+import json
+import os
+from unittest import skipIf
+from uuid import uuid4
+
+import mock
+import six
+
+from eventsourcing.exceptions import DataIntegrityError, SequencedItemError
+from eventsourcing.infrastructure.datastore import DatastoreLockError
+from eventsourcing.infrastructure.filesystem.activerecords import FileActiveRecordStrategy, \
+    FileIntegerSequencedItem, FileTimestampSequencedItem, fcntl
+from eventsourcing.infrastructure.transcoding import SequencedItem
+from eventsourcing.tests.datastore_tests.test_filesystem import FileDatastoreTestCase
+from eventsourcing.tests.sequenced_item_tests.base import IntegerSequencedItemTestCase, \
+    SimpleSequencedItemteratorTestCase, ThreadedSequencedItemIteratorTestCase, TimestampSequencedItemTestCase, \
+    WithActiveRecordStrategies
+
+
+def construct_integer_sequence_active_record_strategy(datastore, **kwargs):
+    return FileActiveRecordStrategy(
+        datastore=datastore,
+        active_record_class=FileIntegerSequencedItem,
+        sequenced_item_class=SequencedItem,
+        **kwargs
+    )
+
+
+def construct_timestamp_sequence_active_record_strategy(datastore, **kwargs):
+    return FileActiveRecordStrategy(
+        datastore=datastore,
+        active_record_class=FileTimestampSequencedItem,
+        sequenced_item_class=SequencedItem,
+        **kwargs
+    )
+
+
+class FileActiveRecordStrategyTestCase(FileDatastoreTestCase):
+    def tearDown(self):
+        # Close the segment files before the tables are dropped.
+        if self._active_record_strategy is not None:
+            self._active_record_strategy.close()
+        super(FileActiveRecordStrategyTestCase, self).tearDown()
+
+
+class TestFileActiveRecordStrategyWithIntegerSequences(FileActiveRecordStrategyTestCase,
+                                                       IntegerSequencedItemTestCase):
+    def construct_active_record_strategy(self, **kwargs):
+        return construct_integer_sequence_active_record_strategy(datastore=self.datastore, **kwargs)
+
+    def append_items(self, strategy, sequence_id, positions):
+        for position in positions:
+            strategy.append_item(
+                SequencedItem(sequence_id=sequence_id, position=position, topic='topic', data=u'{"é":1}')
+            )
+
+    def reopen(self):
+        self.active_record_strategy.close()
+        self._active_record_strategy = self.construct_active_record_strategy()
+        return self._active_record_strategy
+
+    def crash(self, strategy):
+        # Close the files without checkpointing the index.
+        strategy._segment_file.close()
+        strategy._release_lock()
+        self._active_record_strategy = None
+
+    def test_items_are_read_after_reopening(self):
+        sequence_id = uuid4()
+        self.append_items(self.active_record_strategy, sequence_id, [0, 1, 2])
+
+        # Close, remove the checkpoint, and reopen, so the segment files are scanned.
+        self.active_record_strategy.close()
+        table_path = self.datastore.get_table_path(FileIntegerSequencedItem)
+        os.remove(os.path.join(table_path, FileActiveRecordStrategy.checkpoint_filename))
+        strategy = self.construct_active_record_strategy()
+        self._active_record_strategy = strategy
+        items = strategy.get_items(sequence_id)
+        self.assertEqual([i.position for i in items], [0, 1, 2])
+        self.assertEqual(items[0].data, u'{"é":1}')
+
+        # Append more items, reopen from the checkpoint, and check all the items are there.
+        self.append_items(strategy, sequence_id, [3, 4])
+        strategy = self.reopen()
+        self.assertEqual([i.position for i in strategy.get_items(sequence_id)], [0, 1, 2, 3, 4])
+        self.assertEqual([i.position for i in strategy.all_items()], [0, 1, 2, 3, 4])
+
+        # Check positions are still checked after reopening.
+        with self.assertRaises(SequencedItemError):
+            self.append_items(strategy, sequence_id, [4])
+
+    def test_records_after_checkpoint_are_scanned(self):
+        strategy = self.construct_active_record_strategy(checkpoint_interval=2)
+        self._active_record_strategy = strategy
+        sequence_id = uuid4()
+        self.append_items(strategy, sequence_id, [0, 1, 2])
+
+        # Check the checkpoint is stored as JSON.
+        table_path = self.datastore.get_table_path(FileIntegerSequencedItem)
+        with open(os.path.join(table_path, FileActiveRecordStrategy.checkpoint_filename)) as f:
+            self.assertEqual(json.load(f)['sequences'][sequence_id.hex][0], [0, 1])
+
+        # Reopen without closing the first strategy, so it starts from the checkpoint.
+        self.crash(strategy)
+        with mock.patch.object(FileActiveRecordStrategy, '_scan_segment',
+                               side_effect=FileActiveRecordStrategy._scan_segment, autospec=True) as scan_segment:
+            strategy = self.construct_active_record_strategy()
+            self._active_record_strategy = strategy
+            self.assertEqual([i.position for i in strategy.get_items(sequence_id)], [0, 1, 2])
+        self.assertGreater(scan_segment.call_args[0][2], 0)
+
+    def test_corrupt_checkpoint_is_ignored(self):
+        sequence_id = uuid4()
+        self.append_items(self.active_record_strategy, sequence_id, [0, 1])
+        self.active_record_strategy.close()
+        table_path = self.datastore.get_table_path(FileIntegerSequencedItem)
+        with open(os.path.join(table_path, FileActiveRecordStrategy.checkpoint_filename), 'w') as f:
+            f.write('{"segment_')
+
+        # Check the segment files are scanned instead.
+        strategy = self.construct_active_record_strategy()
+        self._active_record_strategy = strategy
+        self.assertEqual([i.position for i in strategy.get_items(sequence_id)], [0, 1])
+
+    @skipIf(fcntl is None, 'lock files need fcntl')
+    def test_table_has_one_writer(self):
+        self.append_items(self.active_record_strategy, uuid4(), [0])
+
+        # Check another strategy can't open the same table.
+        other = self.construct_active_record_strategy()
+        with self.assertRaises(DatastoreLockError):
+            other.get_items(uuid4())
+
+        # Check it can once the first is closed.
+        self.active_record_strategy.close()
+        self.assertEqual(other.get_items(uuid4()), [])
+        self._active_record_strategy = other
+
+    def test_torn_batch_is_discarded(self):
+        sequence_id = uuid4()
+        self.append_items(self.active_record_strategy, sequence_id, [0])
+        self.active_record_strategy.append_item([
+            SequencedItem(sequence_id=sequence_id, position=position, topic='topic', data='{}')
+            for position in [1, 2]
+        ])
+        self.active_record_strategy.close()
+
+        # Simulate a crash whilst writing the batch, by removing the last few bytes.
+        table_path = self.datastore.get_table_path(FileIntegerSequencedItem)
+        os.remove(os.path.join(table_path, FileActiveRecordStrategy.checkpoint_filename))
+        segment_path = os.path.join(table_path, FileActiveRecordStrategy.segment_filename_format.format(0))
+        with open(segment_path, 'r+b') as f:
+            f.truncate(os.path.getsize(segment_path) - 3)
+
+        # Check the whole batch has been discarded.
+        strategy = self.construct_active_record_strategy()
+        self._active_record_strategy = strategy
+        self.assertEqual([i.position for i in strategy.get_items(sequence_id)], [0])
+
+        # Check the sequence can be continued.
+        self.append_items(strategy, sequence_id, [1])
+        strategy = self.reopen()
+        self.assertEqual([i.position for i in strategy.get_items(sequence_id)], [0, 1])
+
+    def test_failed_write_is_discarded(self):
+        strategy = self.active_record_strategy
+        sequence_id = uuid4()
+        self.append_items(strategy, sequence_id, [0])
+
+        # Simulate a write that fails after writing part of the records.
+        segment_file = strategy._segment_file
+
+        def write(data):
+            segment_file.write(data[:len(data) // 2])
+            segment_file.flush()
+            raise IOError("Disk full")
+
+        strategy._segment_file = mock.Mock(write=mock.Mock(side_effect=write), close=segment_file.close)
+        with self.assertRaises(IOError):
+            self.append_items(strategy, sequence_id, [1])
+
+        # Check the partial write was truncated, and later items are indexed where they were written.
+        self.append_items(strategy, sequence_id, [1, 2])
+        self.assertEqual([i.position for i in strategy.get_items(sequence_id)], [0, 1, 2])
+        self.assertEqual([i.data for i in strategy.get_items(sequence_id)], [u'{"é":1}'] * 3)
+        strategy = self.reopen()
+        self.assertEqual([i.position for i in strategy.all_items()], [0, 1, 2])
+
+    @skipIf(six.PY2, 'memory maps are sliced without copying on Python 3')
+    def test_bytes_data_is_not_copied(self):
+        sequence_id = uuid4()
+        self.active_record_strategy.append_item(
+            SequencedItem(sequence_id=sequence_id, position=0, topic='topic', data=b'\x00\x01')
+        )
+        data = self.active_record_strategy.get_item(sequence_id, 0).data
+        self.assertIsInstance(data, memoryview)
+        self.assertEqual(bytes(data), b'\x00\x01')
+
+    def test_segments_are_rolled_over(self):
+        strategy = self.construct_active_record_strategy(max_segment_size=100)
+        self._active_record_strategy = strategy
+        sequence_id = uuid4()
+        self.append_items(strategy, sequence_id, range(10))
+        table_path = self.datastore.get_table_path(FileIntegerSequencedItem)
+        segment_names = [n for n in os.listdir(table_path) if n.endswith('.segment')]
+        self.assertGreater(len(segment_names), 1)
+
+        strategy = self.reopen()
+        self.assertEqual([i.position for i in strategy.get_items(sequence_id)], list(range(10)))
+        self.assertEqual([i.position for i in strategy.get_items(sequence_id, gte=3, lt=7)], [3, 4, 5, 6])
+        self.assertEqual([i.position for i in strategy.all_items()], list(range(10)))
+
+    def test_full_segments_are_checkpointed(self):
+        strategy = self.construct_active_record_strategy(max_segment_size=100)
+        self._active_record_strategy = strategy
+        sequence_id = uuid4()
+        self.append_items(strategy, sequence_id, range(10))
+        last_segment_number = strategy._segment_number
+
+        # Check only the last segment is scanned after a crash.
+        self.crash(strategy)
+        with mock.patch.object(FileActiveRecordStrategy, '_scan_segment',
+                               side_effect=FileActiveRecordStrategy._scan_segment, autospec=True) as scan_segment:
+            strategy = self.construct_active_record_strategy(max_segment_size=100)
+            self._active_record_strategy = strategy
+            self.assertEqual([i.position for i in strategy.get_items(sequence_id)], list(range(10)))
+        self.assertEqual([c[0][1] for c in scan_segment.call_args_list], [last_segment_number])
+
+    def test_corrupt_full_segment_is_an_error(self):
+        strategy = self.construct_active_record_strategy(max_segment_size=100)
+        self._active_record_strategy = strategy
+        self.append_items(strategy, uuid4(), range(10))
+        strategy.close()
+
+        # Corrupt the first segment.
+        table_path = self.datastore.get_table_path(FileIntegerSequencedItem)
+        os.remove(os.path.join(table_path, FileActiveRecordStrategy.checkpoint_filename))
+        segment_path = os.path.join(table_path, FileActiveRecordStrategy.segment_filename_format.format(0))
+        segment_size = os.path.getsize(segment_path)
+        with open(segment_path, 'r+b') as f:
+            f.seek(segment_size - 1)
+            f.write(b'X')
+
+        # Check it isn't truncated when the segments are scanned.
+        strategy = self.construct_active_record_strategy(max_segment_size=100)
+        self._active_record_strategy = None
+        with self.assertRaises(DataIntegrityError):
+            strategy.get_items(uuid4())
+        strategy._release_lock()
+        self.assertEqual(os.path.getsize(segment_path), segment_size)
+
+
+class TestFileActiveRecordStrategyWithTimestampSequences(FileActiveRecordStrategyTestCase,
+                                                         TimestampSequencedItemTestCase):
+    def construct_active_record_strategy(self):
+        return construct_timestamp_sequence_active_record_strategy(datastore=self.datastore)
+
+
+class WithFileActiveRecordStrategies(WithActiveRecordStrategies, FileDatastoreTestCase):
+    def tearDown(self):
+        # Close the segment files before the tables are dropped.
+        for strategy in [self._integer_sequence_strategy, self._timestamp_sequence_strategy]:
+            if strategy is not None:
+                strategy.close()
+        super(WithFileActiveRecordStrategies, self).tearDown()
+
+    def construct_integer_sequence_active_record_strategy(self):
+        return construct_integer_sequence_active_record_strategy(datastore=self.datastore)
+
+    def construct_timestamp_sequence_active_record_strategy(self):
+        return construct_timestamp_sequence_active_record_strategy(datastore=self.datastore)
+
+
+class TestSimpleIteratorWithFiles(WithFileActiveRecordStrategies, SimpleSequencedItemteratorTestCase):
+    pass
+
+
+class TestThreadedIteratorWithFiles(WithFileActiveRecordStrategies, ThreadedSequencedItemIteratorTestCase):
+    pass
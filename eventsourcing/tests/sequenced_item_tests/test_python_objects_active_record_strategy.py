@@ -0,0 +1,67 @@
+from uuid import uuid4
+
+from eventsourcing.infrastructure.pythonobjects.activerecords import PythonObjectsActiveRecordStrategy
+from eventsourcing.infrastructure.transcoding import SequencedItem
+from eventsourcing.tests.datastore_tests.base import AbstractDatastoreTestCase
+from eventsourcing.tests.sequenced_item_tests.base import AdaptiveSequencedItemIteratorTestCase, \
+    IntegerSequencedItemTestCase, SimpleSequencedItemteratorTestCase, ThreadedSequencedItemIteratorTestCase, \
+    TimestampSequencedItemTestCase, WithActiveRecordStrategies
+
+
+def construct_python_objects_active_record_strategy():
+    return PythonObjectsActiveRecordStrategy(
+        sequenced_item_class=SequencedItem,
+    )
+
+
+class PythonObjectsDatastoreTestCase(AbstractDatastoreTestCase):
+    def construct_datastore(self):
+        # Python objects don't need a datastore.
+        return None
+
+
+class TestPythonObjectsActiveRecordStrategyWithIntegerSequences(PythonObjectsDatastoreTestCase,
+                                                                IntegerSequencedItemTestCase):
+    def construct_active_record_strategy(self):
+        return construct_python_objects_active_record_strategy()
+
+    def test_items_appended_out_of_order(self):
+        sequence_id = uuid4()
+        for position in [3, 1, 2, 0]:
+            self.active_record_strategy.append_item(
+                SequencedItem(sequence_id=sequence_id, position=position, topic='topic', data='{}')
+            )
+        retrieved_items = self.active_record_strategy.get_items(sequence_id)
+        self.assertEqual([i.position for i in retrieved_items], [0, 1, 2, 3])
+        retrieved_items = self.active_record_strategy.get_items(sequence_id, gt=0, lt=3, limit=1,
+                                                                query_ascending=False)
+        self.assertEqual([i.position for i in retrieved_items], [2])
+
+
+class TestPythonObjectsActiveRecordStrategyWithTimestampSequences(PythonObjectsDatastoreTestCase,
+                                                                  TimestampSequencedItemTestCase):
+    def construct_active_record_strategy(self):
+        return construct_python_objects_active_record_strategy()
+
+
+class WithPythonObjectsActiveRecordStrategies(WithActiveRecordStrategies, PythonObjectsDatastoreTestCase):
+    def construct_integer_sequence_active_record_strategy(self):
+        return construct_python_objects_active_record_strategy()
+
+    def construct_timestamp_sequence_active_record_strategy(self):
+        return construct_python_objects_active_record_strategy()
+
+
+class TestSimpleIteratorWithPythonObjects(WithPythonObjectsActiveRecordStrategies,
+                                          SimpleSequencedItemteratorTestCase):
+    pass
+
+
+class TestAdaptiveIteratorWithPythonObjects(WithPythonObjectsActiveRecordStrategies,
+                                            AdaptiveSequencedItemIteratorTestCase):
+    pass
+
+
+class TestThreadedIteratorWithPythonObjects(WithPythonObjectsActiveRecordStrategies,
+                                            ThreadedSequencedItemIteratorTestCase):
+    pass
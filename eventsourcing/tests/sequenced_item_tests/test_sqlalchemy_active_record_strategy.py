@@ -1,33 +1,153 @@
+from uuid import uuid4
+
+import mock
+from sqlalchemy.ext.declarative.api import declarative_base
+from sqlalchemy.sql.schema import Column, UniqueConstraint
+from sqlalchemy.sql.sqltypes import BigInteger, Integer, String, Text
+from sqlalchemy_utils.types.uuid import UUIDType
+
+from eventsourcing.exceptions import DataIntegrityError, SequencedItemError
 from eventsourcing.infrastructure.sqlalchemy.activerecords import SQLAlchemyActiveRecordStrategy, \
-    SqlIntegerSequencedItem, SqlTimestampSequencedItem
+    SqlBinaryIntegerSequencedItem, SqlBinaryTimestampSequencedItem, SqlCommitOrderedIntegerSequencedItem, \
+    SqlCommitOrderedTimestampSequencedItem, SqlIntegerSequenceHead, SqlIntegerSequencedItem, SqlTimestampSequenceHead, \
+    SqlTimestampSequencedItem
+from eventsourcing.infrastructure.sqlalchemy.datastore import SQLAlchemyDatastore, SQLAlchemySettings
 from eventsourcing.infrastructure.transcoding import SequencedItem
 from eventsourcing.tests.datastore_tests.test_sqlalchemy import SQLAlchemyDatastoreTestCase
-from eventsourcing.tests.sequenced_item_tests.base import IntegerSequencedItemTestCase, \
-    SimpleSequencedItemteratorTestCase, ThreadedSequencedItemIteratorTestCase, TimestampSequencedItemTestCase, \
-    WithActiveRecordStrategies
+from eventsourcing.tests.sequenced_item_tests.base import AdaptiveSequencedItemIteratorTestCase, \
+    IntegerSequencedItemTestCase, SimpleSequencedItemteratorTestCase, ThreadedSequencedItemIteratorTestCase, \
+    TimestampSequencedItemTestCase, WithActiveRecordStrategies
 
 
-def construct_integer_sequence_active_record_strategy(datastore):
+def construct_integer_sequence_active_record_strategy(datastore, **kwargs):
     return SQLAlchemyActiveRecordStrategy(
         active_record_class=SqlIntegerSequencedItem,
         sequenced_item_class=SequencedItem,
         datastore=datastore,
+        **kwargs
     )
 
 
-def construct_timestamp_sequence_active_record_strategy(datastore):
+def construct_timestamp_sequence_active_record_strategy(datastore, **kwargs):
     return SQLAlchemyActiveRecordStrategy(
         active_record_class=SqlTimestampSequencedItem,
         sequenced_item_class=SequencedItem,
         datastore=datastore,
+        **kwargs
     )
 
 
-class TestSQLAlchemyActiveRecordStrategyWithIntegerSequences(SQLAlchemyDatastoreTestCase,
-                                                             IntegerSequencedItemTestCase):
+class AllItemsPagesTestCase(IntegerSequencedItemTestCase):
+    def test_all_items_in_pages(self):
+        sequence_ids = [uuid4() for _ in range(3)]
+        items = []
+        for position in range(3):
+            for sequence_id in sequence_ids:
+                item = SequencedItem(sequence_id, position, 'topic', '{}')
+                self.active_record_strategy.append_item(item)
+                items.append(item)
+
+        # Check all the items are returned in the order they were inserted, whatever the page size.
+        for page_size in [1, 2, 3, 9, 10]:
+            self.assertEqual(list(self.active_record_strategy.all_items(page_size=page_size)), items)
+
+        # Check the generator can be closed before the end.
+        all_items = self.active_record_strategy.all_items(page_size=2)
+        self.assertEqual(next(all_items), items[0])
+        all_items.close()
+
+        # Check items can still be appended.
+        item = SequencedItem(sequence_ids[0], 3, 'topic', '{}')
+        self.active_record_strategy.append_item(item)
+        self.assertEqual(list(self.active_record_strategy.all_items())[-1], item)
+
+
+class TestSQLAlchemyActiveRecordStrategyWithIntegerSequences(SQLAlchemyDatastoreTestCase, AllItemsPagesTestCase):
     def construct_active_record_strategy(self):
         return construct_integer_sequence_active_record_strategy(self.datastore)
 
+    def test_get_items_many_with_one_query(self):
+        sequence_ids = [uuid4() for _ in range(3)]
+        for sequence_id in sequence_ids:
+            self.active_record_strategy.append_item([
+                SequencedItem(sequence_id, position, 'topic', '{}') for position in range(3)
+            ])
+
+        # Check the items aren't selected one sequence at a time.
+        with mock.patch.object(self.active_record_strategy, 'get_items', side_effect=AssertionError):
+            items = self.active_record_strategy.get_items_many(sequence_ids, gte={sequence_ids[0]: 1}, limit=2)
+        self.assertEqual([i.position for i in items[sequence_ids[0]]], [1, 2])
+        self.assertEqual([i.position for i in items[sequence_ids[1]]], [0, 1])
+
+    def test_partitions_are_indexed(self):
+        # Check there is an index for selecting a range of sequence IDs after a checkpoint.
+        for record_class, checkpoint in [(SqlIntegerSequencedItem, 'id'),
+                                         (SqlTimestampSequencedItem, 'id'),
+                                         (SqlBinaryIntegerSequencedItem, 'id'),
+                                         (SqlBinaryTimestampSequencedItem, 'id'),
+                                         (SqlCommitOrderedIntegerSequencedItem, 'commit_position'),
+                                         (SqlCommitOrderedTimestampSequencedItem, 'commit_position')]:
+            indexed_columns = [[c.name for c in index.columns] for index in record_class.__table__.indexes]
+            self.assertIn(['sequence_id', checkpoint], indexed_columns)
+
+    def test_repeated_position_in_batch(self):
+        sequence_id = uuid4()
+        items = [SequencedItem(sequence_id, position, 'topic', '{}') for position in [0, 1, 1]]
+        with mock.patch.object(self.active_record_strategy, '_append_item') as append_item:
+            with self.assertRaises(SequencedItemError):
+                self.active_record_strategy.append_item(items)
+        self.assertEqual(append_item.call_count, 0)
+
+
+class TestSQLAlchemyActiveRecordStrategyWithCommitPositions(SQLAlchemyDatastoreTestCase, AllItemsPagesTestCase):
+    def construct_active_record_strategy(self):
+        return SQLAlchemyActiveRecordStrategy(
+            active_record_class=SqlCommitOrderedIntegerSequencedItem,
+            sequenced_item_class=SequencedItem,
+            datastore=self.datastore,
+        )
+
+    def test_commit_positions(self):
+        strategy = self.active_record_strategy
+        sequence_id = uuid4()
+        strategy.append_item(SequencedItem(sequence_id, 0, 'topic', '{}'))
+        strategy.append_item([SequencedItem(sequence_id, p, 'topic', '{}') for p in [1, 2]])
+
+        # Check read_all() returns the commit positions, in the order the items were committed.
+        self.assertEqual([p for p, _ in strategy.read_all()], [1, 2, 3])
+
+        # Simulate another transaction taking the next commit position first.
+        allocate = strategy.allocate_commit_positions
+        attempts = []
+
+        def allocate_taken_position(active_records):
+            allocate(active_records)
+            if not attempts:
+                active_records[0].commit_position = 3
+            attempts.append(active_records)
+
+        # Check the append is retried with the next commit position.
+        with mock.patch.object(strategy, 'allocate_commit_positions', side_effect=allocate_taken_position):
+            strategy.append_item(SequencedItem(sequence_id, 3, 'topic', '{}'))
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual([(p, i.position) for p, i in strategy.read_all(after=2)], [(3, 2), (4, 3)])
+
+        # Check a taken position is still a sequence item error, and isn't retried.
+        with mock.patch.object(strategy, 'allocate_commit_positions', side_effect=allocate) as allocate_mock:
+            with self.assertRaises(SequencedItemError):
+                strategy.append_item(SequencedItem(sequence_id, 3, 'topic', '{}'))
+        self.assertEqual(allocate_mock.call_count, 1)
+
+
+class TestSQLAlchemyActiveRecordStrategyWithTimestampCommitPositions(SQLAlchemyDatastoreTestCase,
+                                                                     TimestampSequencedItemTestCase):
+    def construct_active_record_strategy(self):
+        return SQLAlchemyActiveRecordStrategy(
+            active_record_class=SqlCommitOrderedTimestampSequencedItem,
+            sequenced_item_class=SequencedItem,
+            datastore=self.datastore,
+        )
+
 
 class TestSQLAlchemyActiveRecordStrategyWithTimestampSequences(SQLAlchemyDatastoreTestCase,
                                                                TimestampSequencedItemTestCase):
@@ -35,12 +155,142 @@ class TestSQLAlchemyActiveRecordStrategyWithTimestampSequences(SQLAlchemyDatasto
         return construct_timestamp_sequence_active_record_strategy(self.datastore)
 
 
+class TestSQLAlchemyActiveRecordStrategyWithORMQueries(SQLAlchemyDatastoreTestCase, AllItemsPagesTestCase):
+    def construct_active_record_strategy(self):
+        return construct_integer_sequence_active_record_strategy(self.datastore, use_core_select=False)
+
+
+class TestSQLAlchemyActiveRecordStrategyWithHeadTable(SQLAlchemyDatastoreTestCase, IntegerSequencedItemTestCase):
+    use_core_select = True
+
+    def construct_active_record_strategy(self):
+        return construct_integer_sequence_active_record_strategy(
+            self.datastore, use_core_select=self.use_core_select, head_record_class=SqlIntegerSequenceHead
+        )
+
+    def test_heads_are_kept_in_head_table(self):
+        sequence_id = uuid4()
+        self.active_record_strategy.append_item(SequencedItem(sequence_id, 0, 'topic1', '{}'))
+        self.active_record_strategy.append_item([
+            SequencedItem(sequence_id, position, 'topic2', '{}') for position in range(1, 3)
+        ])
+
+        # Check there is one row for the sequence in the head table.
+        heads = self.datastore.db_session.query(SqlIntegerSequenceHead).all()
+        self.assertEqual([(h.sequence_id, h.position, h.topic) for h in heads], [(sequence_id, 2, 'topic2')])
+        self.datastore.db_session.close()
+
+        # Check the head is looked up without selecting the items.
+        with mock.patch.object(self.active_record_strategy, 'get_items', side_effect=AssertionError):
+            self.assertEqual(self.active_record_strategy.get_head(sequence_id).position, 2)
+            self.assertEqual(self.active_record_strategy.get_heads([sequence_id])[sequence_id].position, 2)
+
+
+class TestSQLAlchemyActiveRecordStrategyWithHeadTableAndORMQueries(TestSQLAlchemyActiveRecordStrategyWithHeadTable):
+    use_core_select = False
+
+
+class TestSQLAlchemyActiveRecordStrategyWithTimestampHeadTable(SQLAlchemyDatastoreTestCase,
+                                                               TimestampSequencedItemTestCase):
+    def construct_active_record_strategy(self):
+        return construct_timestamp_sequence_active_record_strategy(
+            self.datastore, head_record_class=SqlTimestampSequenceHead
+        )
+
+
+CustomBase = declarative_base()
+
+
+class CustomSqlSequencedItem(CustomBase):
+    __tablename__ = 'custom_sequenced_items'
+
+    id = Column(Integer, primary_key=True)
+    sequence_id = Column(UUIDType(), index=True)
+    position = Column(BigInteger(), index=True)
+    topic = Column(String(255))
+    data = Column(Text())
+
+    # Extra column, which isn't selected when reading items.
+    note = Column(String(255))
+
+    __table_args__ = UniqueConstraint('sequence_id', 'position', name='custom_sequenced_item_uc'),
+
+
+class NullableCommitPositionSqlSequencedItem(CustomBase):
+    __tablename__ = 'nullable_commit_position_sequenced_items'
+
+    id = Column(Integer, primary_key=True)
+    sequence_id = Column(UUIDType(), index=True)
+    position = Column(BigInteger(), index=True)
+    topic = Column(String(255))
+    data = Column(Text())
+
+    # Commit position column that was added to an existing table, without filling it in.
+    commit_position = Column(BigInteger(), unique=True)
+
+
+class TestSQLAlchemyActiveRecordStrategyWithCustomActiveRecordClass(IntegerSequencedItemTestCase):
+    def construct_datastore(self):
+        return SQLAlchemyDatastore(
+            base=CustomBase,
+            settings=SQLAlchemySettings(),
+            tables=(CustomSqlSequencedItem, NullableCommitPositionSqlSequencedItem),
+        )
+
+    def construct_active_record_strategy(self):
+        return SQLAlchemyActiveRecordStrategy(
+            active_record_class=CustomSqlSequencedItem,
+            datastore=self.datastore,
+        )
+
+    def test_core_select_matches_orm_query(self):
+        sequence_id = uuid4()
+        items = [SequencedItem(sequence_id, position, 'topic', '{}') for position in range(3)]
+        self.active_record_strategy.append_item(items)
+        orm_strategy = SQLAlchemyActiveRecordStrategy(
+            active_record_class=CustomSqlSequencedItem,
+            datastore=self.datastore,
+            use_core_select=False,
+        )
+        for kwargs in [{}, {'gt': 0}, {'lte': 1, 'limit': 1, 'query_ascending': False}]:
+            self.assertEqual(
+                self.active_record_strategy.get_items(sequence_id, **kwargs),
+                orm_strategy.get_items(sequence_id, **kwargs),
+            )
+        self.assertEqual(self.active_record_strategy.get_item(sequence_id, 2), items[2])
+
+    def test_missing_commit_positions_are_an_error(self):
+        # Insert records without commit positions.
+        table = NullableCommitPositionSqlSequencedItem.__table__
+        self.datastore.db_session.execute(table.insert(), [
+            {'sequence_id': uuid4(), 'position': 0, 'topic': 'topic', 'data': '{}'} for _ in range(2)
+        ])
+        self.datastore.db_session.commit()
+        self.datastore.db_session.close()
+
+        # Check the records can't be read in the order they were committed.
+        for use_core_select in [True, False]:
+            strategy = SQLAlchemyActiveRecordStrategy(
+                active_record_class=NullableCommitPositionSqlSequencedItem,
+                datastore=self.datastore,
+                use_core_select=use_core_select,
+            )
+            with self.assertRaises(DataIntegrityError):
+                list(strategy.all_items(page_size=1))
+            with self.assertRaises(DataIntegrityError):
+                strategy.read_all()
+
+
 class WithSQLAlchemyActiveRecordStrategies(WithActiveRecordStrategies, SQLAlchemyDatastoreTestCase):
+    use_core_select = True
+
     def construct_integer_sequence_active_record_strategy(self):
-        return construct_integer_sequence_active_record_strategy(self.datastore)
+        return construct_integer_sequence_active_record_strategy(self.datastore,
+                                                                 use_core_select=self.use_core_select)
 
     def construct_timestamp_sequence_active_record_strategy(self):
-        return construct_timestamp_sequence_active_record_strategy(self.datastore)
+        return construct_timestamp_sequence_active_record_strategy(self.datastore,
+                                                                   use_core_select=self.use_core_select)
 
 
 class TestSimpleIteratorWithSQLAlchemy(WithSQLAlchemyActiveRecordStrategies,
@@ -48,6 +298,11 @@ class TestSimpleIteratorWithSQLAlchemy(WithSQLAlchemyActiveRecordStrategies,
     pass
 
 
+class TestAdaptiveIteratorWithSQLAlchemy(WithSQLAlchemyActiveRecordStrategies,
+                                         AdaptiveSequencedItemIteratorTestCase):
+    pass
+
+
 class TestThreadedIteratorWithSQLAlchemy(WithSQLAlchemyActiveRecordStrategies,
                                          ThreadedSequencedItemIteratorTestCase):
     use_named_temporary_file = True
@@ -0,0 +1,112 @@
+from uuid import uuid4
+
+import mock
+
+from eventsourcing.infrastructure.sqlite.activerecords import SQLiteActiveRecordStrategy, \
+    SQLiteIntegerSequenceHead, SQLiteIntegerSequencedItem, SQLiteTimestampSequenceHead, SQLiteTimestampSequencedItem
+from eventsourcing.infrastructure.transcoding import SequencedItem
+from eventsourcing.tests.datastore_tests.test_sqlite import SQLiteDatastoreTestCase
+from eventsourcing.tests.sequenced_item_tests.base import AdaptiveSequencedItemIteratorTestCase, \
+    IntegerSequencedItemTestCase, SimpleSequencedItemteratorTestCase, ThreadedSequencedItemIteratorTestCase, \
+    TimestampSequencedItemTestCase, WithActiveRecordStrategies
+
+
+def construct_integer_sequence_active_record_strategy(datastore, **kwargs):
+    return SQLiteActiveRecordStrategy(
+        active_record_class=SQLiteIntegerSequencedItem,
+        sequenced_item_class=SequencedItem,
+        datastore=datastore,
+        **kwargs
+    )
+
+
+def construct_timestamp_sequence_active_record_strategy(datastore, **kwargs):
+    return SQLiteActiveRecordStrategy(
+        active_record_class=SQLiteTimestampSequencedItem,
+        sequenced_item_class=SequencedItem,
+        datastore=datastore,
+        **kwargs
+    )
+
+
+class TestSQLiteActiveRecordStrategyWithIntegerSequences(SQLiteDatastoreTestCase,
+                                                         IntegerSequencedItemTestCase):
+    def construct_active_record_strategy(self):
+        return construct_integer_sequence_active_record_strategy(self.datastore)
+
+    def test_get_items_many_with_one_query(self):
+        sequence_ids = [uuid4() for _ in range(3)]
+        for sequence_id in sequence_ids:
+            self.active_record_strategy.append_item([
+                SequencedItem(sequence_id, position, 'topic', '{}') for position in range(3)
+            ])
+
+        # Check the items aren't selected one sequence at a time.
+        with mock.patch.object(self.active_record_strategy, 'get_items', side_effect=AssertionError):
+            items = self.active_record_strategy.get_items_many(sequence_ids, gte={sequence_ids[0]: 1}, limit=2)
+        self.assertEqual([i.position for i in items[sequence_ids[0]]], [1, 2])
+        self.assertEqual([i.position for i in items[sequence_ids[1]]], [0, 1])
+
+    def test_binary_data(self):
+        # Check data from a binary codec is stored as a blob, and returned as bytes.
+        item = SequencedItem(uuid4(), 0, 'topic', b'\x00\xff')
+        self.active_record_strategy.append_item(item)
+        self.assertEqual(self.active_record_strategy.get_item(item.sequence_id, 0), item)
+        self.assertIsInstance(self.active_record_strategy.get_item(item.sequence_id, 0).data, bytes)
+
+
+class TestSQLiteActiveRecordStrategyWithTimestampSequences(SQLiteDatastoreTestCase,
+                                                           TimestampSequencedItemTestCase):
+    def construct_active_record_strategy(self):
+        return construct_timestamp_sequence_active_record_strategy(self.datastore)
+
+
+class TestSQLiteActiveRecordStrategyWithHeadTable(SQLiteDatastoreTestCase, IntegerSequencedItemTestCase):
+    def construct_active_record_strategy(self):
+        return construct_integer_sequence_active_record_strategy(
+            self.datastore, head_record_class=SQLiteIntegerSequenceHead
+        )
+
+    def test_heads_are_kept_in_head_table(self):
+        sequence_id = uuid4()
+        self.active_record_strategy.append_item(SequencedItem(sequence_id, 0, 'topic1', '{}'))
+        self.active_record_strategy.append_item([
+            SequencedItem(sequence_id, position, 'topic2', '{}') for position in range(1, 3)
+        ])
+
+        # Check there is one row for the sequence in the head table.
+        rows = self.datastore.connection.execute("SELECT position, topic FROM integer_sequence_heads").fetchall()
+        self.assertEqual(rows, [(2, 'topic2')])
+
+        # Check the head is looked up without selecting the items.
+        with mock.patch.object(self.active_record_strategy, 'get_items', side_effect=AssertionError):
+            self.assertEqual(self.active_record_strategy.get_head(sequence_id).position, 2)
+            self.assertEqual(self.active_record_strategy.get_heads([sequence_id])[sequence_id].position, 2)
+
+
+class TestSQLiteActiveRecordStrategyWithTimestampHeadTable(SQLiteDatastoreTestCase,
+                                                           TimestampSequencedItemTestCase):
+    def construct_active_record_strategy(self):
+        return construct_timestamp_sequence_active_record_strategy(
+            self.datastore, head_record_class=SQLiteTimestampSequenceHead
+        )
+
+
+class WithSQLiteActiveRecordStrategies(WithActiveRecordStrategies, SQLiteDatastoreTestCase):
+    def construct_integer_sequence_active_record_strategy(self):
+        return construct_integer_sequence_active_record_strategy(self.datastore)
+
+    def construct_timestamp_sequence_active_record_strategy(self):
+        return construct_timestamp_sequence_active_record_strategy(self.datastore)
+
+
+class TestSimpleIteratorWithSQLite(WithSQLiteActiveRecordStrategies, SimpleSequencedItemteratorTestCase):
+    pass
+
+
+class TestAdaptiveIteratorWithSQLite(WithSQLiteActiveRecordStrategies, AdaptiveSequencedItemIteratorTestCase):
+    pass
+
+
+class TestThreadedIteratorWithSQLite(WithSQLiteActiveRecordStrategies, ThreadedSequencedItemIteratorTestCase):
+    use_named_temporary_file = True
@@ -1,14 +1,24 @@
+import datetime
+import gc
+from json import JSONDecoder
 from math import floor
 from time import time
 from uuid import uuid4
 
+import dateutil.parser
 import six
 
+from eventsourcing.domain.model.events import topic_from_domain_class
 from eventsourcing.domain.model.timebucketedlog import start_new_timebucketedlog
 from eventsourcing.example.domainmodel import Example, register_new_example
 from eventsourcing.infrastructure.activerecord import AbstractActiveRecordStrategy
+from eventsourcing.infrastructure.binarycodec import BinaryCodec
+from eventsourcing.infrastructure.compression import ZlibCompressor, train_dictionary
+from eventsourcing.infrastructure.eventplayer import EventPlayer
 from eventsourcing.infrastructure.eventstore import EventStore
 from eventsourcing.infrastructure.iterators import SequencedItemIterator
+from eventsourcing.infrastructure.transcoding import CompiledJSONCodec, JSONCodec, ObjectJSONDecoder, \
+    SequencedItem, SequencedItemMapper
 from eventsourcing.infrastructure.timebucketedlog_reader import TimebucketedlogReader, get_timebucketedlog_reader
 from eventsourcing.tests.base import notquick
 from eventsourcing.tests.core_tests.test_utils import utc_now
@@ -17,8 +27,25 @@ from eventsourcing.tests.example_application_tests.test_example_application_with
     WithEncryption
 from eventsourcing.tests.sequenced_item_tests.test_cassandra_active_record_strategy import \
     WithCassandraActiveRecordStrategies
+from eventsourcing.tests.sequenced_item_tests.test_file_active_record_strategy import \
+    WithFileActiveRecordStrategies
+from eventsourcing.tests.sequenced_item_tests.test_python_objects_active_record_strategy import \
+    WithPythonObjectsActiveRecordStrategies
 from eventsourcing.tests.sequenced_item_tests.test_sqlalchemy_active_record_strategy import \
     WithSQLAlchemyActiveRecordStrategies
+from eventsourcing.tests.sequenced_item_tests.test_sqlite_active_record_strategy import \
+    WithSQLiteActiveRecordStrategies
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
 
 
 @notquick()
@@ -218,6 +245,11 @@ class TestCassandraPerformance(WithCassandraActiveRecordStrategies, PerformanceT
     pass
 
 
+@notquick()
+class TestCassandraPreparedStatementsPerformance(TestCassandraPerformance):
+    use_prepared_statements = True
+
+
 @notquick()
 class TestEncryptionPerformance(WithEncryption, TestCassandraPerformance):
     pass
@@ -226,3 +258,334 @@ class TestEncryptionPerformance(WithEncryption, TestCassandraPerformance):
 @notquick()
 class TestSQLAlchemyPerformance(WithSQLAlchemyActiveRecordStrategies, PerformanceTestCase):
     pass
+
+
+@notquick()
+class TestSQLAlchemyORMQueriesPerformance(TestSQLAlchemyPerformance):
+    use_core_select = False
+
+
+@notquick()
+class TestSQLitePerformance(WithSQLiteActiveRecordStrategies, PerformanceTestCase):
+    pass
+
+
+@notquick()
+class TestPythonObjectsPerformance(WithPythonObjectsActiveRecordStrategies, PerformanceTestCase):
+    pass
+
+
+@notquick()
+class TestFilesPerformance(WithFileActiveRecordStrategies, PerformanceTestCase):
+    pass
+
+
+@notquick()
+class TestSQLAlchemyBulkAppendPerformance(WithSQLAlchemyActiveRecordStrategies):
+    use_named_temporary_file = True
+
+    def test(self):
+        """
+        Reports on the rate at which lists of items are appended to SQLite.
+
+        NB: This test doesn't actually assert anything, so it isn't really a test.
+        """
+        print("\n\nSQLAlchemy bulk append report:\n")
+
+        ars = self.integer_sequence_active_record_strategy
+        num_items = 2000
+
+        for batch_size in [1, 10, 100, 1000]:
+            sequence_id = uuid4()
+            batches = []
+            for i in six.moves.range(0, num_items, batch_size):
+                batches.append([
+                    SequencedItem(
+                        sequence_id=sequence_id,
+                        position=position,
+                        topic='eventsourcing.example.domainmodel#Example.Heartbeat',
+                        data='{"entity_id":{"UUID":"%s"},"entity_version":%d}' % (sequence_id.hex, position),
+                    )
+                    for position in six.moves.range(i, i + batch_size)
+                ])
+
+            start_append = utc_now()
+            for batch in batches:
+                ars.append_item(batch)
+            time_appending = utc_now() - start_append
+
+            print("Time to append {} events in batches of {}: {:.2f}s ({:.0f} events/s, {:.6f}s each)"
+                  "".format(num_items, batch_size, time_appending, num_items / time_appending,
+                            time_appending / num_items))
+
+
+def get_max_rss():
+    """
+    Returns the peak resident set size of the process, in kB (NaN if it isn't available).
+    """
+    if resource is None:
+        return float('nan')
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@notquick()
+class TestReplayMemoryPerformance(WithSQLiteActiveRecordStrategies):
+    use_named_temporary_file = True
+
+    def test(self):
+        """
+        Reports on the peak memory used to replay an entity with a long history, with and without paging.
+
+        NB: This test doesn't actually assert anything, so it isn't really a test.
+        """
+        print("\n\nReplay memory report:\n")
+
+        event_store = EventStore(
+            active_record_strategy=self.integer_sequence_active_record_strategy,
+            sequenced_item_mapper=SequencedItemMapper(position_attr_name='entity_version'),
+        )
+
+        # Store an entity with lots of events.
+        num_beats = 100000
+        example_id = uuid4()
+        event_store.append(Example.Created(entity_id=example_id, a=1, b=2))
+        for i in six.moves.range(1, num_beats + 1, 1000):
+            event_store.append([
+                Example.Heartbeat(entity_id=example_id, entity_version=version)
+                for version in six.moves.range(i, min(i + 1000, num_beats + 1))
+            ])
+
+        # Replay with paging first, since the peak RSS of the process never goes down.
+        for page_size in [100, 1000, None]:
+            event_player = EventPlayer(event_store=event_store, mutate_func=Example.mutate, page_size=page_size)
+            gc.collect()
+            rss_before = get_max_rss()
+            if tracemalloc is not None:
+                tracemalloc.start()
+
+            start_replay = utc_now()
+            example = event_player.replay_entity(example_id)
+            time_replaying = utc_now() - start_replay
+
+            if tracemalloc is not None:
+                peak_traced = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                peak_traced = float('nan')
+            rss_growth = get_max_rss() - rss_before
+            assert example.count_heartbeats() == num_beats, example.count_heartbeats()
+
+            print("Replay {} events with page size {}: {:.2f}s, peak traced memory {:.1f}MB, "
+                  "peak RSS growth {}kB".format(num_beats + 1, page_size, time_replaying,
+                                                peak_traced / 1024 / 1024, rss_growth))
+
+
+@notquick()
+class TestCodecPerformance(WithSQLiteActiveRecordStrategies):
+
+    def test(self):
+        """
+        Reports on the size of encoded events, and the time to map them to and from sequenced items,
+        for each codec and each class of event.
+
+        NB: This test doesn't actually assert anything, so it isn't really a test.
+        """
+        print("\n\nCodec report:\n")
+
+        example_id = uuid4()
+        events_by_class = [
+            ('Created', [Example.Created(entity_id=example_id, a=1, b=2)]),
+            ('Heartbeat', [Example.Heartbeat(entity_id=example_id, entity_version=i) for i in range(1, 10)]),
+            ('AttributeChanged', [Example.AttributeChanged(entity_id=example_id, entity_version=i, name='_a', value=i)
+                                  for i in range(10, 20)]),
+        ]
+        num_repeats = 1000
+
+        for codec in [JSONCodec(), CompiledJSONCodec(), BinaryCodec()]:
+            mapper = SequencedItemMapper(position_attr_name='entity_version', codec=codec)
+            for class_name, events in events_by_class:
+                items = [mapper.to_sequenced_item(e) for e in events]
+                assert [mapper.from_sequenced_item(i) for i in items] == events
+                size = sum(len(i.data) for i in items) / float(len(items))
+
+                start_encode = time()
+                for _ in six.moves.range(num_repeats):
+                    for event in events:
+                        mapper.to_sequenced_item(event)
+                time_encoding = (time() - start_encode) / num_repeats / len(events)
+
+                start_decode = time()
+                for _ in six.moves.range(num_repeats):
+                    for item in items:
+                        mapper.from_sequenced_item(item)
+                time_decoding = (time() - start_decode) / num_repeats / len(events)
+
+                print("{} {}: {:.1f} bytes per event, {:.6f}s to encode, {:.6f}s to decode".format(
+                    type(codec).__name__, class_name, size, time_encoding, time_decoding))
+
+
+def dateutil_from_jsonable(d):
+    if 'ISO8601_datetime' in d:
+        return dateutil.parser.parse(d['ISO8601_datetime'])
+    return ObjectJSONDecoder.from_jsonable(d)
+
+
+class DateutilJSONDecoder(JSONDecoder):
+    """
+    Decodes datetimes with dateutil, as ObjectJSONDecoder did before it sliced the encoder's fixed format.
+    """
+    def __init__(self, **kwargs):
+        super(DateutilJSONDecoder, self).__init__(object_hook=dateutil_from_jsonable, **kwargs)
+
+
+@notquick()
+class TestDatetimeDecodingPerformance(WithSQLiteActiveRecordStrategies):
+
+    def test(self):
+        """
+        Reports on the time to decode events with several datetimes, before and after the
+        fixed format decoding of datetimes, and with compact datetimes and UUIDs.
+
+        NB: This test doesn't actually assert anything, so it isn't really a test.
+        """
+        print("\n\nDatetime decoding report:\n")
+
+        example_id = uuid4()
+        now = datetime.datetime.utcnow()
+        events = [
+            Example.AttributeChanged(entity_id=example_id, entity_version=i, name='_a', value=now,
+                                     started_on=now, ended_on=now, reported_on=now.date())
+            for i in range(100)
+        ]
+        num_repeats = 100
+
+        codecs = [
+            ('dateutil', JSONCodec(decoder_class=DateutilJSONDecoder)),
+            ('fixed format', JSONCodec()),
+            ('fixed format, compiled', CompiledJSONCodec()),
+            ('compact', JSONCodec(compact_datetimes=True, compact_uuids=True)),
+            ('compact, compiled', CompiledJSONCodec(compact_datetimes=True, compact_uuids=True)),
+        ]
+        for name, codec in codecs:
+            mapper = SequencedItemMapper(position_attr_name='entity_version', codec=codec)
+            items = [mapper.to_sequenced_item(e) for e in events]
+            assert [mapper.from_sequenced_item(i) for i in items] == events
+
+            start_decode = time()
+            for _ in six.moves.range(num_repeats):
+                for item in items:
+                    mapper.from_sequenced_item(item)
+            time_decoding = (time() - start_decode) / num_repeats / len(events)
+
+            print("Decode with {}: {:.6f}s each ({:.0f} events/s), {:.1f} bytes per event".format(
+                name, time_decoding, 1 / time_decoding, sum(len(i.data) for i in items) / float(len(items))))
+
+
+@notquick()
+class TestCompressionPerformance(WithSQLiteActiveRecordStrategies):
+
+    def test(self):
+        """
+        Reports on the size of the data of events, and the time to map them to and from sequenced
+        items, without compression, with zlib, and with zlib and a preset dictionary for each topic.
+
+        NB: This test doesn't actually assert anything, so it isn't really a test.
+        """
+        print("\n\nCompression report:\n")
+
+        example_id = uuid4()
+        events_by_class = [
+            ('Created', [Example.Created(entity_id=uuid4(), a=1, b=2) for _ in range(200)]),
+            ('Heartbeat', [Example.Heartbeat(entity_id=example_id, entity_version=i) for i in range(200)]),
+            ('AttributeChanged', [Example.AttributeChanged(entity_id=example_id, entity_version=i, name='_a', value=i)
+                                  for i in range(200)]),
+        ]
+
+        # Train a dictionary for each topic, from the first half of the events.
+        mapper = SequencedItemMapper(position_attr_name='entity_version')
+        dictionaries = []
+        for i, (_, events) in enumerate(events_by_class):
+            samples = [mapper.to_sequenced_item(e).data for e in events[:100]]
+            dictionaries.append((i + 1, topic_from_domain_class(type(events[0])), train_dictionary(samples)))
+
+        compressors = [
+            ('no compression', None),
+            ('zlib', ZlibCompressor()),
+            ('zlib with dictionaries', ZlibCompressor(dictionaries=dictionaries)),
+        ]
+        num_repeats = 10
+        for name, compressor in compressors:
+            mapper = SequencedItemMapper(position_attr_name='entity_version', compressor=compressor)
+            for class_name, events in events_by_class:
+                events = events[100:]
+                start_encode = time()
+                for _ in six.moves.range(num_repeats):
+                    items = [mapper.to_sequenced_item(e) for e in events]
+                time_encoding = (time() - start_encode) / num_repeats / len(events)
+
+                start_decode = time()
+                for _ in six.moves.range(num_repeats):
+                    decoded = [mapper.from_sequenced_item(i) for i in items]
+                time_decoding = (time() - start_decode) / num_repeats / len(events)
+                assert decoded == events
+
+                print("{} {}: {:.1f} bytes per event, {:.6f}s to encode, {:.6f}s to decode".format(
+                    class_name, name, sum(len(i.data) for i in items) / float(len(items)), time_encoding,
+                    time_decoding))
+
+
+@notquick()
+class TestBatchDecodingPerformance(WithSQLiteActiveRecordStrategies):
+
+    def test(self):
+        """
+        Reports on the time to decode the events of an entity one at a time, and a page at a time,
+        and the time to replay the entity with the event player (which decodes a page at a time).
+
+        NB: This test doesn't actually assert anything, so it isn't really a test.
+        """
+        print("\n\nBatch decoding report:\n")
+
+        mapper = SequencedItemMapper(position_attr_name='entity_version')
+        event_store = EventStore(
+            active_record_strategy=self.integer_sequence_active_record_strategy,
+            sequenced_item_mapper=mapper,
+        )
+
+        # Store an entity with lots of events.
+        num_beats = 10000
+        example_id = uuid4()
+        event_store.append(Example.Created(entity_id=example_id, a=1, b=2))
+        event_store.append([
+            Example.Heartbeat(entity_id=example_id, entity_version=version)
+            for version in six.moves.range(1, num_beats + 1)
+        ])
+        items = self.integer_sequence_active_record_strategy.get_items(example_id)
+
+        num_repeats = 10
+        for page_size in [10, 100, 1000]:
+            pages = [items[i:i + page_size] for i in six.moves.range(0, len(items), page_size)]
+
+            start_decode = time()
+            for _ in six.moves.range(num_repeats):
+                for page in pages:
+                    [mapper.from_sequenced_item(i) for i in page]
+            time_per_item = (time() - start_decode) / num_repeats / len(items)
+
+            start_decode = time()
+            for _ in six.moves.range(num_repeats):
+                for page in pages:
+                    mapper.from_sequenced_items(page)
+            time_per_page = (time() - start_decode) / num_repeats / len(items)
+
+            print("Page size {}: {:.6f}s per event decoded one at a time, {:.6f}s per event decoded a page "
+                  "at a time ({:.2f}x)".format(page_size, time_per_item, time_per_page,
+                                               time_per_item / time_per_page))
+
+        for page_size in [100, 1000, None]:
+            event_player = EventPlayer(event_store=event_store, mutate_func=Example.mutate, page_size=page_size)
+            start_replay = time()
+            example = event_player.replay_entity(example_id)
+            time_replaying = time() - start_replay
+            assert example.count_heartbeats() == num_beats, example.count_heartbeats()
+            print("Replay {} events with page size {}: {:.3f}s".format(num_beats + 1, page_size, time_replaying))
@@ -6,6 +6,12 @@ try:
 except ImportError:
     install_requires_singledispatch = ['singledispatch']
 
+try:
+    import concurrent.futures
+    install_requires_futures = []
+except ImportError:
+    install_requires_futures = ['futures']
+
 
 setup(
     name='eventsourcing',
@@ -19,7 +25,7 @@ setup(
         'python-dateutil',
         'singledispatch',
         'six',
-    ] + install_requires_singledispatch,
+    ] + install_requires_singledispatch + install_requires_futures,
     extras_require={
         'cassandra': [
             'cassandra-driver==3.8.0',